@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+Compare ``logging.Formatter`` with ``prelogging.formatters.FastFormatter``,
+formatting the same records with each of the shipped formatter presets --
+and, for presets that use ``asctime``, with a ``FastFormatter`` that caches
+the time (``cache_time=True``).
+Run from this directory:
+
+    $ ./bench_formatters.py [nrecords]
+"""
+
+import sys
+sys.path[0:0] = ['..']
+
+import logging
+import time
+
+import prelogging       # loads the formatter presets
+from prelogging.formatter_presets import _formatter_presets
+from prelogging.formatters import FastFormatter
+
+
+def make_records(nrecords):
+    return [
+        logging.LogRecord('svc.module%d' % (i % 8), logging.INFO,
+                          __file__, 42, 'Message no. %d', (i,), None)
+        for i in range(nrecords)
+    ]
+
+
+def time_format(formatter, records):
+    fmt = formatter.format
+    t0 = time.perf_counter()
+    for r in records:
+        fmt(r)
+    return time.perf_counter() - t0
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = make_records(nrecords)
+    print("%-32s %12s %12s %8s %12s %8s"
+          % ('preset', 'logging', 'Fast', 'speedup', '+cache_time', 'speedup'))
+    for name in sorted(_formatter_presets):
+        spec = _formatter_presets[name]
+        if dict(spec.options).get('structured'):
+            continue                # see bench_structured.py
+        args = (spec.format, spec.dateformat, spec.style)
+        t_std = time_format(logging.Formatter(*args), records)
+        t_fast = time_format(FastFormatter(*args), records)
+        line = ("%-32s %10.0f/s %10.0f/s %7.2fx"
+                % (name, nrecords / t_std, nrecords / t_fast, t_std / t_fast))
+        if '%(asctime)' in spec.format:
+            t_cached = time_format(FastFormatter(*args, cache_time=True),
+                                   records)
+            line += " %10.0f/s %7.2fx" % (nrecords / t_cached,
+                                          t_std / t_cached)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
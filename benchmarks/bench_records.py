@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+Memory and time to create ``logging.LogRecord``\\ s and
+``prelogging.records.CompactLogRecord``\\ s, holding a million of them at once,
+as a memory handler or a bounded queue might -- as created, and after
+formatting (which adds ``message`` and ``asctime``, and materializes a
+``LogRecord``'s ``__dict__``).
+Run from this directory:
+
+    $ ./bench_records.py [nrecords]
+"""
+
+import sys
+sys.path[0:0] = ['..']
+
+import gc
+import logging
+import time
+import tracemalloc
+
+from prelogging.records import compact_record_factory
+
+FORMAT = '%(asctime)s %(levelname)s %(name)s %(message)s'
+
+
+def make_records(factory, nrecords):
+    return [factory('svc.module%d' % (i % 8), logging.INFO, __file__, 42,
+                    'Message no. %d', (i,), None)
+            for i in range(nrecords)]
+
+
+def measure(factory, nrecords):
+    """Return (seconds to create, bytes per record as created, bytes per
+    record after formatting)."""
+    gc.collect()
+    t0 = time.perf_counter()
+    records = make_records(factory, nrecords)
+    t = time.perf_counter() - t0
+    del records
+    gc.collect()
+
+    tracemalloc.start()
+    records = make_records(factory, nrecords)
+    created = tracemalloc.get_traced_memory()[0]
+    formatter = logging.Formatter(FORMAT)
+    for r in records:
+        formatter.format(r)
+    formatted = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return t, created / nrecords, formatted / nrecords
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("%d records held" % nrecords)
+    print("%-20s %12s %16s %16s" % ('record', 'created', 'bytes/record',
+                                     'formatted'))
+    for name, factory in (('logging.LogRecord', logging.LogRecord),
+                          ('CompactLogRecord', compact_record_factory)):
+        t, created, formatted = measure(factory, nrecords)
+        print("%-20s %10.0f/s %16.0f %16.0f"
+              % (name, nrecords / t, created, formatted))
+
+
+if __name__ == '__main__':
+    main()
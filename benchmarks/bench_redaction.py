@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+Compare ``prelogging.redaction.RedactionFilter`` with what it replaces: a
+callable filter that applies one ``re.sub`` per pattern to each message.
+The messages are modeled on a web service's log: mostly request lines
+and timings, with a few that carry secrets (one in ``secret_every``).
+Run from this directory:
+
+    $ ./bench_redaction.py [nrecords [secret_every]]
+"""
+
+import sys
+sys.path[0:0] = ['..']
+
+import logging
+import random
+import time
+
+from prelogging.redaction import PATTERNS, RedactionFilter, _scoped
+
+CLEAN = [
+    ('GET /api/v2/orders/%d 200 in %.1fms', lambda r: (r.randrange(10**6),
+                                                       r.random() * 90)),
+    ('Cache miss for key order:%d; fetching from db', lambda r: (
+        r.randrange(10**6),)),
+    ('Worker %s processed %d jobs (queue depth %d)', lambda r: (
+        'w%d' % r.randrange(16), r.randrange(100), r.randrange(1000))),
+    ('Retrying upstream call to %s (attempt %d of 5)', lambda r: (
+        'payments.internal:8443', r.randrange(1, 6))),
+]
+SECRET = [
+    ('Login for %s from %s', lambda r: ('user%d@example.com' % r.randrange(999),
+                                        '10.0.%d.%d' % (r.randrange(256),
+                                                        r.randrange(256)))),
+    ('Outbound request headers: Authorization: Bearer %s', lambda r: (
+        'tok_%016x' % r.getrandbits(64),)),
+    ('Charge failed for card %s', lambda r: ('4111 1111 1111 1111',)),
+    ('Connecting with password=%s', lambda r: ('hunter%d' % r.randrange(99),)),
+]
+
+
+def make_records(nrecords, secret_every):
+    r = random.Random(42)
+    records = []
+    for i in range(nrecords):
+        msg, args = r.choice(SECRET if i % secret_every == 0 else CLEAN)
+        records.append(logging.LogRecord('svc', logging.INFO, __file__, 1,
+                                         msg, args(r), None))
+    return records
+
+
+def re_sub_chain():
+    """The hand-rolled filter: one re.sub per pattern."""
+    import re
+    subs = [re.compile(_scoped(p.regex, 0)).sub for p in PATTERNS.values()]
+
+    def redact(record):
+        message = record.getMessage()
+        for sub in subs:
+            message = sub('[REDACTED]', message)
+        record.msg, record.args = message, ()
+        return True
+    return redact
+
+
+def time_filter(filter_fn, records):
+    t0 = time.perf_counter()
+    for r in records:
+        filter_fn(r)
+    return time.perf_counter() - t0
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    secret_every = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print("%d records, 1 in %d with a secret" % (nrecords, secret_every))
+    print("%-36s %12s %8s" % ('filter', 'records', 'speedup'))
+    t_chain = None
+    no_card = [name for name in sorted(PATTERNS) if name != 'card']
+    for name, make in [
+            ('re.sub per pattern', re_sub_chain),
+            ('RedactionFilter', RedactionFilter),
+            ('RedactionFilter, no card pattern',
+             lambda: RedactionFilter(no_card))]:
+        t = time_filter(make() if name.startswith('re.sub')
+                        else make().filter,
+                        make_records(nrecords, secret_every))
+        t_chain = t_chain or t
+        print("%-36s %10.0f/s %7.2fx" % (name, nrecords / t, t_chain / t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+Compare draining a backlog of log records with the single ``logging_thread``
+of ``examples/mproc_approach__queue_handler_logging_thread.py`` against a
+``ShardedListener`` with N drainer threads.
+
+The backlog is enqueued before the clock starts, so only the listener side
+is timed. Each logger writes to its own file, which is the situation
+sharding helps with. Run from this directory:
+
+    $ ./bench_sharded_listeners.py [nrecords]
+"""
+
+import os
+import sys
+sys.path[0:0] = ['..']
+
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing import Queue
+
+from prelogging import LCDict, ShardedQueue, ShardedListener
+from examples.mproc_approach__queue_handler_logging_thread import logging_thread
+
+LOGGERS = ['svc%d' % i for i in range(8)]
+
+
+def config_logging(log_path):
+    lcd = LCDict(log_path=log_path, root_level='DEBUG')
+    for name in LOGGERS:
+        lcd.add_file_handler(name + '_file',
+                             filename=name + '.log',
+                             mode='w',
+                             formatter='time_logger_level_msg')
+        lcd.add_logger(name, handlers=name + '_file', propagate=False)
+    lcd.config()
+
+
+def make_records(nrecords):
+    return [
+        logging.makeLogRecord({'name': LOGGERS[i % len(LOGGERS)],
+                               'msg': 'Message no. %d', 'args': (i,),
+                               'levelno': logging.INFO,
+                               'levelname': 'INFO'})
+        for i in range(nrecords)
+    ]
+
+
+def settle(queues):
+    """Give the queues' feeder threads time to push everything into
+    their pipes, so that enqueueing isn't timed."""
+    while any(q.empty() for q in queues):
+        time.sleep(0.01)
+    time.sleep(0.5)
+
+
+def time_logging_thread(records):
+    q = Queue()
+    for r in records:
+        q.put_nowait(r)
+    q.put(None)
+    settle([q])
+    t0 = time.time()
+    t = threading.Thread(target=logging_thread, args=(q,))
+    t.start()
+    t.join()
+    return time.time() - t0
+
+
+def time_sharded(records, nshards):
+    sq = ShardedQueue(nshards)
+    for r in records:
+        sq.put_nowait(r)
+    settle(sq.queues)
+    t0 = time.time()
+    listener = ShardedListener(sq).start()
+    listener.stop()
+    return time.time() - t0
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    log_path = tempfile.mkdtemp(prefix='bench_sharded_')
+    try:
+        config_logging(log_path)
+        records = make_records(nrecords)
+
+        t_single = time_logging_thread(records)
+        print("%-24s %8.3fs  %10.0f records/s"
+              % ('logging_thread', t_single, nrecords / t_single))
+        for nshards in (1, 2, 4, 8):
+            t = time_sharded(records, nshards)
+            print("%-24s %8.3fs  %10.0f records/s  (x%.2f)"
+                  % ('ShardedListener N=%d' % nshards, t, nrecords / t,
+                     t_single / t))
+    finally:
+        logging.shutdown()
+        shutil.rmtree(log_path)
+
+
+if __name__ == '__main__':
+    main()
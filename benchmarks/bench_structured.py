@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+Compare the structured formatters of ``prelogging.formatters`` --
+``JsonFormatter``, with each available backend, and ``LogfmtFormatter`` --
+with the hand-rolled formatter they replace, ``json.dumps(record.__dict__)``,
+on records with and without ``extra`` attributes.
+Run from this directory:
+
+    $ ./bench_structured.py [nrecords]
+"""
+
+import sys
+sys.path[0:0] = ['..']
+
+import json
+import logging
+import time
+
+from prelogging.formatters import JsonFormatter, LogfmtFormatter, orjson
+
+FORMAT = '%(asctime)s %(levelname)s %(name)s %(message)s'
+
+
+class NaiveJsonFormatter(logging.Formatter):
+    """What the structured formatters replace."""
+    def format(self, record):
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record, self.datefmt)
+        return json.dumps(record.__dict__, default=str)
+
+
+def make_records(nrecords, extra):
+    records = []
+    for i in range(nrecords):
+        r = logging.LogRecord('svc.module%d' % (i % 8), logging.INFO,
+                              __file__, 42, 'Message "no." %d', (i,), None)
+        if extra:
+            r.request_id = 'req-%06d' % i
+            r.user = 'user%d' % (i % 100)
+            r.elapsed = i / 7.0
+        records.append(r)
+    return records
+
+
+def time_format(formatter, records):
+    fmt = formatter.format
+    t0 = time.perf_counter()
+    for r in records:
+        fmt(r)
+    return time.perf_counter() - t0
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    formatters = [
+        ('json.dumps(record.__dict__)', NaiveJsonFormatter(FORMAT)),
+        ('JsonFormatter (json)', JsonFormatter(FORMAT, backend='json')),
+        ('  + cache_time', JsonFormatter(FORMAT, backend='json',
+                                         cache_time=True)),
+    ]
+    if orjson:
+        formatters += [
+            ('JsonFormatter (orjson)', JsonFormatter(FORMAT,
+                                                     backend='orjson')),
+            ('  + cache_time', JsonFormatter(FORMAT, backend='orjson',
+                                             cache_time=True)),
+        ]
+    formatters += [
+        ('LogfmtFormatter', LogfmtFormatter(FORMAT)),
+        ('  + cache_time', LogfmtFormatter(FORMAT, cache_time=True)),
+    ]
+    for extra in (False, True):
+        records = make_records(nrecords, extra)
+        print("%s extra attributes" % ('With' if extra else 'Without'))
+        print("%-30s %12s %8s" % ('formatter', 'records', 'speedup'))
+        t_naive = None
+        for name, formatter in formatters:
+            t = time_format(formatter, records)
+            t_naive = t_naive or t
+            print("%-30s %10.0f/s %7.2fx" % (name, nrecords / t, t_naive / t))
+        print()
+
+
+if __name__ == '__main__':
+    main()
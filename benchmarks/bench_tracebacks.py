@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+An exception storm: format records of the same exception, raised from the
+same place, with ``logging.Formatter`` and with a
+``prelogging.formatters.FastFormatter`` that caches tracebacks
+(``traceback_cache``), with and without ``repeat_tracebacks``.
+Run from this directory:
+
+    $ ./bench_tracebacks.py [nrecords]
+"""
+
+import sys
+sys.path[0:0] = ['..']
+
+import logging
+import time
+
+from prelogging.formatters import FastFormatter
+
+FORMAT = '%(asctime)s %(levelname)s %(name)s %(message)s'
+
+
+def query(n, depth=5):
+    if depth:
+        return query(n, depth - 1)
+    raise ConnectionError('database unreachable (attempt %d)' % n)
+
+
+def make_records(nrecords):
+    records = []
+    for i in range(nrecords):
+        try:
+            query(i)
+        except ConnectionError:
+            records.append(logging.LogRecord(
+                'svc.db', logging.ERROR, __file__, 42, 'Query failed', (),
+                sys.exc_info()))
+    return records
+
+
+def time_format(formatter, records):
+    fmt = formatter.format
+    t0 = time.perf_counter()
+    for r in records:
+        r.exc_text = None
+        fmt(r)
+    return time.perf_counter() - t0
+
+
+def main():
+    nrecords = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    records = make_records(nrecords)
+    t_std = None
+    print("%-34s %12s %8s" % ('formatter', 'records', 'speedup'))
+    for name, formatter in [
+            ('logging.Formatter', logging.Formatter(FORMAT)),
+            ('FastFormatter', FastFormatter(FORMAT)),
+            ('  traceback_cache=100', FastFormatter(FORMAT,
+                                                    traceback_cache=100)),
+            ('  + repeat_tracebacks', FastFormatter(FORMAT,
+                                                    traceback_cache=100,
+                                                    repeat_tracebacks=True))]:
+        t = time_format(formatter, records)
+        t_std = t_std or t
+        print("%-34s %10.0f/s %7.2fx" % (name, nrecords / t, t_std / t))
+
+
+if __name__ == '__main__':
+    main()
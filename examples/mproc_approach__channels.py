@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+__author__ = 'brianoneill'
+
+__doc__ = """
+A variant of ``mproc_approach__queue_handler_logging_thread.py`` in which
+each worker process has its own channel (pipe) to the main process, instead
+of all workers sharing one ``multiprocessing.Queue``. A ``ChannelListener``
+thread in the main process multiplexes the channels and releases records
+approximately in order of creation.
+"""
+
+try:
+    import prelogging
+except ImportError:
+    import sys
+    sys.path[0:0] = ['..']          # , '../..'
+
+from prelogging import LCDict, ChannelSet, ChannelListener
+from prelogging.six import PY2
+if PY2:
+    exit("%s: logging.handlers.QueueHandler doesn't exist in Python 2"
+         % __file__)
+
+import logging
+from multiprocessing import Process
+
+import random
+import time
+import os
+
+
+def worker_config_logging(writer):
+    lcd = LCDict(attach_handlers_to_root=True, root_level='DEBUG')
+    lcd.add_queue_handler('qhandler', queue=writer)
+    lcd.config()
+
+
+def worker_process(writer, chunksize):
+    "Configuration: worker_config_logging"
+    worker_config_logging(writer)
+
+    levels = [logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR,
+              logging.CRITICAL]
+    loggers = ['foo', 'foo.bar', 'foo.bar.baz',
+               'spam', 'spam.ham', 'spam.ham.eggs']
+
+    for i in range(chunksize):
+        lvl = random.choice(levels)
+        logger = logging.getLogger(random.choice(loggers))
+        logger.log(lvl, 'Message no. %d', i+1)
+        time.sleep(random.random() / 8)
+
+
+def main_process_config_logging():
+    # DON'T attach handlers to root
+    lcd = LCDict(log_path='_log/mproc_channels', root_level='DEBUG')
+
+    lcd.add_formatter('detailed',
+                      format='%(asctime)s %(name)-15s %(levelname)-8s '
+                             '%(processName)-10s %(message)s',
+    )
+    lcd.add_file_handler('file', filename='mplog.log',
+                                 mode='w',
+                                 formatter='detailed'
+    ).add_file_handler('errors', level='ERROR',
+                                 filename='mplog-errors.log',
+                                 mode='w',
+                                 formatter='detailed'
+    ).attach_root_handlers('file', 'errors')
+
+    lcd.config()
+
+
+def main():
+    CHUNKSIZE = 10
+
+    t_start = time.time()
+
+    main_process_config_logging()
+
+    nworkers = os.cpu_count()
+    channels = ChannelSet(nworkers)
+    listener = ChannelListener(channels).start()
+
+    workers = []
+    for i in range(nworkers):
+        wp = Process(target=worker_process,
+                     name='worker %d' % (i + 1),
+                     args=(channels.writer(i), CHUNKSIZE))
+        workers.append(wp)
+        wp.start()
+    # The workers have their own copies now
+    channels.close_writers()
+
+    for wp in workers:
+        wp.join()
+
+    listener.stop()
+
+    t_elapsed = time.time() - t_start
+    print("\nElapsed time: %.3f" % t_elapsed)
+
+
+if __name__ == '__main__':
+    main()
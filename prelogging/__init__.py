@@ -3,10 +3,14 @@ __author__ = "Brian O'Neill"
 from ._version import __version_sans_release__, __version__
 from .lcdictbasic import LCDictBasic
 from .lcdict import LCDict
-from . import (locking_handlers, lcdict_builder_abc, formatter_presets)
+from . import (locking_handlers, lcdict_builder_abc, formatter_presets,
+               listeners, backpressure, nonblocking_handlers)
 from .locking_handlers import *
 from .formatter_presets import *
 from .lcdict_builder_abc import *
+from .listeners import *
+from .backpressure import *
+from .nonblocking_handlers import *
 
 __all__ = (
     ['__author__',
@@ -17,5 +21,8 @@ __all__ = (
     ] +
     locking_handlers.__all__   +
     lcdict_builder_abc.__all__ +
-    formatter_presets.__all__
+    formatter_presets.__all__  +
+    listeners.__all__          +
+    backpressure.__all__       +
+    nonblocking_handlers.__all__
 )
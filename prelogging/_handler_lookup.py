@@ -0,0 +1,62 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Look up configured handlers by name.
+
+``dictConfig`` gives every handler it creates the name it has in the
+``handlers`` subdictionary, and `logging` keeps a registry of named handlers.
+But the registry holds handlers weakly: a handler that isn't attached to any
+logger -- as the target of a handler that passes records on should be -- is
+garbage-collected soon after ``dictConfig`` returns.
+
+So ``configure`` calls ``dictConfig`` and returns the handlers it created,
+and ``resolve_targets`` hands them to the handlers that pass records on to
+other handlers (named in their configuration), which keep them. This is done
+once configuration is complete -- whatever order ``dictConfig`` created the
+handlers in.
+"""
+
+import logging
+import logging.config
+
+
+def lookup_handler(name, handlers=None):
+    """Return the live handler named ``name``: from ``handlers``, a dict
+    name -> handler, if it's there, else from `logging`'s registry.
+    Raise ``KeyError`` if there is no such handler.
+    """
+    if handlers and name in handlers:
+        return handlers[name]
+    # logging.getHandlerByName exists only in Python 3.12+
+    return logging._handlers[name]
+
+
+def lookup_handlers(names, handlers=None):
+    """Return a list of the live handlers named in ``names``."""
+    return [lookup_handler(name, handlers) for name in names]
+
+
+def configure(config):
+    """Call ``dictConfig`` with ``config``, and return the handlers it
+    created, as a dict name -> handler.
+    """
+    configurator = logging.config.dictConfigClass(config)
+    configurator.configure()
+    # ``configure`` replaces each handler's dict with the handler. (An
+    # incremental configuration creates none.)
+    created = configurator.config.get('handlers', {})
+    return dict((name, created[name]) for name in created
+                if isinstance(created[name], logging.Handler))
+
+
+def resolve_targets(handlers):
+    """Give each of ``handlers``, a dict name -> handler, that passes records
+    on to other handlers -- that has a ``resolve_targets`` method -- its
+    targets, looked up in ``handlers`` or else by name.
+    """
+    for handler in handlers.values():
+        resolve = getattr(handler, 'resolve_targets', None)
+        if resolve is not None:
+            resolve(handlers)
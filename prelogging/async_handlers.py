@@ -0,0 +1,277 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+A handler for asyncio programs, whose ``emit`` never blocks the event loop.
+"""
+
+import collections
+import logging
+import time
+
+try:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor, TimeoutError
+except ImportError:                     # pragma: no cover
+    asyncio = None                      # PY2
+
+from ._handler_lookup import lookup_handlers
+from . import lifecycle
+from .batching import BatchingMixin, handle_batch
+
+__all__ = [
+    'AsyncioHandler',
+]
+
+
+def _running_loop():
+    """Return the event loop running in this thread, or ``None``."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncioHandler(logging.Handler, BatchingMixin):
+    """
+    .. _AsyncioHandler:
+
+    A handler that lets coroutines log without ever waiting on a log sink.
+    ``emit`` just appends the record to a buffer, in O(1). A drainer task on
+    the event loop takes records off the buffer in batches of up to
+    ``batch_size`` and hands each batch to a dedicated executor thread, which
+    passes the records to the *target* handlers -- file, syslog, SMTP
+    handlers and the like. So the event loop's latency doesn't depend on how
+    slow the targets are.
+
+    The targets are named handlers of the same configuration. They should
+    *not* also be attached to loggers, or records will be written twice.
+    `logging` holds such handlers only weakly, so ``LCDict.config()`` hands
+    the targets to this handler, which keeps them (see ``resolve_targets``).
+
+    The drainer is started by the first record logged on a running loop. When
+    the loop shuts down and cancels its tasks (as ``asyncio.run`` does),
+    the drainer delivers whatever is left before it finishes; a coroutine
+    can also ``await handler.aclose()`` to do the same explicitly. Records
+    logged while no loop is running are delivered immediately, in the calling
+    thread.
+
+    The buffer holds at most ``capacity`` records: if the targets fall that
+    far behind, further records are dropped, and counted in ``dropped``,
+    rather than taking ever more memory.
+
+    Records are formatted by the targets, on the executor thread, so objects
+    passed as arguments to logging calls shouldn't be mutated afterwards.
+    """
+    def __init__(self, targets=(), batch_size=100, capacity=10000, **kwargs):
+        """
+        :param targets: the name of a handler, or a sequence of names of
+            handlers, to which records are passed on
+        :param batch_size: the most records handed to the executor thread
+            at once
+        :param capacity: the most records waiting to be delivered;
+            more are dropped
+        """
+        if asyncio is None:                                 # pragma: no cover
+            raise NotImplementedError("AsyncioHandler requires asyncio")
+        super(AsyncioHandler, self).__init__(**kwargs)
+        if isinstance(targets, str):
+            targets = [targets]
+        self.target_names = list(targets)
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self._targets = None
+        # Records dropped because the buffer was full
+        self.dropped = 0
+        # Seconds between the creation and delivery of the oldest record
+        # of the latest batch -- how far behind the targets are
+        self.latency = 0.0
+        self._buffer = collections.deque()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._executor = None
+        lifecycle.register_drainable(self)
+
+    @property
+    def targets(self):
+        """(r/o property) The target handlers, as given by
+        ``resolve_targets``, or else looked up by name on first use."""
+        if self._targets is None:
+            self._targets = lookup_handlers(self.target_names)
+        return self._targets
+
+    def resolve_targets(self, handlers):
+        """Look up the targets in ``handlers``, a dict name -> handler, or
+        else by name, and keep them. Called by ``LCDict.config()`` once
+        ``dictConfig`` has created the handlers.
+        """
+        self._targets = lookup_handlers(self.target_names, handlers)
+
+    def qsize(self):
+        """Return the number of records waiting to be delivered."""
+        return len(self._buffer)
+
+    def _deliver(self, records):
+        for target in self.targets:
+            handle_batch(target, [record for record in records
+                                  if record.levelno >= target.level])
+        if records:
+            self.latency = time.time() - records[0].created
+
+    def _take(self, n=None):
+        buf = self._buffer
+        batch = []
+        while buf and (n is None or len(batch) < n):
+            batch.append(buf.popleft())
+        return batch
+
+    def _deliver_rest(self):
+        """Deliver everything still buffered, in order, blocking until done."""
+        rest = self._take()
+        if not rest:
+            return
+        future = self._submit(self._deliver, rest)
+        if future is not None:
+            future.result()
+
+    def _submit(self, fn, *args):
+        """Run ``fn(*args)`` on the executor thread, behind any batch it's
+        still working on, and return the future; or, if there's no
+        executor or it can't take work (it, or the interpreter, has shut
+        down), run it here and return ``None``."""
+        if self._executor is not None:
+            try:
+                return self._executor.submit(fn, *args)
+            except RuntimeError:
+                pass
+        fn(*args)
+        return None
+
+    def drain(self, deadline):
+        """Deliver everything still buffered, giving up at time
+        ``deadline``. Called by the :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        rest = self._take()
+        delivered = [0]
+
+        def deliver_until_deadline():
+            for record in rest:
+                if time.time() >= deadline:
+                    return
+                self._deliver([record])
+                delivered[0] += 1
+
+        future = self._submit(deliver_until_deadline)
+        if future is not None:
+            try:
+                future.result(lifecycle.remaining(deadline))
+            except TimeoutError:
+                pass
+        return len(rest) - delivered[0]
+
+    def after_fork_in_child(self):
+        """Forget the parent's buffered records (the parent delivers them),
+        event loop, drainer task and executor thread. Called in the child by
+        the :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._buffer.clear()
+        self._loop = self._wakeup = self._task = None
+        self._executor = None
+
+    def _start(self, loop):
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = loop.create_task(self._drain())
+
+    async def _drain(self):
+        loop = self._loop
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._buffer:
+                    batch = self._take(self.batch_size)
+                    await loop.run_in_executor(self._executor,
+                                               self._deliver, batch)
+        except asyncio.CancelledError:
+            # The loop is shutting down.
+            self._deliver_rest()
+            raise
+
+    def emit(self, record):
+        """Buffer the record, or drop it if the buffer is full, and wake
+        the drainer. Called by `logging`.
+        """
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return
+        self._buffer.append(record)
+        try:
+            self._wake()
+        except Exception:
+            self.handleError(record)
+
+    def emit_batch(self, records):
+        """Buffer as many of the records as fit, drop the rest, and wake the
+        drainer once. Called by ``handle_batch`` (see :ref:`batching`).
+        """
+        room = max(self.capacity - len(self._buffer), 0)
+        if len(records) > room:
+            self.dropped += len(records) - room
+            records = records[:room]
+            if not records:
+                return
+        self._buffer.extend(records)
+        try:
+            self._wake()
+        except Exception:
+            self.handleError(records[-1])
+
+    def _wake(self):
+        if self._task is not None and (self._task.done()
+                                       or self._loop.is_closed()):
+            # Its loop has gone away -- perhaps closed without the task
+            # being cancelled
+            self._task = None
+        loop = _running_loop()
+        if self._task is None:
+            if loop is None:
+                self._deliver_rest()
+                return
+            self._start(loop)
+        if not self._wakeup.is_set():
+            if loop is self._loop:
+                self._wakeup.set()
+            else:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def aclose(self):
+        """Stop the drainer, after it has delivered everything buffered.
+        Call this from a coroutine running on the drainer's loop.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._deliver_rest()
+
+    def close(self):
+        """Deliver anything still buffered and shut down the executor thread.
+        Called by `logging` at exit.
+        """
+        try:
+            self._deliver_rest()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            super(AsyncioHandler, self).close()
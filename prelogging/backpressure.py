@@ -0,0 +1,162 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Adaptive verbosity: temporarily raise the levels of the noisiest loggers
+while a queue or buffered handler is falling behind.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from ._handler_lookup import lookup_handler
+
+__all__ = [
+    'AdaptiveVerbosityFilter',
+]
+
+
+class AdaptiveVerbosityFilter(logging.Filter):
+    """
+    .. _AdaptiveVerbosityFilter:
+
+    A filter, for a queue handler or buffered handler, that watches the
+    handler's backlog and sheds load at the source when it grows.
+
+    It lets every record through, but counts records by logger. At most every
+    ``interval`` seconds it checks the *pressure* on the handler: the depth of
+    its queue or buffer, and, if the handler reports one, its latency (how
+    far behind its output is, in seconds). When the depth reaches
+    ``high_water`` or the latency reaches ``max_latency``, the ``noisiest``
+    loggers of the last interval have their levels raised to ``raise_to``, so
+    that their less important records aren't even created. Once the depth is
+    down to ``low_water`` and the latency below half of ``max_latency``, their
+    levels are restored. Each change is logged, at level ``WARNING``, to the
+    logger ``prelogging.backpressure``.
+
+    The handler's depth is taken from ``queue.qsize()`` if ``queue`` is
+    given; otherwise from ``qsize()`` of the handler named ``handler``, or of
+    its ``queue`` attribute (as for ``QueueHandler``). Its latency is its
+    ``latency`` attribute, if it has one.
+    """
+    logger_name = 'prelogging.backpressure'
+
+    def __init__(self,
+                 handler=None,
+                 queue=None,
+                 high_water=1000,
+                 low_water=100,
+                 max_latency=None,
+                 raise_to='WARNING',
+                 noisiest=3,
+                 interval=1.0,
+                 name=''):
+        """
+        :param handler: the name of the handler to watch
+        :param queue: the queue to watch, instead of a handler's
+        :param high_water: depth at which levels are raised
+        :param low_water: depth at or below which levels are restored
+        :param max_latency: latency (seconds) at which levels are raised;
+            ``None`` means don't consider latency
+        :param raise_to: the level that noisy loggers are raised to
+        :param noisiest: how many loggers to raise at a time
+        :param interval: seconds between checks
+        :param name: as for ``logging.Filter``
+        """
+        super(AdaptiveVerbosityFilter, self).__init__(name)
+        self.handler_name = handler
+        self.queue = queue
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_latency = max_latency
+        self.raise_to = logging._checkLevel(raise_to)
+        self.noisiest = noisiest
+        self.interval = interval
+        self._handler = None
+        self._counts = Counter()
+        self._last_check = time.time()
+        self._raised = {}           # logger name -> level before raising
+        # Held while checking: by one thread at a time, and not re-entered
+        # when the filter sees the records that ``check`` logs
+        self._checking = threading.Lock()
+
+    @property
+    def raised(self):
+        """(r/o property) Names of the loggers whose levels are currently
+        raised."""
+        return sorted(self._raised)
+
+    def _depth(self):
+        q = self.queue
+        if q is None and self.handler_name:
+            if self._handler is None:
+                self._handler = lookup_handler(self.handler_name)
+            q = self._handler if hasattr(self._handler, 'qsize') \
+                              else getattr(self._handler, 'queue', None)
+        if q is None:
+            return None
+        try:
+            return q.qsize()
+        except NotImplementedError:     # multiprocessing.Queue on macOS
+            return None
+
+    def _latency(self):
+        return getattr(self._handler, 'latency', None)
+
+    def filter(self, record):
+        if not super(AdaptiveVerbosityFilter, self).filter(record):
+            return False
+        self._counts[record.name] += 1
+        if (record.created - self._last_check >= self.interval
+                and self._checking.acquire(False)):
+            try:
+                self.check()
+            finally:
+                self._checking.release()
+        return True
+
+    def check(self):
+        """Assess the pressure and raise or restore levels accordingly.
+        Called by ``filter`` every ``interval`` seconds.
+        """
+        self._last_check = time.time()
+        counts, self._counts = self._counts, Counter()
+        depth = self._depth()
+        latency = self._latency()
+        over = ((depth is not None and depth >= self.high_water)
+                or (latency is not None and self.max_latency is not None
+                    and latency >= self.max_latency))
+        under = ((depth is None or depth <= self.low_water)
+                 and (latency is None or self.max_latency is None
+                      or latency < self.max_latency / 2.0))
+        if over:
+            self._raise_levels(counts, depth, latency)
+        elif under and self._raised:
+            self._restore_levels(depth, latency)
+
+    def _raise_levels(self, counts, depth, latency):
+        log = logging.getLogger(self.logger_name)
+        candidates = [name for name, _ in counts.most_common()
+                      if name not in self._raised and name != self.logger_name
+                      and (logging.getLogger(name).getEffectiveLevel()
+                           < self.raise_to)]
+        for name in candidates[:self.noisiest]:
+            logger = logging.getLogger(name)
+            self._raised[name] = logger.level
+            logger.setLevel(self.raise_to)
+            log.warning("backpressure (depth %s, latency %s): raised level of "
+                        "logger '%s' to %s",
+                        depth, latency, name,
+                        logging.getLevelName(self.raise_to))
+
+    def _restore_levels(self, depth, latency):
+        log = logging.getLogger(self.logger_name)
+        raised, self._raised = self._raised, {}
+        for name, level in sorted(raised.items()):
+            logging.getLogger(name).setLevel(level)
+            log.warning("backpressure relieved (depth %s, latency %s): "
+                        "restored level of logger '%s' to %s",
+                        depth, latency, name, logging.getLevelName(level))
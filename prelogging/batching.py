@@ -0,0 +1,223 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+The batch protocol: handing a handler many records at once.
+
+A listener draining a backlog would otherwise call ``handle()`` once per
+record, so a file handler takes its lock, writes and flushes once per
+record. A handler that supports the protocol has a method
+``handle_batch(records)``, which does what ``handle`` does for each record,
+but with its lock taken once, and one write and one flush for the lot, and
+returns how many of the records passed its filters.
+
+``handle_batch(handler, records)`` passes records to any handler: through
+its ``handle_batch`` method if it has one; through built-in batch versions
+of ``emit`` for the plain `logging` stream, file, syslog and buffering
+handlers; else one record at a time. ``dispatch_batch(records)`` is the
+batch counterpart of ``Logger.handle``: it finds the handlers that would
+handle each record, and hands each handler all of its records in one batch.
+The listeners of ``prelogging.listeners`` use it.
+"""
+
+import logging
+import logging.handlers
+import socket
+
+from .six import RecursionError
+
+__all__ = [
+    'BatchingMixin',
+    'write_batch',
+    'handle_batch',
+    'dispatch_batch',
+]
+
+
+def _filtered(handler, records):
+    """Return the records that pass ``handler``'s filters (as ``handle``
+    would see them, if a filter returns a replacement record)."""
+    passed = []
+    for record in records:
+        rv = handler.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            passed.append(rv)
+        elif rv:
+            passed.append(record)
+    return passed
+
+
+def write_batch(handler, records):
+    """Format ``records`` and write them to ``handler.stream`` with one
+    ``write`` and one ``flush``, as ``StreamHandler.emit`` would one by one.
+    The caller holds the handler's lock.
+    """
+    if handler.stream is None:
+        # A FileHandler with delay=True that hasn't opened its file yet;
+        # as FileHandler.emit does
+        if handler.mode == 'w' and getattr(handler, '_closed', False):
+            return
+        handler.stream = handler._open()
+    terminator = handler.terminator
+    texts = []
+    for record in records:
+        try:
+            texts.append(handler.format(record) + terminator)
+        except Exception:
+            handler.handleError(record)
+    if not texts:
+        return
+    try:
+        handler.stream.write(''.join(texts))
+        handler.flush()
+    except RecursionError:                  # as StreamHandler.emit does
+        raise
+    except Exception:
+        handler.handleError(records[-1])
+
+
+def _syslog_emit_batch(handler, records):
+    if (handler.socktype != socket.SOCK_STREAM or handler.unixsocket
+            or not handler.socket):
+        # One datagram per message, whatever we do. (Not handler.emit: a
+        # subclass's may take a lock that the caller holds)
+        for record in records:
+            logging.handlers.SysLogHandler.emit(handler, record)
+        return
+    msgs = []
+    for record in records:
+        try:
+            msg = handler.format(record)
+            # Python 2 has neither attribute, and always appends the NUL
+            ident = getattr(handler, 'ident', '')
+            if ident:
+                msg = ident + msg
+            if getattr(handler, 'append_nul', True):
+                msg += '\000'
+            prio = '<%d>' % handler.encodePriority(
+                handler.facility, handler.mapPriority(record.levelname))
+            msgs.append(prio.encode('utf-8') + msg.encode('utf-8'))
+        except Exception:
+            handler.handleError(record)
+    if msgs:
+        try:
+            handler.socket.sendall(b''.join(msgs))
+        except Exception:
+            handler.handleError(records[-1])
+
+
+def _buffering_emit_batch(handler, records):
+    handler.buffer.extend(records)
+    if any(handler.shouldFlush(record) for record in records):
+        handler.flush()
+
+
+# Batch versions of ``emit`` for `logging` handler classes -- exact classes
+# only, as a subclass may have its own ``emit``
+_emit_batch_for_class = {
+    logging.StreamHandler: write_batch,
+    logging.FileHandler: write_batch,
+    logging.handlers.SysLogHandler: _syslog_emit_batch,
+    logging.handlers.BufferingHandler: _buffering_emit_batch,
+    logging.handlers.MemoryHandler: _buffering_emit_batch,
+}
+
+
+class BatchingMixin(object):
+    """Mix in to a ``logging.Handler`` subclass to support the batch
+    protocol. ``handle_batch`` filters the records and takes the handler's
+    lock once; the subclass overrides ``emit_batch`` to write them in bulk.
+    """
+    def handle_batch(self, records):
+        """Filter ``records`` and emit those that pass, holding the
+        handler's lock once for all of them. Return how many passed.
+        """
+        records = _filtered(self, records)
+        if not records:
+            return 0
+        self.acquire()
+        try:
+            self.emit_batch(records)
+        finally:
+            self.release()
+        return len(records)
+
+    def emit_batch(self, records):
+        """Emit ``records``. The default emits them one at a time;
+        override this to do better. Called with the handler's lock held.
+        """
+        for record in records:
+            self.emit(record)
+
+
+def handle_batch(handler, records):
+    """Pass ``records`` to ``handler``, in one batch if it can take one.
+
+    Like ``handler.handle``, this applies the handler's filters but not its
+    level. Return how many of the records passed the filters and were
+    emitted.
+    """
+    if hasattr(handler, 'handle_batch'):
+        handled = handler.handle_batch(records)
+        # A handle_batch that returns nothing is taken to handle them all
+        return len(records) if handled is None else handled
+    emit_batch = _emit_batch_for_class.get(type(handler))
+    if emit_batch is None:
+        handled = 0
+        for record in records:
+            if handler.handle(record):
+                handled += 1
+        return handled
+    records = _filtered(handler, records)
+    if not records:
+        return 0
+    handler.acquire()
+    try:
+        emit_batch(handler, records)
+    finally:
+        handler.release()
+    return len(records)
+
+
+def _handlers_for(logger, record):
+    """Return the handlers that ``logger.callHandlers(record)`` would pass
+    ``record`` to."""
+    handlers = []
+    found = 0
+    c = logger
+    while c:
+        for hdlr in c.handlers:
+            found += 1
+            if record.levelno >= hdlr.level:
+                handlers.append(hdlr)
+        c = c.parent if c.propagate else None
+    if not found and logging.lastResort:
+        if record.levelno >= logging.lastResort.level:
+            handlers.append(logging.lastResort)
+    return handlers
+
+
+def dispatch_batch(records):
+    """Hand ``records`` to the loggers they were logged to, as
+    ``logging.getLogger(record.name).handle(record)`` would each one, except
+    that each handler gets all of its records in one batch, in order.
+    """
+    batches = {}                # handler -> records
+    order = []                  # handlers, in order of first use
+    for record in records:
+        logger = logging.getLogger(record.name)
+        if logger.disabled:
+            continue
+        rv = logger.filter(record)
+        if not rv:
+            continue
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        for hdlr in _handlers_for(logger, record):
+            if hdlr not in batches:
+                batches[hdlr] = []
+                order.append(hdlr)
+            batches[hdlr].append(record)
+    for hdlr in order:
+        handle_batch(hdlr, batches[hdlr])
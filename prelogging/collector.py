@@ -0,0 +1,438 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+A log collector for processes that don't share a parent: a server that
+listens on a TCP or Unix domain socket and hands the records it receives to
+the handlers of its own logging configuration (typically built with an
+``LCDict``), and ``CollectorHandler``, a client handler that sends records
+to it in batches over one persistent connection.
+
+Run a collector with::
+
+    $ python -m prelogging.collector --tcp localhost:9020
+    $ python -m prelogging.collector --unix /tmp/prelogging.sock --config mypkg.logconf:lcd
+
+where ``--config`` names an ``LCDict``, or a callable returning one, that
+configures the collector's handlers. Clients use
+``LCDict.add_collector_handler``.
+
+On the wire, each batch is a 4-byte big-endian length followed by a UTF-8
+JSON array of record dicts. Unlike ``logging.handlers.SocketHandler``, which
+uses ``pickle``, nothing received is ever unpickled, so a collector doesn't
+execute code supplied by whoever connects to it.
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:                     # pragma: no cover
+    import SocketServer as socketserver     # PY2
+
+from . import lifecycle
+from .batching import BatchingMixin
+
+__all__ = [
+    'CollectorHandler',
+    'CollectorServer',
+]
+
+_header = struct.Struct('>L')
+
+# Refuse frames bigger than this (bytes): a collector shouldn't be made to
+# allocate arbitrary amounts of memory by a bad client.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+def _make_socket(address, timeout=None):
+    """Return a connected socket: TCP if ``address`` is a (host, port) pair,
+    Unix domain if it's a path.
+    """
+    if isinstance(address, (tuple, list)):
+        return socket.create_connection(tuple(address), timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+# -----------------------------------------------------------------------
+# CollectorHandler -- the client side
+# -----------------------------------------------------------------------
+
+class CollectorHandler(logging.Handler, BatchingMixin):
+    """A handler that sends records to a collector in batches, over a single
+    connection that it keeps open and reuses.
+
+    A batch is sent when it holds ``batch_size`` records, when a record at or
+    above ``flush_level`` arrives, or every ``flush_interval`` seconds,
+    whichever comes first. If the collector can't be reached, the batch is
+    dropped (and counted in ``dropped``), and reconnection is retried with
+    exponential backoff, as ``SocketHandler`` does.
+    """
+    retry_start = 1.0
+    retry_max = 30.0
+    retry_factor = 2.0
+
+    def __init__(self, address,
+                 batch_size=100,
+                 flush_interval=1.0,
+                 flush_level='ERROR',
+                 timeout=5.0,
+                 **kwargs):
+        """
+        :param address: ``(host, port)`` for TCP, or the path of a Unix
+            domain socket
+        :param batch_size: the most records sent in one batch
+        :param flush_interval: the longest (seconds) a record waits to be sent
+        :param flush_level: records at or above this level are sent at once,
+            along with any batched records before them
+        :param timeout: socket timeout (seconds)
+        """
+        super(CollectorHandler, self).__init__(**kwargs)
+        if isinstance(address, (tuple, list)):
+            address = tuple(address)
+        self.address = address
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = logging._checkLevel(flush_level)
+        self.timeout = timeout
+        self.dropped = 0
+        self._batch = []            # JSON texts of records
+        self._sock = None
+        self._retry_time = None
+        self._retry_period = self.retry_start
+        self._flusher = None
+        self._closing = threading.Event()
+        lifecycle.register_drainable(self)
+
+    def _prepare(self, record):
+        """Return the JSON text of a dict representation of ``record``,
+        with the message merged with its args and any exception formatted,
+        as ``SocketHandler.makePickle`` does.
+        """
+        if record.exc_info:
+            self.format(record)         # sets record.exc_text
+        d = dict(record.__dict__)
+        d['msg'] = record.getMessage()
+        d['args'] = None
+        d['exc_info'] = None
+        d.pop('message', None)
+        return json.dumps(d, default=str)
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._flush_periodically,
+                                         name='CollectorHandler-flusher')
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closing.wait(self.flush_interval):
+            self.flush()
+
+    def emit(self, record):
+        """Add ``record`` to the current batch, sending the batch if it's due.
+        Called by `logging`, with the handler's lock held.
+        """
+        try:
+            self._batch.append(self._prepare(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if self._flusher is None and self.flush_interval:
+            self._start_flusher()
+        if (len(self._batch) >= self.batch_size
+                or record.levelno >= self.flush_level):
+            self._send_batch()
+
+    def emit_batch(self, records):
+        """Add ``records`` to the current batch, sending it if it's due.
+        Called by ``handle_batch`` (see :ref:`batching`), with the handler's
+        lock held.
+        """
+        urgent = False
+        for record in records:
+            try:
+                self._batch.append(self._prepare(record))
+            except Exception:
+                self.handleError(record)
+                continue
+            urgent = urgent or record.levelno >= self.flush_level
+        if self._flusher is None and self.flush_interval:
+            self._start_flusher()
+        if urgent or len(self._batch) >= self.batch_size:
+            self._send_batch()
+
+    def flush(self):
+        """Send the current batch, if any."""
+        self.acquire()
+        try:
+            self._send_batch()
+        finally:
+            self.release()
+
+    def _connect(self):
+        """Make sure there's a connection, unless we're backing off.
+
+        :return: the socket, or ``None``
+        """
+        if self._sock is not None:
+            return self._sock
+        now = time.time()
+        if self._retry_time is not None and now < self._retry_time:
+            return None
+        try:
+            self._sock = _make_socket(self.address, self.timeout)
+            self._retry_time = None
+            self._retry_period = self.retry_start
+        except (socket.error, OSError):
+            self._retry_time = now + self._retry_period
+            self._retry_period = min(self._retry_period * self.retry_factor,
+                                     self.retry_max)
+        return self._sock
+
+    def _send_batch(self):
+        """Send the current batch; the caller holds the handler's lock."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        payload = ('[' + ','.join(batch) + ']').encode('utf-8')
+        sock = self._connect()
+        if sock is None:
+            self.dropped += len(batch)
+            return
+        try:
+            sock.sendall(_header.pack(len(payload)) + payload)
+        except (socket.error, OSError):
+            self.dropped += len(batch)
+            self._close_socket()
+
+    def drain(self, deadline):
+        """Send the current batch, giving up at time ``deadline``. Called by
+        the :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        if not self.lock.acquire(timeout=lifecycle.remaining(deadline)):
+            return len(self._batch)
+        try:
+            dropped = self.dropped
+            timeout, self.timeout = self.timeout, min(
+                self.timeout, lifecycle.remaining(deadline))
+            try:
+                if self._sock is not None:
+                    self._sock.settimeout(self.timeout)
+                self._send_batch()
+            finally:
+                self.timeout = timeout
+                if self._sock is not None:
+                    self._sock.settimeout(timeout)
+            return self.dropped - dropped
+        finally:
+            self.lock.release()
+
+    def before_fork(self):
+        """Send the current batch, so that the child doesn't inherit it.
+        Called by the :ref:`at-fork hooks <lifecycle>`.
+        """
+        self.flush()
+
+    def after_fork_in_child(self):
+        """Drop the parent's connection and flusher thread; the child makes
+        its own when it logs. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._batch = []
+        if self._sock is not None:
+            # Closes only the child's copy: the parent's connection is intact
+            self._close_socket()
+        self._flusher = None
+        self._closing = threading.Event()
+
+    def _close_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def close(self):
+        """Send what's left, close the connection and stop the flusher."""
+        self._closing.set()
+        self.acquire()
+        try:
+            self._send_batch()
+            self._close_socket()
+        finally:
+            self.release()
+        if self._flusher is not None:
+            self._flusher.join(self.flush_interval + 1)
+            self._flusher = None
+        super(CollectorHandler, self).close()
+
+
+# -----------------------------------------------------------------------
+# CollectorServer -- the collector itself
+# -----------------------------------------------------------------------
+
+def _recv_exactly(sock, n):
+    """Return ``n`` bytes read from ``sock``, or ``None`` at end-of-file."""
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+class _CollectorRequestHandler(socketserver.BaseRequestHandler):
+    """Handle one client connection: read batches until the client hangs up,
+    handing each record to the logger it was logged to.
+    """
+    def handle(self):
+        while True:
+            header = _recv_exactly(self.request, _header.size)
+            if header is None:
+                return
+            size = _header.unpack(header)[0]
+            if size > MAX_FRAME_SIZE:
+                return
+            payload = _recv_exactly(self.request, size)
+            if payload is None:
+                return
+            for d in json.loads(payload.decode('utf-8')):
+                record = logging.makeLogRecord(d)
+                logging.getLogger(record.name).handle(record)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+        daemon_threads = True
+else:                                                       # pragma: no cover
+    _UnixServer = None
+
+
+class CollectorServer(object):
+    """A collector listening on a TCP or Unix domain socket. It serves each
+    connection on its own thread. Records received are handled by the
+    loggers and handlers of this process, so configure logging (e.g. with
+    ``LCDict.config()``) before calling ``serve_forever``.
+    """
+    def __init__(self, address):
+        """
+        :param address: ``(host, port)`` for TCP, or a filesystem path for a
+            Unix domain socket. A stale socket file at that path is removed.
+        """
+        if isinstance(address, (tuple, list)):
+            self._server = _TCPServer(tuple(address), _CollectorRequestHandler)
+            self._path = None
+        else:
+            if _UnixServer is None:                         # pragma: no cover
+                raise NotImplementedError("Unix domain sockets aren't "
+                                          "available on this platform")
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = _UnixServer(address, _CollectorRequestHandler)
+            self._path = address
+
+    @property
+    def address(self):
+        """(r/o property) The address actually bound -- useful if port 0
+        was requested."""
+        return self._server.server_address
+
+    def serve_forever(self, poll_interval=0.5):
+        self._server.serve_forever(poll_interval)
+
+    def shutdown(self):
+        """Stop ``serve_forever`` (from another thread) and close the socket."""
+        self._server.shutdown()
+        self.close()
+
+    def close(self):
+        """Close the socket, and remove the socket file of a Unix domain
+        socket. Call this once ``serve_forever`` has returned."""
+        self._server.server_close()
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+
+# -----------------------------------------------------------------------
+# python -m prelogging.collector
+# -----------------------------------------------------------------------
+
+def _load_lcdict(spec):
+    """Resolve ``'module:attr'`` to an LCDict, calling ``attr`` if it's
+    callable."""
+    import importlib
+    modname, _, attr = spec.partition(':')
+    obj = getattr(importlib.import_module(modname), attr or 'lcdict')
+    return obj() if callable(obj) else obj
+
+
+def main(argv=None):
+    import argparse
+    from .lcdict import LCDict
+
+    parser = argparse.ArgumentParser(
+        prog='python -m prelogging.collector',
+        description="Receive log records from CollectorHandlers and "
+                    "log them with this process's handlers.")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--tcp', metavar='HOST:PORT',
+                       help="listen on this TCP address")
+    where.add_argument('--unix', metavar='PATH',
+                       help="listen on this Unix domain socket")
+    parser.add_argument('--config', metavar='MODULE:ATTR',
+                        help="an LCDict, or a callable returning one, that "
+                             "configures the collector's handlers; by default "
+                             "records are written to stderr")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        lcd = _load_lcdict(args.config)
+    else:
+        lcd = LCDict(root_level='DEBUG', attach_handlers_to_root=True)
+        lcd.add_stderr_handler('console',
+                               formatter='process_time_logger_level_msg')
+    lcd.config()
+
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        address = (host or 'localhost', int(port))
+    else:
+        address = args.unix
+    server = CollectorServer(address)
+    sys.stderr.write("prelogging collector listening on %s\n"
+                     % (server.address,))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
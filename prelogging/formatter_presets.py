@@ -2,6 +2,7 @@ from collections import namedtuple
 import sys
 from textwrap import dedent
 from .six import PY2
+from .formatters import _structured_formatters
 
 __author__ = "Brian O'Neill"
 __all__ = ['update_formatter_presets_from_file', 'update_formatter_presets']
@@ -13,8 +14,21 @@ __all__ = ['update_formatter_presets_from_file', 'update_formatter_presets']
 
 _formatter_spec_fields = ('format', 'dateformat', 'style')
 
+# Boolean options of LCDict.add_formatter, which select
+# prelogging.formatters.FastFormatter and its features
+_formatter_option_keys = ('fast', 'cache_time', 'utc', 'cache_output',
+                          'repeat_tracebacks')
 
-class FormatterSpec( namedtuple('_FormatterSpec_', _formatter_spec_fields) ):
+# Integer options of LCDict.add_formatter, likewise selecting FastFormatter
+_formatter_count_keys = ('traceback_cache',)
+
+# Option of LCDict.add_formatter selecting a structured formatter:
+# its value is one of the keys of prelogging.formatters._structured_formatters
+_formatter_structured_key = 'structured'
+
+
+class FormatterSpec( namedtuple('_FormatterSpec_',
+                                _formatter_spec_fields + ('options',)) ):
     """A namedtuple-derived lightweight class representing formatters.
     We subclass in order to allow variant spellings for parameters,
     to allow default values, and to easily convert to a dict.
@@ -24,26 +38,37 @@ class FormatterSpec( namedtuple('_FormatterSpec_', _formatter_spec_fields) ):
     def __new__(cls, format,
                 datefmt=None,
                 dateformat=None,
-                style='%'):
+                style='%',
+                **options):
         """
         :param format: a (logging) format string
         :param datefmt: a date-format string; mutually exclusive with dateformat
         :param dateformat: a date-format string; mutually exclusive with datefmt
         :param style: one of "%{$"
+        :param options: formatter options, as for ``LCDict.add_formatter``:
+            ``fast``, ``cache_time``, ``utc``, ``cache_output``,
+            ``traceback_cache``, ``repeat_tracebacks``, ``structured``
         """
         dateformat = datefmt or dateformat
-        return super(FormatterSpec, cls).__new__(cls, format, dateformat, style)
+        for key in options:
+            if key not in (_formatter_option_keys + _formatter_count_keys
+                           + (_formatter_structured_key,)):
+                raise TypeError("unexpected formatter option '%s'" % key)
+        return super(FormatterSpec, cls).__new__(
+            cls, format, dateformat, style, tuple(sorted(options.items())))
 
     def to_dict(self):
         """
         Return a dict representation, whose keys are ``_formatter_spec_fields``
         except that 'dateformat' is changed to 'datefmt'),
+        plus the names of any options,
         and which omits items with ``None`` values.
 
         :return: a dict
         """
         d = {k: getattr(self, k) for k in _formatter_spec_fields}
         d['datefmt'] = d.pop('dateformat', None)
+        d.update(self.options)
         return {k: v for k, v in d.items() if v}
 
 
@@ -157,8 +182,36 @@ def _parse_line(line):   # -> Tuple[LineType, (str or Tuple[str, str] or None)]
     return KEY_VAL, (_clean(parts[0], "key"), _clean(parts[1], "value"))
 
 
+def _option_value(s):               # -> bool
+    value = s.lower()
+    if value in ('true', 'yes', 'on', '1'):
+        return True
+    if value in ('false', 'no', 'off', '0'):
+        return False
+    raise ValueError("bad value '%s' -- must be true or false" % s)  # | raise
+
+
+def _count_value(s):                # -> int
+    try:
+        value = int(s)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError("bad value '%s' -- must be a nonnegative integer" % s)  # | raise
+    return value
+
+
+def _structured_value(s):           # -> str
+    if s not in _structured_formatters:
+        raise ValueError("bad value '%s' -- must be one of %s"
+                         % (s, ", ".join("'%s'" % k
+                                         for k in sorted(_structured_formatters))))  # | raise
+    return s
+
+
 def _make_formatter_specs(lines):             # -> Dict[str, FormatterSpec]
-    keys = ('format', 'dateformat', 'style')
+    keys = (_formatter_spec_fields + _formatter_option_keys
+            + _formatter_count_keys + (_formatter_structured_key,))
 
     name = ''
     new_formatter_specs = {}
@@ -193,8 +246,14 @@ def _make_formatter_specs(lines):             # -> Dict[str, FormatterSpec]
                 if linetype == KEY_VAL:
                     key, value = data
                     if key not in keys:
-                        raise ValueError("bad key '%s' -- must be one of "
-                                         "'format', 'dateformat', 'style'" % key)          # | raise
+                        raise ValueError("bad key '%s' -- must be one of %s"
+                                         % (key, ", ".join("'%s'" % k for k in keys)))   # | raise
+                    if key in _formatter_option_keys:
+                        value = _option_value(value)
+                    elif key in _formatter_count_keys:
+                        value = _count_value(value)
+                    elif key == _formatter_structured_key:
+                        value = _structured_value(value)
                     fields[key] = value
                     # expecting = KEY_VAL
                 elif linetype == BLANK:
@@ -0,0 +1,729 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Faster formatters.
+
+``logging.Formatter`` interprets its format string anew for every record: it
+asks the format string whether it uses ``asctime``, then renders it against
+the record's ``__dict__`` with ``%``, ``str.format`` or ``Template``, finding
+each field by name. ``FastFormatter`` parses the format string once, when
+it's created, and compiles it into a function that renders a record with one
+``%`` operation on a tuple of the record's attributes -- fixed-width padding
+such as ``%(name)-20s`` included, in all three styles.
+
+``FastFormatter`` can also cache the text of ``asctime``: ``time.strftime``
+is among the most expensive parts of formatting a record, yet its output
+changes only once a second. With ``cache_time=True``, a formatter renders
+the date and time once per second, and per record only splices in the
+milliseconds. ``utc=True`` renders times in UTC, and the special date format
+``ISO8601`` renders them as, e.g., ``2017-03-12T14:05:09.123+01:00``.
+
+With ``cache_output=True``, a ``FastFormatter`` also remembers the text of
+the last record it formatted. ``dictConfig`` creates one formatter per entry
+in the ``formatters`` dict, shared by all the handlers that name it, so a
+record that goes to several of those handlers -- a console and two files,
+say -- is formatted once, not once per handler (unless a handler's filter
+changes something the text depends on).
+
+In an exception storm, the same traceback is rendered over and over -- each
+time reading the source line of every frame. With ``traceback_cache=n``, a
+``FastFormatter`` renders the frames of each distinct traceback (by
+exception type and code locations) once, and keeps the ``n`` most recently
+used; only the exception's message is rendered anew. With
+``repeat_tracebacks``, a traceback seen before is written as a reference,
+``Same traceback as #3``, followed by the exception's message.
+
+``LCDict.add_formatter(..., fast=True)`` adds a ``FastFormatter`` (as do
+its ``cache_time`` and ``utc`` options); ``LCDict(fast_formatters=True)``
+makes that the default, for formatter presets too.
+
+``JsonFormatter`` and ``LogfmtFormatter`` render records as structured
+lines -- a JSON object, or logfmt ``key=value`` pairs -- for log indexers.
+The fields of their format strings, in order, are the keys of each line,
+followed by any ``extra`` attributes of the record and its exception and
+stack info. ``LCDict.add_formatter(..., structured='json')`` (or
+``'logfmt'``) adds one, as do the ``json`` and ``logfmt`` presets.
+"""
+
+import collections
+import json
+from json.encoder import encode_basestring as _json_string
+import keyword
+import logging
+import re
+import string
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import orjson
+except ImportError:                     # pragma: no cover
+    orjson = None
+
+__all__ = [
+    'FastFormatter',
+    'ISO8601',
+    'JsonFormatter',
+    'LogfmtFormatter',
+]
+
+# Whether ``logging.Formatter`` takes ``validate`` (Python 3.8+)
+_FORMATTER_VALIDATES = sys.version_info >= (3, 8)
+
+# A date format, understood by ``FastFormatter``: ISO 8601, with milliseconds
+# and the UTC offset
+ISO8601 = 'ISO8601'
+
+
+# -----------------------------------------------------------------------
+# Compiling format strings
+# -----------------------------------------------------------------------
+
+# A field of a %-style format string, as logging.PercentStyle validates it
+_percent_field = re.compile(
+    r'%\((?P<key>[^)]+)\)(?P<spec>[#0+ -]*(?:\*|\d+)?(?:\.(?:\*|\d+))?'
+    r'[diouxXeEfFgGcrsa%])')
+
+
+def _attr(key):
+    """Return an expression for attribute ``key`` of record ``r``."""
+    if key.isidentifier() and not keyword.iskeyword(key):
+        return 'r.' + key
+    return 'r.__dict__[%r]' % key
+
+
+def _percent_parts(fmt):
+    """Return ``(template, keys)``: a %-format string without field names,
+    and the names of its fields, in order.
+    """
+    keys = []
+
+    def unname(m):
+        keys.append(m.group('key'))
+        return '%' + m.group('spec')
+
+    return _percent_field.sub(unname, fmt), keys
+
+
+def _brace_parts(fmt):
+    """As for ``_percent_parts``, from a ``{``-style format string; or
+    ``None``, if it has fields that aren't names of record attributes, or
+    nested replacement fields.
+    """
+    pieces = []
+    keys = []
+    for literal, field, spec, conversion in string.Formatter().parse(fmt):
+        pieces.append(literal.replace('%', '%%'))
+        if field is None:
+            continue
+        m = re.match(r'[^.[]+', field)
+        if not m or m.group(0).isdigit() or m.end() != len(field):
+            return None         # positional, indexed or dotted field
+        if '{' in (spec or ''):
+            return None         # nested field
+        keys.append(field)
+        # Render with format() when there's a conversion or spec, else %s
+        pieces.append('%s')
+        if spec or conversion:
+            keys[-1] = (field, conversion, spec)
+    return ''.join(pieces), keys
+
+
+def _dollar_parts(fmt):
+    """As for ``_percent_parts``, from a ``$``-style format string; or
+    ``None``, if it has invalid placeholders.
+    """
+    pieces = []
+    keys = []
+    pos = 0
+    for m in string.Template.pattern.finditer(fmt):
+        if m.group('invalid') is not None:
+            return None
+        pieces.append(fmt[pos:m.start()].replace('%', '%%'))
+        pos = m.end()
+        if m.group('escaped') is not None:
+            pieces.append('$')
+        else:
+            keys.append(m.group('named') or m.group('braced'))
+            pieces.append('%s')
+    pieces.append(fmt[pos:].replace('%', '%%'))
+    return ''.join(pieces), keys
+
+
+def compile_format(fmt, style='%'):
+    """Compile ``fmt``, a format string of style ``style``, into a function
+    ``render(record)`` that returns what ``logging.Formatter.formatMessage``
+    would. Return ``None`` if ``fmt`` uses features that this doesn't
+    handle (e.g. ``{``-style positional or nested fields), which
+    ``logging.Formatter`` handles.
+    """
+    if style == '%':
+        parts = _percent_parts(fmt)
+    elif style == '{':
+        parts = _brace_parts(fmt)
+    elif style == '$':
+        parts = _dollar_parts(fmt)
+    else:
+        raise ValueError('Style must be one of: %, {, $')
+    if parts is None:
+        return None
+    template, keys = parts
+    namespace = {'_template': template, '_format': format}
+    args = []
+    for key in keys:
+        if isinstance(key, tuple):      # {key!conversion:spec}
+            key, conversion, spec = key
+            expr = _attr(key)
+            if conversion:
+                expr = {'r': 'repr', 's': 'str', 'a': 'ascii'}[conversion] \
+                       + '(%s)' % expr
+            args.append('_format(%s, %r)' % (expr, spec))
+        else:
+            args.append(_attr(key))
+    if not args:
+        if style == '%':
+            try:
+                template = template % ()    # just '%%' escapes
+            except (TypeError, ValueError):
+                return None
+        return lambda r: template
+    source = 'lambda r: _template %% (%s,)' % ', '.join(args)
+    return eval(source, namespace)
+
+
+def _format_keys(fmt, style='%'):
+    """Return the record attributes that format string ``fmt``, of style
+    ``style``, uses, in order of first use; or ``None`` if that can't be
+    determined.
+    """
+    parts = {'%': _percent_parts,
+             '{': _brace_parts,
+             '$': _dollar_parts}[style](fmt)
+    if parts is None:
+        return None
+    keys = []
+    for key in parts[1]:
+        key = key[0] if isinstance(key, tuple) else key
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+# Record attributes that any formatter's output may depend on
+_OUTPUT_ATTRIBUTES = ['msg', 'args', 'created', 'stack_info']
+
+
+def format_fields(fmt, style='%'):
+    """Return the set of record attributes that format string ``fmt``, of
+    style ``style``, uses; or ``None`` if that can't be determined.
+    """
+    keys = _format_keys(fmt, style)
+    return set(keys) if keys is not None else None
+
+
+# -----------------------------------------------------------------------
+# Caching tracebacks
+# -----------------------------------------------------------------------
+
+_TRACEBACK_HEADER = 'Traceback (most recent call last):\n'
+
+# As ``traceback`` joins chained exceptions
+_CAUSE_MESSAGE = ('\nThe above exception was the direct cause '
+                  'of the following exception:\n\n')
+_CONTEXT_MESSAGE = ('\nDuring handling of the above exception, '
+                    'another exception occurred:\n\n')
+
+try:
+    _ExceptionGroup = BaseExceptionGroup        # Python 3.11+
+except NameError:                               # pragma: no cover
+    _ExceptionGroup = ()
+
+
+def _exception_chain(exc, tb):
+    """Return the chain of ``exc`` -- its causes and contexts -- as a list
+    of ``(exception, traceback, text that follows it)``, oldest first; or
+    ``None`` if it includes an exception group, whose rendering isn't
+    handled here.
+    """
+    chain = []
+    follows = None
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, _ExceptionGroup):
+            return None
+        seen.add(id(exc))
+        chain.append((exc, tb, follows))
+        if exc.__cause__ is not None:
+            exc, follows = exc.__cause__, _CAUSE_MESSAGE
+        elif exc.__context__ is not None and not exc.__suppress_context__:
+            exc, follows = exc.__context__, _CONTEXT_MESSAGE
+        else:
+            exc = None
+        tb = exc.__traceback__ if exc is not None else None
+    chain.reverse()
+    return chain
+
+
+def _frames_key(tb):
+    """Return the code locations of the frames of traceback ``tb``."""
+    key = []
+    while tb is not None:
+        key.append((tb.tb_frame.f_code, tb.tb_lineno, tb.tb_lasti))
+        tb = tb.tb_next
+    return tuple(key)
+
+
+def _frames_text(tb):
+    return _TRACEBACK_HEADER + ''.join(traceback.extract_tb(tb).format())
+
+
+# -----------------------------------------------------------------------
+# FastFormatter
+# -----------------------------------------------------------------------
+
+class FastFormatter(logging.Formatter):
+    """
+    .. _FastFormatter:
+
+    (*Python 3 only*) A ``logging.Formatter`` whose format string is compiled,
+    when it's created, into a function specialized to render it (see
+    ``compile_format``). Its output is the same as ``logging.Formatter``'s.
+
+    A format string that the compiler doesn't handle -- or a formatter with
+    ``defaults`` -- is rendered as ``logging.Formatter`` renders it.
+
+    With ``cache_time``, ``formatTime`` renders each second once, and caches
+    the text; the output is unchanged. A ``datefmt`` of ``ISO8601`` is
+    rendered as ISO 8601, with milliseconds and UTC offset (``Z`` if
+    ``utc``), whether or not ``cache_time``.
+
+    With ``cache_output``, formatting the record that was formatted last
+    returns the same text, without rendering it again, unless any
+    attribute that the text depends on -- a field of the format string,
+    ``msg``, ``args``, ``created``, the exception or stack info (and, for
+    the structured formatters, an ``extra`` attribute) -- has since been
+    replaced, e.g. by a handler's filter. The formatter remembers the
+    record by its ``id``, so the cache doesn't keep it alive.
+
+    With ``traceback_cache``, ``formatException`` renders the frames of
+    each distinct traceback once, and caches the text (in an LRU cache of
+    that many tracebacks); the output is unchanged. With
+    ``repeat_tracebacks`` too, the first rendering of a traceback is
+    numbered, ``Traceback #3 (most recent call last):``, and later ones are
+    written as ``Same traceback as #3`` and the exception's message. (The
+    numbers refer to this formatter's output, so such text isn't left in
+    ``record.exc_text`` for other formatters.)
+    """
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True,
+                 cache_time=False, utc=False, cache_output=False,
+                 traceback_cache=0, repeat_tracebacks=False,
+                 **kwargs):
+        """
+        :param fmt: the format string
+        :param datefmt: the date-format string, or ``ISO8601``
+        :param style: one of ``'%'``, ``'{'``, ``'$'``
+        :param validate: as for ``logging.Formatter`` (ignored before
+            Python 3.8)
+        :param cache_time: render the time once per second
+        :param utc: render times in UTC rather than local time
+        :param cache_output: remember the text of the last record formatted
+        :param traceback_cache: the number of distinct tracebacks to cache
+            the text of; 0 for none
+        :param repeat_tracebacks: write tracebacks seen before as
+            references to their first rendering (needs ``traceback_cache``)
+        :param kwargs: passed to ``logging.Formatter`` (``defaults``, in
+            Python 3.10+)
+        """
+        if _FORMATTER_VALIDATES:
+            kwargs['validate'] = validate
+        super(FastFormatter, self).__init__(fmt, datefmt, style, **kwargs)
+        self._uses_time = self._style.usesTime()
+        render = None
+        if not kwargs.get('defaults'):
+            render = compile_format(self._style._fmt, style)
+        self._render = render or self._style.format
+        self.cache_time = cache_time
+        if utc:
+            self.converter = time.gmtime
+        # (second, datefmt, text of that second): replaced, never mutated,
+        # so threads can share it without a lock
+        self._time_cache = (None, None, None)
+        fields = _format_keys(self._style._fmt, style)
+        # The record attributes that the output depends on, besides the
+        # exception info; with ``None``, the output isn't cached
+        self._output_fields = (
+            None if fields is None else
+            tuple(_OUTPUT_ATTRIBUTES
+                  + [f for f in fields if f not in _OUTPUT_ATTRIBUTES
+                     and f not in ('message', 'asctime')]))
+        self.cache_output = cache_output and fields is not None
+        # (key of the record, its text), likewise
+        self._last_output = (None, None)
+        self.traceback_cache = traceback_cache
+        self.repeat_tracebacks = repeat_tracebacks and bool(traceback_cache)
+        # frames key -> text; (type, frames key)s of a chain -> number
+        self._tracebacks = collections.OrderedDict()
+        self._traceback_numbers = collections.OrderedDict()
+        self._traceback_count = 0
+        self._traceback_lock = threading.Lock()
+
+    def usesTime(self):
+        """Return whether the format string uses ``asctime`` -- decided
+        once, when the formatter was created."""
+        return self._uses_time
+
+    def _second_text(self, second, datefmt):
+        """Return the text of ``second`` (a time), less the milliseconds."""
+        ct = self.converter(second)
+        if datefmt == ISO8601:
+            offset = time.strftime('%z', ct)
+            if self.converter is time.gmtime or not offset:
+                offset = 'Z'
+            else:
+                offset = offset[:3] + ':' + offset[3:]
+            return time.strftime('%Y-%m-%dT%H:%M:%S', ct), offset
+        return time.strftime(datefmt or self.default_time_format, ct), None
+
+    def formatTime(self, record, datefmt=None):
+        """Return the creation time of ``record``, as text -- the same text
+        as ``logging.Formatter.formatTime``, except for a ``datefmt`` of
+        ``ISO8601``. With ``cache_time``, the text of each second is
+        rendered once.
+        """
+        if not self.cache_time and datefmt != ISO8601:
+            return super(FastFormatter, self).formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached_datefmt, text = self._time_cache
+        if second != cached_second or datefmt != cached_datefmt:
+            text = self._second_text(second, datefmt)
+            self._time_cache = (second, datefmt, text)
+        head, offset = text
+        if offset is not None:                          # ISO8601
+            return '%s.%03d%s' % (head, record.msecs, offset)
+        if datefmt or not self.default_msec_format:
+            return head
+        return self.default_msec_format % (head, record.msecs)
+
+    def format(self, record):
+        """Return ``record`` as text -- remembered, with ``cache_output``,
+        if it was the last record formatted."""
+        if self.cache_output:
+            key = self._output_key(record)
+            last_key, text = self._last_output
+            if key == last_key:
+                return text
+        text = self._format(record)
+        if self.repeat_tracebacks and record.exc_info:
+            record.exc_text = None
+        if self.cache_output:
+            self._last_output = (key, text)
+        return text
+
+    def _output_key(self, record):
+        """Return what the text of ``record`` depends on: its ``id``, the
+        ``id`` of its exception info (not the traceback itself, which would
+        keep its frames alive), and the values of ``_output_fields``."""
+        exc_info = record.exc_info
+        return ((id(record), id(exc_info) if exc_info else None)
+                + tuple([getattr(record, attr, None)
+                         for attr in self._output_fields]))
+
+    def _format(self, record):
+        return super(FastFormatter, self).format(record)
+
+    def _cached_frames(self, tb, key):
+        """Return the text of the frames of traceback ``tb``, whose
+        ``_frames_key`` is ``key``, from the cache if it's there."""
+        cache = self._tracebacks
+        with self._traceback_lock:
+            text = cache.get(key)
+            if text is not None:
+                cache.move_to_end(key)
+                return text
+        text = _frames_text(tb)
+        with self._traceback_lock:
+            cache[key] = text
+            if len(cache) > self.traceback_cache:
+                cache.popitem(last=False)       # least recently used
+        return text
+
+    def _traceback_number(self, key):
+        """Return ``(number, seen)``: the number of the traceback whose
+        chain key is ``key``, and whether it was seen before."""
+        numbers = self._traceback_numbers
+        with self._traceback_lock:
+            number = numbers.get(key)
+            if number is not None:
+                numbers.move_to_end(key)
+                return number, True
+            self._traceback_count += 1
+            number = numbers[key] = self._traceback_count
+            if len(numbers) > self.traceback_cache:
+                numbers.popitem(last=False)
+            return number, False
+
+    def formatException(self, ei):
+        """Return the text of exception info ``ei`` -- the same text as
+        ``logging.Formatter.formatException``, but with ``traceback_cache``,
+        the frames of each distinct traceback are rendered once.
+        """
+        exc = ei[1]
+        chain = (_exception_chain(exc, ei[2])
+                 if self.traceback_cache and exc is not None else None)
+        if chain is None:
+            return super(FastFormatter, self).formatException(ei)
+        keys = [_frames_key(tb) for _, tb, _ in chain]
+        number = None
+        if self.repeat_tracebacks and ei[2] is not None:
+            number, seen = self._traceback_number(
+                tuple(zip([type(e) for e, _, _ in chain], keys)))
+            if seen:
+                return ('Same traceback as #%d\n' % number + ''.join(
+                    traceback.format_exception_only(type(exc), exc))
+                        ).rstrip('\n')
+        pieces = []
+        for (e, tb, follows), key in zip(chain, keys):
+            if tb is not None:
+                pieces.append(self._cached_frames(tb, key))
+            pieces.extend(traceback.format_exception_only(type(e), e))
+            if follows:
+                pieces.append(follows)
+        text = ''.join(pieces)
+        if number is not None:
+            text = text.replace(_TRACEBACK_HEADER,
+                                'Traceback #%d (most recent call last):\n'
+                                % number, 1)
+        return text[:-1] if text.endswith('\n') else text
+
+    def formatMessage(self, record):
+        try:
+            return self._render(record)
+        except (AttributeError, KeyError) as e:
+            # as logging.Formatter, which finds fields in record.__dict__
+            raise ValueError('Formatting field not found in record: %s' % e)
+
+
+# -----------------------------------------------------------------------
+# Structured formatters: JSON lines, logfmt
+# -----------------------------------------------------------------------
+
+# The attributes that every LogRecord has; any others came with ``extra``
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord('', logging.INFO, '', 0, '', (), None).__dict__
+).union(('message', 'asctime'))
+
+# JSON for values other than str, int and None: compact, and anything that
+# isn't JSON-serializable is rendered as its str()
+_json_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                               default=str).encode
+
+
+def _json_value(value):
+    cls = type(value)
+    if cls is str:
+        return _json_string(value)
+    if cls is int:
+        return int.__repr__(value)
+    if value is None:
+        return 'null'
+    return _json_dumps(value)
+
+
+# A logfmt value that needs no quotes
+_logfmt_bare = re.compile(r'[^\s"=\\\x00-\x1f\x7f]+\Z')
+# Characters not allowed in a logfmt key
+_logfmt_key_bad = re.compile(r'[\s"=\\\x00-\x1f\x7f]')
+
+
+def _logfmt_value(value):
+    if type(value) is not str:
+        if value is None:
+            return ''
+        if value is True or value is False:
+            return 'true' if value else 'false'
+        value = str(value)
+    if _logfmt_bare.match(value):
+        return value
+    # quoted, with quotes, backslashes and control characters escaped
+    return _json_string(value)
+
+
+class _StructuredFormatter(FastFormatter):
+    """Base class of ``JsonFormatter`` and ``LogfmtFormatter``: renders a
+    record as a sequence of ``(key, value)`` pairs, which a subclass encodes
+    (``_encode``). Keys are encoded once, and cached (``_encode_key``).
+    """
+    # Fields when there's no format string, by style
+    default_formats = {
+        '%': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        '{': '{asctime} {levelname} {name} {message}',
+        '$': '${asctime} ${levelname} ${name} ${message}',
+    }
+
+    # record attribute -> key in the output, if different
+    rename = {}
+
+    # Keys of ``extra`` attributes cached, at most
+    max_cached_keys = 1000
+
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True,
+                 cache_time=False, utc=False, cache_output=False,
+                 rename=None, include_extra=True,
+                 **kwargs):
+        """
+        :param fmt: a format string, whose fields, in order, are the first
+            keys of each line; its literal text is ignored
+        :param datefmt: the date-format string, or ``ISO8601``
+        :param style: one of ``'%'``, ``'{'``, ``'$'``
+        :param validate: as for ``logging.Formatter``
+        :param cache_time: render the time once per second
+        :param utc: render times in UTC rather than local time
+        :param cache_output: remember the text of the last record formatted
+        :param rename: a dict mapping record attributes to the keys that
+            they're written as, e.g. ``{'levelname': 'level'}``
+        :param include_extra: also write the record attributes that came
+            with ``extra``
+        :param kwargs: passed to ``logging.Formatter``
+        """
+        if fmt is None and style in self.default_formats:
+            fmt = self.default_formats[style]
+        super(_StructuredFormatter, self).__init__(
+            fmt, datefmt, style, validate, cache_time, utc, cache_output,
+            **kwargs)
+        fields = _format_keys(self._style._fmt, style)
+        if fields is None:
+            raise ValueError("can't determine the fields of format %r" % fmt)
+        if rename:
+            self.rename = dict(self.rename, **rename)
+        self.include_extra = include_extra
+        self._keys = {}             # record attribute -> encoded key
+        self._fields = [(attr, self._key(attr)) for attr in fields]
+        self._not_extra = _RECORD_ATTRIBUTES.union(fields)
+
+    def _key(self, attr):
+        """Return the encoded key of record attribute ``attr``."""
+        try:
+            return self._keys[attr]
+        except KeyError:
+            key = self._encode_key(self.rename.get(attr, attr))
+            if len(self._keys) < self.max_cached_keys:
+                self._keys[attr] = key
+            return key
+
+    def _output_key(self, record):
+        key = super(_StructuredFormatter, self)._output_key(record)
+        if self.include_extra:
+            d = record.__dict__
+            extra = d.keys() - self._not_extra
+            if extra:
+                key += tuple([(attr, d[attr]) for attr in sorted(extra)])
+        return key
+
+    def _encode_key(self, key):
+        raise NotImplementedError
+
+    def _encode(self, items):
+        raise NotImplementedError
+
+    def _format(self, record):
+        """Return ``record`` as one line of structured text."""
+        record.message = record.getMessage()
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        items = [(key, getattr(record, attr, None))
+                 for attr, key in self._fields]
+        if self.include_extra:
+            d = record.__dict__
+            extra = d.keys() - self._not_extra
+            if extra:
+                key = self._key
+                items.extend((key(attr), d[attr]) for attr in sorted(extra))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            items.append((self._key('exc_info'), record.exc_text))
+        if record.stack_info:
+            items.append((self._key('stack_info'),
+                          self.formatStack(record.stack_info)))
+        return self._encode(items)
+
+
+class JsonFormatter(_StructuredFormatter):
+    """
+    .. _JsonFormatter:
+
+    (*Python 3 only*) A formatter that renders each record as a JSON object
+    on one line ("JSON lines"). Its keys are the fields of the format
+    string, in order, then any ``extra`` attributes of the record (sorted),
+    then ``exc_info`` and ``stack_info``, with the formatted traceback and
+    stack, if the record has them. Values that JSON can't represent are
+    written as their ``str()``.
+
+    With the default ``backend``, the formatter uses ``orjson`` if it's
+    installed, and otherwise builds each line itself, from cached key
+    encodings and the ``json`` module's (C) string escaping.
+    """
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True,
+                 cache_time=False, utc=False, cache_output=False,
+                 rename=None, include_extra=True,
+                 backend=None,
+                 **kwargs):
+        """
+        :param backend: ``'json'``, ``'orjson'``, or ``None`` for ``orjson``
+            if it's installed, else ``json``
+
+        The other parameters are those of ``LogfmtFormatter``.
+        """
+        if backend is None:
+            backend = 'orjson' if orjson else 'json'
+        if backend not in ('json', 'orjson') or (backend == 'orjson'
+                                                 and not orjson):
+            raise ValueError("backend must be 'json', or 'orjson' if it's "
+                             "installed, not %r" % (backend,))
+        self.backend = backend
+        super(JsonFormatter, self).__init__(
+            fmt, datefmt, style, validate, cache_time, utc, cache_output,
+            rename, include_extra, **kwargs)
+
+    def _encode_key(self, key):
+        if self.backend == 'orjson':
+            return key
+        return _json_string(key) + ':'
+
+    def _encode(self, items):
+        if self.backend == 'orjson':
+            try:
+                return orjson.dumps(dict(items), default=str).decode('utf-8')
+            except orjson.JSONEncodeError:
+                # e.g. an int of more than 64 bits
+                return _json_dumps(dict(items))
+        return '{%s}' % ','.join([key + _json_value(value)
+                                  for key, value in items])
+
+
+class LogfmtFormatter(_StructuredFormatter):
+    """
+    .. _LogfmtFormatter:
+
+    (*Python 3 only*) A formatter that renders each record as a logfmt line
+    of ``key=value`` pairs, keys as for ``JsonFormatter``. Values containing
+    spaces, quotes, ``=`` or control characters are quoted, with quotes,
+    backslashes and control characters escaped -- so a traceback stays on
+    one line. ``None`` is written as an empty value.
+    """
+    def _encode_key(self, key):
+        return (_logfmt_key_bad.sub('_', key) or '_') + '='
+
+    def _encode(self, items):
+        return ' '.join([key + _logfmt_value(value) for key, value in items])
+
+
+# The values of ``LCDict.add_formatter``'s ``structured`` parameter
+_structured_formatters = {
+    'json': 'prelogging.formatters.JsonFormatter',
+    'logfmt': 'prelogging.formatters.LogfmtFormatter',
+}
@@ -2,12 +2,19 @@
 
 from copy import deepcopy
 
+import logging
+
 from .lcdictbasic import LCDictBasic
 from .formatter_presets import update_formatter_presets_from_file, _formatter_presets
+from .formatters import _structured_formatters
 import socket
 from logging.handlers import SysLogHandler, SYSLOG_UDP_PORT
 import os
 from .six import PY2
+from . import lifecycle
+from . import records
+from ._handler_lookup import configure, resolve_targets
+from .workers import compile_worker_config, init_worker_logging
 
 
 __author__ = "Brian O'Neill"
@@ -21,6 +28,89 @@ update_formatter_presets_from_file(
     os.path.join(os.path.dirname(__file__), 'formatter_presets.txt')
 )
 
+def _level_for_config(levelno):
+    """Return the name of level ``levelno`` if it has one, else ``levelno``
+    -- either way, something ``dictConfig`` accepts as a level."""
+    name = logging.getLevelName(levelno)
+    return levelno if name == 'Level %s' % levelno else name
+
+
+class _FilterMaker():
+    """The filter class of ``LCDict.add_callable_filter``: one class, so
+    that callable filters with the same function and keyword arguments have
+    identical specs."""
+    def __init__(self, callable_filter=None, ** callable_filter_kwargs):
+        self.callable_filter = callable_filter
+        self.filter_callable_kwargs = callable_filter_kwargs
+
+    def filter(self, record):
+        return self.callable_filter(record,
+                                    ** self.filter_callable_kwargs)
+
+
+def _spec_key(spec):
+    """Return a hashable value, equal for equal formatter or filter dicts
+    ``spec`` -- or ``None`` if ``spec`` contains something unhashable."""
+    def freeze(value):
+        if isinstance(value, dict):
+            return (dict,) + tuple((k, freeze(v)) for k, v in
+                                   sorted(value.items(),
+                                          key=lambda item: str(item[0])))
+        if isinstance(value, (list, tuple)):
+            return (type(value),) + tuple(freeze(v) for v in value)
+        return value
+    try:
+        key = freeze(spec)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _share_identical(config, filter_names):
+    """Return a logging config dict like ``config``, but in which formatters
+    with identical specs, and filters among ``filter_names`` with identical
+    specs, are merged: one name, the first, stands for all of them, so
+    ``dictConfig`` creates one instance. ``config`` isn't changed; if there's
+    nothing to merge, it's returned as is.
+    """
+    renamed = {}
+    shared = dict(config)
+    for section, names in (('formatters', None), ('filters', filter_names)):
+        first = {}          # spec key -> first name with that spec
+        specs = {}
+        renamed[section] = {}
+        for name, spec in config.get(section, {}).items():
+            key = _spec_key(spec) if names is None or name in names else None
+            if key is not None and key in first:
+                renamed[section][name] = first[key]
+                continue
+            if key is not None:
+                first[key] = name
+            specs[name] = spec
+        shared[section] = specs
+    if not any(renamed.values()):
+        return config
+
+    formatters, filters = renamed['formatters'], renamed['filters']
+
+    def rename_filters(d):
+        if d.get('filters'):
+            d = dict(d, filters=[filters.get(f, f) for f in d['filters']])
+        return d
+
+    shared['handlers'] = {}
+    for name, hdict in config.get('handlers', {}).items():
+        hdict = rename_filters(hdict)
+        if hdict.get('formatter') in formatters:
+            hdict = dict(hdict, formatter=formatters[hdict['formatter']])
+        shared['handlers'][name] = hdict
+    shared['loggers'] = {name: rename_filters(ldict) for name, ldict in
+                         config.get('loggers', {}).items()}
+    if 'root' in config:
+        shared['root'] = rename_filters(config['root'])
+    return shared
+
 # -----------------------------------------------------------------------
 # LCDict
 # -----------------------------------------------------------------------
@@ -44,6 +134,7 @@ class LCDict(LCDictBasic):
             log_path                (str)
             attach_handlers_to_root (bool)
             locking                 (bool)
+            fast_formatters         (bool)
 
     ``log_path`` is a directory in which log files will be created by
     ``add_file_handler`` and ``add_rotating_file_handler``. If the filename
@@ -65,6 +156,12 @@ class LCDict(LCDictBasic):
     Each instance saves the value passed to its constructor, and exposes it as
     the read-only property ``locking``.
 
+    When ``fast_formatters`` is true [default: False], formatters added by
+    ``add_formatter`` -- including formatter presets, which are added just
+    in time -- are by default
+    :ref:`FastFormatter <FastFormatter>` objects, which compile their format
+    strings.
+
     All of the methods that add a handler take parameters ``attach_to_root``
     and ``locking``, each a ``bool`` or ``None``; these allow overriding of
     the values passed to the constructor. Thus, for example, callers can
@@ -79,7 +176,8 @@ class LCDict(LCDictBasic):
                  locking=False,
                  attach_handlers_to_root=False,
                  disable_existing_loggers=False,  # NOTE: logging default value is True
-                 warnings=LCDictBasic.Warnings.DEFAULT):
+                 warnings=LCDictBasic.Warnings.DEFAULT,
+                 fast_formatters=False):
         """
         :param root_level: one of ``'DEBUG'``, ``'INFO'``, ``'WARNING'``,
             ``'ERROR'``, ``'CRITICAL'``, ``'NOTSET'``
@@ -103,6 +201,9 @@ class LCDict(LCDictBasic):
             logging configuration. NOTE: The `logging` default value is ``True``.
         :param warnings: as for ``LCDictBasic``. See the documentation for the inner
             class ``LCDictBasic.WARNINGS``.
+        :param fast_formatters: if true, ``add_formatter`` adds
+            :ref:`FastFormatter <FastFormatter>` objects unless told
+            otherwise.
 
         See also :ref:`__init__ keyword parameters <LCDict-init-params>`.
         """
@@ -113,6 +214,17 @@ class LCDict(LCDictBasic):
         self.log_path = log_path
         self._locking = locking
         self._attach_handlers_to_root = attach_handlers_to_root
+        self._fast_formatters = fast_formatters
+        # Names of filters declared pure (see ``add_filter``)
+        self._pure_filters = set()
+        # Decisions of the latest ``config(lean_records=...)``
+        self._lean_records_report = None
+        # Whether ``config`` merges identical formatters and filters
+        self._share_identical = True
+        # ``config``'s shutdown_timeout, for ``_configure``
+        self._shutdown_timeout = None
+        # Fields added to every record (see ``add_record_fields``)
+        self._record_fields = {}
 
     @property
     def attach_handlers_to_root(self):
@@ -138,6 +250,18 @@ class LCDict(LCDictBasic):
         """
         return self._locking
 
+    @property
+    def fast_formatters(self):
+        """
+        (r/o property) Return this logging config dict's default `fast`
+        setting, used by ``add_formatter`` when its ``fast`` parameter is
+        ``None``.
+
+        :return: ``self._fast_formatters``, the value of ``fast_formatters``
+            passed to the constructor
+        """
+        return self._fast_formatters
+
     def _attach_to_root__adjust(self, attach):
         """
         :param attach: Any; but really, ``bool`` or None.
@@ -183,6 +307,96 @@ class LCDict(LCDictBasic):
                          ** clone_dict)
         return self
 
+    def add_formatter(self, formatter_name,     # *,
+                      class_='logging.Formatter',
+                      format=None,
+                      dateformat=None,
+                      style='%',
+                      fast=None,
+                      cache_time=False,
+                      utc=False,
+                      structured=None,
+                      cache_output=False,
+                      traceback_cache=0,
+                      repeat_tracebacks=False,
+                      ** format_dict):
+        """
+        (Virtual) Adds the ``fast``, ``cache_time``, ``utc``, ``structured``,
+        ``cache_output``, ``traceback_cache`` and ``repeat_tracebacks``
+        parameters to ``LCDictBasic.add_formatter()``.
+
+        :param fast: If true, and ``class_`` is ``'logging.Formatter'``, the
+            formatter will be a :ref:`FastFormatter <FastFormatter>`, which
+            compiles its format string; if ``None``, do what
+            ``self.fast_formatters`` says.
+        :param cache_time: If true, the formatter will be a ``FastFormatter``
+            that renders ``asctime`` once per second, and caches the text.
+        :param utc: If true, the formatter will be a ``FastFormatter`` that
+            renders times in UTC.
+        :param structured: ``'json'`` or ``'logfmt'``, for a
+            :ref:`JsonFormatter <JsonFormatter>` or a
+            :ref:`LogfmtFormatter <LogfmtFormatter>`, which write the
+            fields of ``format``, and the record's ``extra`` attributes and
+            exception info, as structured lines. Other keyword arguments
+            of these classes (``rename``, ``include_extra``, ``backend``)
+            can be passed in ``format_dict``.
+        :param cache_output: If true, the formatter will be a
+            ``FastFormatter`` that remembers the text of the last record it
+            formatted, so a record that goes to several handlers using this
+            formatter is formatted once -- again, if a handler's filter
+            changed an attribute that the text depends on.
+        :param traceback_cache: If nonzero, the formatter will be a
+            ``FastFormatter`` that renders the frames of each distinct
+            traceback once, caching the text of this many tracebacks -- for
+            exception storms.
+        :param repeat_tracebacks: If true, as well as ``traceback_cache``,
+            a traceback seen before is written as ``Same traceback as #N``
+            and the exception's message.
+
+        ``dateformat`` can also be ``'ISO8601'`` for a ``FastFormatter``,
+        or a structured formatter.
+
+        :return: ``self``
+        """
+        if fast is None:
+            fast = self._fast_formatters
+        options = {k: v for k, v in (('cache_time', cache_time),
+                                     ('utc', utc),
+                                     ('cache_output', cache_output),
+                                     ('traceback_cache', traceback_cache),
+                                     ('repeat_tracebacks', repeat_tracebacks))
+                   if v}
+        if options:
+            fast = True
+        if structured:
+            if structured not in _structured_formatters:
+                raise ValueError(
+                    "structured must be one of %s, not %r"
+                    % (", ".join("'%s'" % k
+                                 for k in sorted(_structured_formatters)),
+                       structured))
+            class_ = _structured_formatters[structured]
+            # keyword arguments that only a factory, '()', passes on
+            options.update((k, format_dict.pop(k))
+                           for k in ('rename', 'include_extra', 'backend')
+                           if k in format_dict)
+        elif fast and class_ == 'logging.Formatter':
+            class_ = 'prelogging.formatters.FastFormatter'
+        super(LCDict, self).add_formatter(formatter_name,
+                                          class_=class_,
+                                          format=format,
+                                          dateformat=dateformat,
+                                          style=style,
+                                          ** format_dict)
+        if options:
+            # dictConfig passes only fmt, datefmt and style to a formatter
+            # 'class'; options need a factory, '()'
+            fdict = self.formatters[formatter_name]
+            fdict['()'] = 'ext://' + fdict.pop('class')
+            fdict['fmt'] = fdict.pop('format')
+            fdict.update(options)
+        return self
+
     def _add_formatter_if_preset(self, formatter_name):
         if (formatter_name and
             formatter_name not in self.formatters and
@@ -204,15 +418,26 @@ class LCDict(LCDictBasic):
     def add_handler(self, handler_name,     # *,
                     formatter=None,
                     attach_to_root=None,
+                    nonblocking=False,
+                    nonblocking_capacity=10000,
                     ** handler_dict):
         """
-        (Virtual) Adds the ``attach_to_root`` parameter to
-        ``LCDictBasic.add_handler()``.
+        (Virtual) Adds the ``attach_to_root`` and ``nonblocking`` parameters
+        to ``LCDictBasic.add_handler()``.
 
         :param formatter: name of formatter (-spec), or name of formatter preset
         :param attach_to_root: If true, add the handler to the root logger;
             if ``None``, do what ``self.attach_handlers_to_root`` says;
             if false, don't add to root.
+        :param nonblocking: If true, the handler named ``handler_name`` is a
+            :ref:`NonBlockingHandler <NonBlockingHandler>`, which hands
+            records off to a writer thread of its own; the handler described
+            by ``handler_dict`` is added as its target, under the name
+            ``handler_name + ':target'``, attached to no logger. The level
+            and filters apply in the logging thread; the formatter, in the
+            writer thread.
+        :param nonblocking_capacity: if ``nonblocking``, the most records
+            waiting for the writer thread; more are dropped (and counted)
 
         :param handler_dict: Other keyword args as for LCDictBasic.add_handler,
             e.g. ``level``, ``filters``
@@ -227,6 +452,18 @@ class LCDict(LCDictBasic):
         # if it isn't there already.
         self._add_formatter_if_preset(formatter)
 
+        if nonblocking:
+            target_name = handler_name + ':target'
+            wrapper_dict = {
+                '()': 'ext://prelogging.nonblocking_handlers.NonBlockingHandler',
+                'target': target_name,
+                'capacity': nonblocking_capacity,
+                'level': handler_dict.pop('level', 'NOTSET'),
+                'filters': handler_dict.pop('filters', None),
+            }
+            super(LCDict, self).add_handler(target_name, ** handler_dict)
+            handler_dict = wrapper_dict
+
         super(LCDict, self).add_handler(handler_name,
                                         formatter=formatter,
                                         ** handler_dict)
@@ -237,6 +474,7 @@ class LCDict(LCDictBasic):
     def add_stream_handler(self, handler_name,    # *,
                            stream,
                            locking=None,
+                           nonblocking_stream=False,
                            **kwargs):
         """
         :param handler_name: just that
@@ -246,6 +484,12 @@ class LCDict(LCDictBasic):
             :ref:`LockingStreamHandler <LockingStreamHandler>`;
             if ``None``, do what ``self.locking`` says;
             if false, the handler will be a ``logging.StreamHandler``.
+        :param nonblocking_stream: If true, this handler will be a
+            :ref:`NonBlockingStreamHandler <NonBlockingStreamHandler>`,
+            which puts the stream's descriptor in non-blocking mode, and
+            buffers, then drops, what the stream won't take. ``locking`` is
+            then ignored: writes never wait, so there's no lock to wait for.
+            Pass ``max_buffer`` to bound the buffer (bytes).
         :param kwargs: Other keyword args as for LCDict.add_handler,
             LCDictBasic.add_handler, e.g. ``level``, ``formatter``,
             ``attach_to_root``, ``filters``
@@ -254,7 +498,9 @@ class LCDict(LCDictBasic):
         # self can be created with (self.)locking=False,
         # but a handler can be locking.
         locking = self._locking__adjust(locking)
-        if locking:
+        if nonblocking_stream:
+            kwargs['()'] = 'ext://prelogging.NonBlockingStreamHandler'
+        elif locking:
             kwargs['()'] = 'ext://prelogging.LockingStreamHandler'
             kwargs['create_lock'] = True
         else:
@@ -271,7 +517,8 @@ class LCDict(LCDictBasic):
 
         :param kwargs: Keyword args for
             add_stream_handler, LCDict.add_handler, LCDictBasic.add_handler,
-            e.g. ``locking``, ``level``, ``formatter``, ``attach_to_root``, ``filters``
+            e.g. ``locking``, ``nonblocking_stream``, ``level``,
+            ``formatter``, ``attach_to_root``, ``filters``
         :return: ``self``
         """
         self.add_stream_handler(handler_name,
@@ -285,7 +532,8 @@ class LCDict(LCDictBasic):
 
         :param kwargs: Keyword args for
             add_stream_handler, LCDict.add_handler, LCDictBasic.add_handler,
-            e.g. ``locking``, ``level``, ``formatter``, ``attach_to_root``, ``filters``
+            e.g. ``locking``, ``nonblocking_stream``, ``level``,
+            ``formatter``, ``attach_to_root``, ``filters``
         :return: ``self``
         """
         self.add_stream_handler(handler_name,
@@ -319,18 +567,18 @@ class LCDict(LCDictBasic):
         #     formatter = ('process_time_logger_level_msg'
         #                  if locking else
         #                  'time_logger_level_msg')
+        if locking:
+            kwargs['()'] = 'ext://prelogging.LockingFileHandler'
+            kwargs['create_lock'] = True
+        else:
+            kwargs['class_'] = 'logging.FileHandler'
         self.add_handler(handler_name,
-                         class_='logging.FileHandler',
                          filename=os.path.join(self.log_path, filename),
                          mode=mode,
                          encoding=encoding,
                          delay=delay,
                          formatter=formatter,
                          **kwargs)
-        if locking:
-            del self.handlers[handler_name]['class']
-            self.handlers[handler_name]['()'] = 'ext://prelogging.LockingFileHandler'
-            self.handlers[handler_name]['create_lock'] = True
         return self
 
     def add_rotating_file_handler(self, handler_name,   # *,
@@ -378,8 +626,12 @@ class LCDict(LCDictBasic):
             formatter = ('process_time_logger_level_msg'
                          if locking else
                          'time_logger_level_msg')
+        if locking:
+            kwargs['()'] = 'ext://prelogging.LockingRotatingFileHandler'
+            kwargs['create_lock'] = True
+        else:
+            kwargs['class_'] = 'logging.handlers.RotatingFileHandler'
         self.add_handler(handler_name,
-                         class_='logging.handlers.RotatingFileHandler',
                          filename=os.path.join(self.log_path, filename),
                          mode=mode,
                          encoding=encoding,
@@ -388,11 +640,6 @@ class LCDict(LCDictBasic):
                          maxBytes=max_bytes,
                          backupCount=backup_count,
                          **kwargs)
-        if locking:
-            del self.handlers[handler_name]['class']
-            self.handlers[handler_name]['()'] = \
-                'ext://prelogging.LockingRotatingFileHandler'
-            self.handlers[handler_name]['create_lock'] = True
         return self
 
     def add_null_handler(self, handler_name,  # *
@@ -444,17 +691,16 @@ class LCDict(LCDictBasic):
         """
         locking = self._locking__adjust(locking)
 
+        if locking:
+            kwargs['()'] = 'ext://prelogging.LockingSysLogHandler'
+            kwargs['create_lock'] = True
+        else:
+            kwargs['class_'] = 'logging.handlers.SysLogHandler'
         self.add_handler(handler_name,
-                         class_='logging.handlers.SysLogHandler',
                          address=address,
                          facility=facility,
                          socktype=socktype,
                          **kwargs)
-        if locking:
-            del self.handlers[handler_name]['class']
-            self.handlers[handler_name]['()'] = \
-                'ext://prelogging.LockingSysLogHandler'
-            self.handlers[handler_name]['create_lock'] = True
         return self
 
     def add_email_handler(self,
@@ -523,6 +769,64 @@ class LCDict(LCDictBasic):
             # timeout=timeout,
             **kwargs)
 
+    def add_digest_email_handler(self,
+                                 handler_name,  # *
+                                 mailhost=None,
+                                 fromaddr=None,
+                                 toaddrs=None,
+                                 subject=None,
+                                 secure=None,
+                                 username=None,
+                                 password=None,
+                                 timeout=10.0,
+                                 window=60.0,
+                                 max_records=100,
+                                 max_emails=10,
+                                 per=3600.0,
+                                 **kwargs):
+        """Add a :ref:`DigestSMTPHandler <DigestSMTPHandler>`, which emails
+        records in digests from a background thread, over one reused
+        connection, at a capped rate.
+
+        :param handler_name: name of this handler
+        :param mailhost: name of SMTP server e.g. 'smtp.gmail.com', or a
+            ``(host, port)`` pair
+        :param fromaddr: email address of sender (``str``)
+        :param toaddrs:  email recipient(s): a ``str``, or a ``list`` of them
+        :param subject:  subject of the emails (``str``)
+        :param secure: as for ``add_email_handler``, except that ``None``
+            (the default) means no TLS
+        :param username: SMTP username of sender
+        :param password: SMTP password of sender with username provided
+        :param timeout: Timeout (seconds) for communication with the SMTP
+            server
+        :param window: the longest (seconds) a record waits for its digest
+        :param max_records: a digest with this many records is sent at once
+        :param max_emails: the most digests sent per ``per`` seconds
+        :param per: see ``max_emails``
+        :param kwargs: Keyword args for
+            LCDict.add_handler, LCDictBasic.add_handler,
+            e.g. ``formatter``, ``attach_to_root``, ``level``, ``filters``,
+            or ``capacity``, the most records waiting for a digest
+        :return: ``self``
+        """
+        if username:
+            kwargs['credentials'] = (username, password)
+        kwargs['()'] = 'ext://prelogging.smtp_handlers.DigestSMTPHandler'
+        return self.add_handler(
+            handler_name,
+            mailhost=mailhost,
+            fromaddr=fromaddr,
+            toaddrs=toaddrs,
+            subject=subject,
+            secure=secure,
+            timeout=timeout,
+            window=window,
+            max_records=max_records,
+            max_emails=max_emails,
+            per=per,
+            **kwargs)
+
     def add_queue_handler(self,
                           handler_name,
                           # QueueHandler-specific:
@@ -532,26 +836,178 @@ class LCDict(LCDictBasic):
 
         :param handler_name: the name of this handler
         :param level: the loglevel of this handler (best left at its default)
-        :param queue: an actual queue object (``multiproccessing.Queue``).
+        :param queue: an actual queue object (``multiproccessing.Queue``),
+            or any object with a ``put_nowait`` method, such as a
+            ``ChannelWriter``, ``ShardedQueue`` or ``PriorityLanes``.
             Thus, **don't** use ``clone_handler`` on a queue handler!
 
         :param kwargs: Keyword args for
             LCDict.add_handler, LCDictBasic.add_handler,
             e.g. ``formatter``, ``attach_to_root``, ``level``, ``filters``
         :return: ``self``
+
+        The handler is created by a factory (``'()'``), not a ``'class'``:
+        in Python 3.12+, ``dictConfig`` checks the ``queue`` of a
+        ``'class'`` queue handler -- in 3.12.0-3.12.3 it must be a
+        ``queue.Queue``, and the handler must have ``handlers``; later, it
+        must have a ``get`` method too -- and rejects everything else.
         """
         if PY2:
             raise NotImplementedError("logging.handlers.QueueHandler"
                                       " doesn't exist in Python 2")
+        kwargs['()'] = 'ext://logging.handlers.QueueHandler'
         return self.add_handler(
             handler_name,
-            class_='logging.handlers.QueueHandler',
             queue=queue,
             **kwargs)
 
+    def add_collector_handler(self,
+                              handler_name,
+                              address,
+                              batch_size=100,
+                              flush_interval=1.0,
+                              flush_level='ERROR',
+                              **kwargs):
+        """Add a :ref:`CollectorHandler <collector>`, which sends records in
+        batches, over one persistent connection, to a collector started with
+        ``python -m prelogging.collector``.
+
+        :param handler_name: the name of this handler
+        :param address: ``(host, port)`` of a TCP collector, or the path of
+            a collector's Unix domain socket
+        :param batch_size: the most records sent in one batch
+        :param flush_interval: the longest (seconds) a record waits before
+            it's sent
+        :param flush_level: records at or above this level are sent
+            immediately, together with any records batched before them
+        :param kwargs: Keyword args for
+            LCDict.add_handler, LCDictBasic.add_handler,
+            e.g. ``formatter``, ``attach_to_root``, ``level``, ``filters``
+        :return: ``self``
+        """
+        kwargs['()'] = 'ext://prelogging.collector.CollectorHandler'
+        return self.add_handler(
+            handler_name,
+            address=address,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            flush_level=flush_level,
+            **kwargs)
+
+    def add_asyncio_handler(self,
+                            handler_name,
+                            targets,
+                            batch_size=100,
+                            capacity=10000,
+                            **kwargs):
+        """(*Python 3.5+ only*) Add an
+        :ref:`AsyncioHandler <AsyncioHandler>`, whose ``emit`` never blocks
+        the event loop: records are buffered, and a task on the loop hands
+        them in batches to a thread that passes them to the ``targets``.
+
+        :param handler_name: the name of this handler
+        :param targets: the name of a handler, or a sequence of names of
+            handlers, that will actually write the records. Don't also attach
+            these to loggers (e.g. add them with ``attach_to_root=False``).
+        :param batch_size: the most records delivered to the targets at once
+        :param capacity: the most records waiting to be delivered; more are
+            dropped, and counted in the handler's ``dropped`` attribute
+        :param kwargs: Keyword args for
+            LCDict.add_handler, LCDictBasic.add_handler,
+            e.g. ``attach_to_root``, ``level``, ``filters``
+        :return: ``self``
+        """
+        if PY2:
+            raise NotImplementedError("asyncio doesn't exist in Python 2")
+        kwargs['()'] = 'ext://prelogging.async_handlers.AsyncioHandler'
+        self._check_defined(
+            defined=self.handlers,
+            attach_to=handler_name,
+            attach_to_kind='handler',
+            attachees=self._to_seq(targets),
+            attachee_kind='handler')
+        return self.add_handler(
+            handler_name,
+            targets=self._to_seq(targets),
+            batch_size=batch_size,
+            capacity=capacity,
+            **kwargs)
+
+    def add_memory_handler(self,
+                           handler_name,
+                           target,
+                           capacity=1000,
+                           trigger_level='ERROR',
+                           dump_signal=None,
+                           **kwargs):
+        """Add a :ref:`FlightRecorderHandler <FlightRecorderHandler>`, which
+        keeps the last ``capacity`` records in memory, and writes them to
+        ``target`` only when a record at or above ``trigger_level`` arrives
+        (or on ``dump_signal``) -- DEBUG-level context around failures,
+        without DEBUG-level disk I/O the rest of the time.
+
+        For DEBUG records to reach this handler, the loggers it's attached to
+        must of course have level ``DEBUG``; give the other handlers of those
+        loggers higher levels.
+
+        :param handler_name: the name of this handler
+        :param target: the name of the handler that writes the records.
+            Don't also attach it to loggers (e.g. add it with
+            ``attach_to_root=False``).
+        :param capacity: the most records kept in memory
+        :param trigger_level: a record at or above this level dumps the
+            buffer to ``target``, and is written after it
+        :param dump_signal: a signal, e.g. ``'SIGUSR1'``, that dumps the
+            buffer on demand, or ``None``
+        :param kwargs: Keyword args for
+            LCDict.add_handler, LCDictBasic.add_handler,
+            e.g. ``attach_to_root``, ``level``, ``filters``
+        :return: ``self``
+        """
+        kwargs['()'] = 'ext://prelogging.memory_handlers.FlightRecorderHandler'
+        self._check_defined(
+            defined=self.handlers,
+            attach_to=handler_name,
+            attach_to_kind='handler',
+            attachees=[target],
+            attachee_kind='handler')
+        return self.add_handler(
+            handler_name,
+            target=target,
+            capacity=capacity,
+            trigger_level=trigger_level,
+            dump_signal=dump_signal,
+            **kwargs)
+
     # add_*_filter methods
 
-    def add_class_filter(self, filter_name, filter_class, **filter_init_kwargs):
+    def add_filter(self, filter_name,
+                   pure=False,
+                   ** filter_dict):
+        """
+        (Virtual) Adds the ``pure`` parameter to ``LCDictBasic.add_filter()``.
+
+        :param pure: Declare that the filter is *pure*: that whether it lets
+            a record through depends only on the record, and that it has no
+            side effects. ``worker_lcdict`` copies pure filters to worker
+            processes, so that records they'd reject are never sent.
+        :param filter_dict: keyword/value pairs, as for
+            ``LCDictBasic.add_filter``
+        :return: ``self``
+        """
+        # As LCDictBasic.add_filter does; not delegated, so that any warning
+        # reports the caller's source location.
+        self._check_readd(self.filters, filter_name, 'filter')
+        self.filters[filter_name] = filter_dict
+        if pure:
+            self._pure_filters.add(filter_name)
+        else:
+            self._pure_filters.discard(filter_name)
+        return self
+
+    def add_class_filter(self, filter_name, filter_class,
+                         pure=False,
+                         **filter_init_kwargs):
         """
         A convenience method for adding a class filter, a class that implements
         a ``filter`` method of signature ``(logging.LogRecord) -> bool``
@@ -568,6 +1024,7 @@ class LCDict(LCDictBasic):
             and loggers)
         :param filter_class: a class implementing a ``filter`` method of
             signature ``(logging.LogRecord) -> bool``.
+        :param pure: as for ``add_filter``
         :param filter_init_kwargs: any other parameters to be passed to
             ``add_filter``. These will be passed to the ``filter_class``
             constructor. See the documentation for
@@ -575,9 +1032,11 @@ class LCDict(LCDictBasic):
         :return: ``self``
         """
         filter_init_kwargs['()'] = filter_class
-        return self.add_filter(filter_name, **filter_init_kwargs)
+        return self.add_filter(filter_name, pure=pure, **filter_init_kwargs)
 
-    def add_callable_filter(self, filter_name, filter_fn, **filter_init_kwargs):
+    def add_callable_filter(self, filter_name, filter_fn,
+                            pure=False,
+                            **filter_init_kwargs):
         """A convenience method for adding a callable filter of signature
         ``(logging.LogRecord, **kwargs) -> bool``. This method spares you from
         having to write code like the following:
@@ -594,6 +1053,7 @@ class LCDict(LCDictBasic):
         :param filter_fn: a callable, of signature
             ``(logging.LogRecord, **kwargs) -> bool``.
             A record is logged iff this callable returns true.
+        :param pure: as for ``add_filter``
         :param filter_init_kwargs: Keyword arguments that will be passed to
             the filter_fn **each time it is called**. To pass dynamic data,
             you can't just wrap it in a list or dict; use an object or callable
@@ -603,17 +1063,10 @@ class LCDict(LCDictBasic):
             of Currying.
         :return: ``self``
         """
-        class FilterMaker():
-            def __init__(self, callable_filter=None, ** callable_filter_kwargs):
-                self.callable_filter = callable_filter
-                self.filter_callable_kwargs = callable_filter_kwargs
-
-            def filter(self, record):
-                return self.callable_filter(record,
-                                            ** self.filter_callable_kwargs)
-
         filter_init_kwargs['callable_filter'] = filter_fn
-        return self.add_class_filter(filter_name, FilterMaker, **filter_init_kwargs)
+        return self.add_class_filter(filter_name, _FilterMaker,
+                                     pure=pure,
+                                     **filter_init_kwargs)
 
         # Former implementation, pre-filter-kwargs, pre FilterMaker class:
         # Paper over a difference between how Python 2 and Python 3
@@ -624,3 +1077,335 @@ class LCDict(LCDictBasic):
         #         setattr(filter_fn, 'filter', filter_fn)
         # filter_dict['()'] = lambda: filter_fn
         # return self.add_filter(filter_name, ** filter_dict)
+
+    def add_redaction_filter(self, filter_name,     # *,
+                             patterns=None,
+                             replacement='[REDACTED]',
+                             **kwargs):
+        """Add a :ref:`RedactionFilter <RedactionFilter>`, which replaces
+        secrets -- tokens, passwords, card numbers, email addresses -- in
+        the messages of the records it sees, scanning each message at most
+        once for all its patterns. Attach it to the handlers whose output
+        must be scrubbed; one filter attached to several handlers redacts
+        each record once.
+
+        :param filter_name: name of the filter
+        :param patterns: names of presets in ``prelogging.redaction.PATTERNS``
+            (``'email'``, ``'card'``, ``'bearer'``, ``'password'``,
+            ``'aws_key'``, ``'jwt'``), ``RedactionPattern``\\ s, or regular
+            expressions; default: all the presets
+        :param replacement: the text that replaces each secret
+        :param kwargs: as for ``add_filter``
+        :return: ``self``
+        """
+        kwargs['()'] = 'ext://prelogging.redaction.RedactionFilter'
+        if patterns is not None:
+            kwargs['patterns'] = list(patterns)
+        kwargs['replacement'] = replacement
+        return self.add_filter(filter_name, **kwargs)
+
+    def add_verbosity_controller(self, handler_name,     # *,
+                                 filter_name=None,
+                                 **settings):
+        """Give a queue handler or buffered handler an
+        :ref:`AdaptiveVerbosityFilter <AdaptiveVerbosityFilter>`, which,
+        while the handler is falling behind, raises the levels of the
+        noisiest loggers, and restores them when it has caught up.
+
+        :param handler_name: name of a previously added handler
+        :param filter_name: name of the filter to add; default:
+            ``handler_name + '_verbosity'``
+        :param settings: keyword arguments for ``AdaptiveVerbosityFilter``,
+            e.g. ``high_water``, ``low_water``, ``max_latency``, ``raise_to``,
+            ``noisiest``, ``interval``
+        :return: ``self``
+        """
+        filter_name = filter_name or (handler_name + '_verbosity')
+        settings['()'] = 'ext://prelogging.backpressure.AdaptiveVerbosityFilter'
+        if 'queue' not in settings:
+            settings['handler'] = handler_name
+        self.add_filter(filter_name, **settings)
+        return self.attach_handler_filters(handler_name, filter_name)
+
+    # ---------------------------------------------------------------------
+    # Fields added to every record
+    # ---------------------------------------------------------------------
+
+    def add_record_fields(self, ** fields):
+        """Declare fields that every record will carry, added when it's
+        created, by a record factory that ``config()`` installs -- rather
+        than by a filter on each handler, once per handler. Formatters can
+        use them like any attribute, e.g. ``%(request_id)s``.
+
+        A field whose value is a ``contextvars.ContextVar`` is read for each
+        record, in the context of the logging call (``None`` if the
+        variable has no value there); other values are added as they are::
+
+            request_id = contextvars.ContextVar('request_id')
+            lcd.add_record_fields(service='billing', request_id=request_id)
+
+        Fields are added as ``extra`` attributes are, so logging calls can't
+        pass ``extra`` with the same names (`logging` raises ``KeyError``).
+        Fields declared by other ``LCDict``\\ s that have been configured
+        are kept.
+
+        :param fields: field names and values or ``ContextVar``\\ s
+        :return: ``self``
+        """
+        self._record_fields.update(fields)
+        return self
+
+    @property
+    def record_fields(self):
+        """
+        (r/o property) The fields declared with ``add_record_fields``, as a
+        dict: name -> value or ``ContextVar``.
+        """
+        return dict(self._record_fields)
+
+    # ---------------------------------------------------------------------
+    # Configuration
+    # ---------------------------------------------------------------------
+
+    def config(self,    # *,
+               disable_existing_loggers=None,
+               shutdown_timeout=None,
+               lean_records=False,
+               share_identical=True,
+               compact_records=False):
+        """
+        (Virtual) Configure logging as ``LCDictBasic.config()`` does, then
+        register the handlers just created that hold records in transit --
+        queue handlers, collector handlers, asyncio handlers -- with the
+        :ref:`shutdown coordinator <lifecycle>`, and install it. At exit, it
+        drains them, and any running prelogging listeners, within
+        ``shutdown_timeout`` seconds in all, and reports how many records
+        it had to abandon.
+
+        :param disable_existing_loggers: as for ``LCDictBasic.config()``
+        :param shutdown_timeout: seconds allowed for draining at exit;
+            ``None`` leaves the current setting (initially
+            ``lifecycle.DEFAULT_SHUTDOWN_TIMEOUT``, 5 seconds) unchanged.
+        :param lean_records: If true, switch off `logging`'s collection of
+            the record attributes -- caller's source location, thread,
+            process -- that none of this dict's formatters, filters or
+            handlers consume (see :ref:`records`). It can also be a list
+            of attributes to collect regardless, e.g. ``['threadName']``.
+            The decisions made are logged to the ``'prelogging.records'``
+            logger, and available as ``lean_records_report``.
+        :param share_identical: If true, formatters with identical specs
+            -- e.g. a formatter preset, and the same format under another
+            name -- are created as one formatter, shared by all their
+            handlers, with one set of caches; likewise filters declared
+            ``pure`` (see ``add_filter``) with identical specs. (Filters
+            that aren't pure may keep state, e.g. a count of the records
+            seen, so each gets its own instance.) This ``LCDict`` itself is
+            unchanged.
+        :param compact_records: If true, install a record factory that
+            makes :ref:`CompactLogRecord <CompactLogRecord>`\\ s, which keep
+            their attributes in ``__slots__`` -- worthwhile when handlers
+            hold many records at once. If a record factory other than
+            `logging`'s is already installed, it's left alone, and a warning
+            is logged to the ``'prelogging.records'`` logger.
+        """
+        self._share_identical = share_identical
+        self._shutdown_timeout = shutdown_timeout
+        super(LCDict, self).config(
+            disable_existing_loggers=disable_existing_loggers)
+        if lean_records:
+            keep = () if lean_records is True else lean_records
+            self._lean_records_report = records.lean_records(self, keep)
+        if compact_records and not records.use_compact_records():
+            logging.getLogger(records.LOGGER_NAME).warning(
+                "compact records not installed: another record factory, "
+                "%r, is installed", logging.getLogRecordFactory())
+        if self._record_fields:
+            records.add_record_fields(self._record_fields)
+
+    def _dict_to_configure(self):
+        """(Virtual) Merge identical formatters and pure filters, unless
+        ``config`` was told not to."""
+        if not self._share_identical:
+            return self
+        return _share_identical(self, self._pure_filters)
+
+    def _configure(self, d):
+        """(Virtual) Call ``dictConfig`` with ``d``; then give the handlers
+        that pass records on -- e.g. asyncio, non-blocking and flight
+        recorder handlers -- their targets, which they keep (`logging` holds
+        handlers not attached to a logger only weakly), and register the
+        handlers that hold records in transit with the shutdown
+        coordinator."""
+        handlers = configure(d)
+        resolve_targets(handlers)
+        lifecycle.manage_configured_handlers(handlers,
+                                             self._shutdown_timeout)
+
+    @property
+    def lean_records_report(self):
+        """
+        (r/o property) The decisions made by the latest
+        ``config(lean_records=...)``: a list of ``(switch, enabled, reason)``
+        triples, one for each `logging` switch, e.g.
+        ``('logThreads', False, 'nothing uses thread, threadName')``;
+        ``None`` if there's been no such call.
+        """
+        return self._lean_records_report
+
+    # ---------------------------------------------------------------------
+    # Worker-side configuration for the queue paradigm
+    # ---------------------------------------------------------------------
+
+    def _handler_chain(self, logger_name):
+        """Return the names of the handlers that `logging` would consider
+        for a record handled by the logger ``logger_name`` ('' for root):
+        its own handlers, then those of its configured ancestors, up to the
+        root or to the first logger with ``propagate`` false.
+        """
+        chain = []
+        name = logger_name
+        while True:
+            ldict = self.loggers.get(name) if name else self.root
+            if ldict is not None:
+                chain.extend(ldict.get('handlers', []))
+                if not name or not ldict.get('propagate', True):
+                    break
+            if not name:
+                break
+            name = name.rpartition('.')[0]
+        return chain
+
+    def _handler_threshold(self, logger_name):
+        """Return the lowest level (``int``) of a record that some handler
+        would accept when handled by logger ``logger_name``.
+        """
+        levels = [logging._checkLevel(self.handlers[h].get('level', 'NOTSET'))
+                  for h in self._handler_chain(logger_name)
+                  if h in self.handlers]
+        if not levels:
+            # No handlers at all: `logging` falls back on logging.lastResort
+            return logging.lastResort.level if logging.lastResort else logging.CRITICAL
+        return min(levels)
+
+    def worker_lcdict(self, queue, handler_name='qhandler'):
+        """Return an ``LCDict`` for the worker processes of the queue
+        paradigm, in which this ``LCDict`` configures the listener.
+
+        The worker configuration has one handler, a queue handler named
+        ``handler_name`` that writes to ``queue``, attached to the root.
+        Instead of sending everything (root level ``'DEBUG'``), it pushes down
+        what it can of this configuration, so that records the listener would
+        drop aren't created, pickled or sent:
+
+            * The root gets the lowest level that any handler it can reach
+              would accept. (The listener hands records straight to
+              ``Logger.handle``, which doesn't consult logger levels.)
+            * Each logger configured here gets the higher of its own level,
+              if it has one, and the lowest level that any handler it can
+              reach would accept -- but at least 1, as a level of
+              ``NOTSET`` would make it inherit the root's level.
+            * Filters declared ``pure`` (see ``add_filter``) that are
+              attached to a logger here are attached to the same logger in
+              the worker configuration.
+            * Pure filters attached to every handler used by a logger here
+              are attached to the queue handler.
+            * Record fields (see ``add_record_fields``) are declared in the
+              worker configuration too, as records are created in workers.
+              (But ``pool_initializer`` can't pass on those whose values
+              are ``ContextVar``\\ s.)
+
+        :param queue: the queue shared with the listener; or anything that
+            ``add_queue_handler`` accepts, e.g. a ``ShardedQueue``
+        :param handler_name: the name of the queue handler
+        :return: a new ``LCDict``
+        """
+        worker = LCDict(
+            disable_existing_loggers=self.get('disable_existing_loggers',
+                                              False),
+            warnings=self.warnings)
+        # (Handler levels needn't be standard level names, so
+        #  bypass the check done by set_root_level)
+        worker.root['level'] = _level_for_config(self._handler_threshold(''))
+
+        def add_pure_filters(filter_names):
+            """Add the pure ones among ``filter_names`` to ``worker``;
+            return the list of them."""
+            pure = [f for f in filter_names if f in self._pure_filters]
+            for f in pure:
+                if f not in worker.filters:
+                    worker.filters[f] = dict(self.filters[f])
+                    worker._pure_filters.add(f)
+            return pure
+
+        # Pure filters common to all handlers in use
+        used = set(self._handler_chain(''))
+        for ldict in self.loggers.values():
+            used.update(ldict.get('handlers', []))
+        handler_filters = None
+        for h in used:
+            hfilters = set(self.handlers.get(h, {}).get('filters', []))
+            handler_filters = (hfilters if handler_filters is None
+                               else handler_filters & hfilters)
+        qfilters = add_pure_filters(sorted(handler_filters or ()))
+
+        worker.add_queue_handler(handler_name,
+                                 queue=queue,
+                                 filters=qfilters,
+                                 attach_to_root=True)
+        worker.attach_root_filters(
+            * add_pure_filters(self.root.get('filters', [])))
+
+        for lname, ldict in self.loggers.items():
+            level = max(self._handler_threshold(lname), 1,
+                        logging._checkLevel(ldict.get('level', 'NOTSET')))
+            worker.add_logger(
+                lname,
+                level=_level_for_config(level),
+                filters=add_pure_filters(self.loggers[lname].get('filters', [])))
+        worker.add_record_fields(** self._record_fields)
+        return worker
+
+    def pool_initializer(self, queue=None,      # *,
+                         handler_name='qhandler',
+                         shutdown_timeout=None,
+                         lean_records=False,
+                         share_identical=True,
+                         compact_records=False):
+        """Return ``(initializer, initargs)`` to pass to a process pool
+        (``multiprocessing.Pool`` or
+        ``concurrent.futures.ProcessPoolExecutor``), so that each worker
+        configures logging at startup, under any start method.
+
+        The worker configuration is compiled here, once, into a picklable
+        ``dict`` (see :ref:`workers <workers>`); a worker just hands it to
+        ``dictConfig``. If ``queue`` is given, workers get the configuration
+        ``self.worker_lcdict(queue, handler_name)``: a queue handler
+        attached to the root, feeding a listener that this ``LCDict``
+        configures. Otherwise they get this configuration itself, with one
+        lock, created here, shared by all workers for each locking handler.
+
+        Record fields (see ``add_record_fields``) with static values are
+        installed in the workers too. Fields whose values are
+        ``ContextVar``\\ s are **not**: a ``ContextVar`` can't be pickled.
+        They're left out, with a warning logged to the
+        ``'prelogging.records'`` logger; a worker that needs them must call
+        ``prelogging.records.add_record_fields`` itself, with its own
+        ``ContextVar``\\ s -- e.g. those of the modules it imports.
+
+        :param queue: the queue shared with the listener, or ``None``
+        :param handler_name: the name of the queue handler, if ``queue``
+        :param shutdown_timeout: as for ``config()``, in the workers
+        :param lean_records: as for ``config()``, in the workers, judged by
+            the worker configuration. (A queue handler ships whole records,
+            so with ``queue``, nothing is switched off.)
+        :param share_identical: as for ``config()``, in the workers
+        :param compact_records: as for ``config()``, in the workers
+        :return: a pair ``(initializer, initargs)``
+        """
+        lcd = self if queue is None else self.worker_lcdict(
+            queue, handler_name=handler_name)
+        config = compile_worker_config(lcd,
+                                       lean_records=lean_records,
+                                       share_identical=share_identical,
+                                       compact_records=compact_records)
+        return init_worker_logging, (config, shutdown_timeout)
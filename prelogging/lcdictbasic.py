@@ -801,7 +801,17 @@ class LCDictBasic(dict):
             self['disable_existing_loggers'] = bool(disable_existing_loggers)
         if not self._warn_undefined:    # 0.2.7b13
             self.check()                # 0.2.7b13
-        logging.config.dictConfig(self)
+        self._configure(self._dict_to_configure())
+
+    def _dict_to_configure(self):
+        """Return the dict that ``config`` passes to ``dictConfig``: this
+        one, here. Subclasses can pass an equivalent one."""
+        return self
+
+    def _configure(self, d):
+        """Call ``dictConfig`` with ``d``, the dict returned by
+        ``_dict_to_configure``. Subclasses can do more."""
+        logging.config.dictConfig(d)
 
     def dump(self, **kwargs):                   # pragma: no cover
         """
@@ -0,0 +1,315 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Bounded-time shutdown of the queues, buffers and listeners prelogging owns.
+
+At exit, records can still be in transit: in the buffer of a
+``multiprocessing.Queue`` feeder thread, in a handler's batch, or in the
+queues a listener hasn't finished draining. Left alone, they're either lost,
+or they hold up the exit of the process indefinitely (a feeder thread whose
+pipe is full waits for a reader that may be gone). The *shutdown
+coordinator* drains everything registered with it, all within one deadline,
+and counts the records it had to abandon when the deadline passed.
+
+``LCDict.config()`` registers the handlers it creates that hold records
+(queue handlers, collector handlers, asyncio handlers) and installs the
+coordinator; listeners register themselves when started. The coordinator
+runs before `logging` closes its handlers: both at interpreter exit and at
+the exit of a ``multiprocessing`` child process, where ``atexit`` functions
+aren't called.
+
+An object takes part by implementing ``drain(deadline)``: deliver what it
+holds, giving up at time ``deadline`` (a ``time.time()`` value), and return
+the number of records it abandoned.
+
+The same registry makes these objects fork-aware, where ``os.fork`` can be
+hooked (Python 3.7+). Before a fork, each registered object that has a
+``before_fork()`` method gets it called -- to flush what it holds, so the
+child doesn't inherit and resend it. In the child, each one that has an
+``after_fork_in_child()`` method gets that called, to reset its per-process
+state: sockets, buffers, threads (which don't survive a fork). Queue
+handlers' ``multiprocessing.Queue`` objects are reset as
+``multiprocessing`` resets them in its own child processes, so the child of
+a plain ``os.fork`` can go on logging to them without reconfiguring.
+(`logging` itself reinitializes the locks of all handlers in the child.
+The ``multiprocessing`` locks of locking handlers are deliberately shared
+with the child; one held at the fork is released by its holder as usual.)
+"""
+
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+
+try:
+    from logging.handlers import QueueHandler
+except ImportError:                     # pragma: no cover
+    QueueHandler = None                 # PY2
+
+try:
+    from multiprocessing.queues import _sentinel as _mp_sentinel
+except ImportError:                     # pragma: no cover
+    _mp_sentinel = None
+
+
+__all__ = [
+    'register_drainable',
+    'unregister_drainable',
+    'set_shutdown_timeout',
+    'shutdown',
+]
+
+# Seconds allowed, in total, for draining at exit
+DEFAULT_SHUTDOWN_TIMEOUT = 5.0
+
+_lock = threading.RLock()
+_drainables = []           # weak references, in order of registration
+_shutdown_timeout = DEFAULT_SHUTDOWN_TIMEOUT
+_installed_pid = None       # pid of the process the exit hooks are set for
+_done_pid = None            # pid of the process that has run ``shutdown``
+
+# {description: count} of records abandoned by the latest ``shutdown``
+last_abandoned = {}
+
+
+def remaining(deadline):
+    """Return the seconds left until ``deadline``, but not less than 0."""
+    return max(0.0, deadline - time.time())
+
+
+def _qsize(q):
+    try:
+        return q.qsize()
+    except NotImplementedError:         # multiprocessing.Queue on macOS
+        return 0
+
+
+def drain_mp_queue(q, deadline):
+    """Flush the feeder thread of the ``multiprocessing.Queue`` ``q`` into
+    its pipe, waiting no later than ``deadline``. Once it's flushed, ``q``
+    is closed: this process can't put anything more on it.
+
+    :return: the number of records abandoned -- still in the feeder's buffer
+        at the deadline. The feeder is then abandoned too, so that it doesn't
+        hold up the exit of the process.
+    """
+    thread = getattr(q, '_thread', None)
+    if thread is None:                  # nothing was ever put on q here
+        return 0
+    # Queue.join_thread() has no timeout, so join the feeder ourselves
+    q.close()
+    thread.join(remaining(deadline))
+    if not thread.is_alive():
+        return 0
+    # (not counting the sentinel that q.close() queued for the feeder)
+    n = sum(1 for obj in list(getattr(q, '_buffer', ()))
+            if obj is not _mp_sentinel)
+    q.cancel_join_thread()
+    return n
+
+
+def reset_mp_queue(q):
+    """In a child process, give the ``multiprocessing.Queue`` ``q`` (if it
+    is one) a fresh feeder thread state, as ``multiprocessing`` does in the
+    children it starts.
+    """
+    if hasattr(q, '_after_fork') and hasattr(q, 'cancel_join_thread'):
+        q._after_fork()
+
+
+def _drain(obj, deadline):
+    if hasattr(obj, 'drain'):
+        return obj.drain(deadline)
+    # A QueueHandler of the standard library
+    q = obj.queue
+    if hasattr(q, 'drain'):
+        return q.drain(deadline)
+    if hasattr(q, '_thread') and hasattr(q, 'cancel_join_thread'):
+        return drain_mp_queue(q, deadline)
+    return 0                    # an in-process queue; its listener drains it
+
+
+def _is_drainable(obj):
+    return (hasattr(obj, 'drain')
+            or (QueueHandler is not None and isinstance(obj, QueueHandler)))
+
+
+def register_drainable(obj):
+    """Have the shutdown coordinator drain ``obj`` at exit. ``obj`` is
+    held weakly.
+
+    :param obj: an object with a ``drain(deadline)`` method, or a
+        ``logging.handlers.QueueHandler``
+    """
+    with _lock:
+        if obj not in _live_drainables():
+            _drainables.append(weakref.ref(obj))
+
+
+def unregister_drainable(obj):
+    """Undo ``register_drainable(obj)``, if it was done."""
+    with _lock:
+        _drainables[:] = [ref for ref in _drainables if ref() is not obj]
+
+
+def _live_drainables():
+    """Return the registered objects that still exist, pruning the others
+    from the registry. The caller holds ``_lock``.
+    """
+    _drainables[:] = [ref for ref in _drainables if ref() is not None]
+    return [ref() for ref in _drainables]
+
+
+def register_handlers(handlers):
+    """Register those of ``handlers`` that hold records in transit."""
+    for handler in handlers:
+        if _is_drainable(handler):
+            register_drainable(handler)
+
+
+def manage_configured_handlers(handlers, shutdown_timeout=None):
+    """Register those of the handlers just configured, ``handlers`` (a dict
+    name -> handler, as returned by ``_handler_lookup.configure``), that
+    hold records in transit, and install the coordinator. Called once
+    ``dictConfig`` has created the handlers.
+
+    :param shutdown_timeout: if not ``None``, passed to
+        ``set_shutdown_timeout``
+    """
+    register_handlers(handlers.values())
+    if shutdown_timeout is not None:
+        set_shutdown_timeout(shutdown_timeout)
+    install()
+
+
+def set_shutdown_timeout(timeout):
+    """Set the seconds allowed, in total, for draining at exit."""
+    global _shutdown_timeout
+    _shutdown_timeout = timeout
+
+
+def install():
+    """Arrange for ``shutdown`` to run when this process exits, before
+    `logging` closes its handlers. Idempotent; called by ``LCDict.config()``.
+    """
+    global _installed_pid
+    with _lock:
+        pid = os.getpid()
+        if _installed_pid == pid:
+            return
+        _installed_pid = pid
+        # Runs before logging.shutdown, which was registered earlier
+        # (atexit functions run last-in, first-out)
+        atexit.register(_at_exit)
+        # A multiprocessing child process doesn't call atexit functions; it
+        # runs finalizers, highest priority first. Queue's own finalizers
+        # have priorities 10 (close) and -5 (join the feeder).
+        # Child processes start with no finalizers, which is why this is
+        # done per process.
+        from multiprocessing import util
+        util.Finalize(None, _at_exit, exitpriority=100)
+
+
+def _at_exit():
+    shutdown()
+
+
+# -----------------------------------------------------------------------
+# At-fork hooks
+# -----------------------------------------------------------------------
+
+def _before_fork():
+    with _lock:
+        objs = _live_drainables()
+    for obj in objs:
+        before_fork = getattr(obj, 'before_fork', None)
+        if before_fork is not None:
+            try:
+                before_fork()
+            except Exception:           # pragma: no cover
+                pass            # a failed flush mustn't prevent the fork
+    # Held across the fork, so the child's copy of the registry is whole
+    _lock.acquire()
+
+
+def _after_fork_in_parent():
+    _lock.release()
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.RLock()
+    for obj in _live_drainables():
+        after_fork = getattr(obj, 'after_fork_in_child', None)
+        if after_fork is not None:
+            after_fork()
+        elif QueueHandler is not None and isinstance(obj, QueueHandler):
+            q = obj.queue
+            if hasattr(q, 'after_fork_in_child'):
+                q.after_fork_in_child()
+            else:
+                reset_mp_queue(q)
+
+
+if hasattr(os, 'register_at_fork'):
+    # Registered after logging's hooks: our "before" hook runs before
+    # logging takes its module lock, and our "after" hooks after logging has
+    # reinitialized the handlers' locks.
+    os.register_at_fork(before=_before_fork,
+                        after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
+
+
+def shutdown(timeout=None):
+    """Drain everything registered, giving up after ``timeout`` seconds
+    (default: the timeout set by ``set_shutdown_timeout``, or by
+    ``LCDict.config()``). Runs at most once per process; later calls return
+    0 at once.
+
+    If any records were abandoned, a line reporting how many is written to
+    ``sys.stderr``, and the counts are kept in ``last_abandoned``.
+
+    :return: the total number of records abandoned
+    """
+    global _done_pid, last_abandoned
+    with _lock:
+        pid = os.getpid()
+        if _done_pid == pid:
+            return 0
+        _done_pid = pid
+        # Handlers first: they feed the queues that listeners drain
+        objs = sorted(_live_drainables(),
+                      key=lambda obj: not isinstance(obj, logging.Handler))
+    if timeout is None:
+        timeout = _shutdown_timeout
+    deadline = time.time() + timeout
+    abandoned = {}
+    for obj in objs:
+        try:
+            n = _drain(obj, deadline)
+        except Exception:               # pragma: no cover
+            # Never let one misbehaving object keep the others from draining
+            n = 0
+        if n:
+            desc = _describe(obj)
+            abandoned[desc] = abandoned.get(desc, 0) + n
+    last_abandoned = abandoned
+    total = sum(abandoned.values())
+    if total:
+        sys.stderr.write(
+            "prelogging: %d log record(s) abandoned at shutdown after %gs "
+            "(%s)\n" % (total, timeout,
+                        ', '.join('%s: %d' % kv
+                                  for kv in sorted(abandoned.items()))))
+    return total
+
+
+def _describe(obj):
+    name = getattr(obj, 'name', None) or getattr(obj, '_name', None)
+    cls = obj.__class__.__name__
+    return '%s %r' % (cls, name) if name else cls
@@ -0,0 +1,619 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Listener-side machinery for the queue paradigm of multiprocess logging:
+worker processes hand their log records to a transport (for example, a
+``QueueHandler`` writing to a queue), and a thread of the main process takes
+records off the transport and hands them to the loggers and handlers
+configured there.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import zlib
+from multiprocessing import Pipe, Queue
+
+from . import lifecycle
+from .batching import dispatch_batch
+
+try:
+    from queue import Empty
+except ImportError:                     # pragma: no cover
+    from Queue import Empty             # PY2
+
+try:
+    import selectors
+except ImportError:                     # pragma: no cover
+    selectors = None                    # PY2
+
+__all__ = [
+    'ChannelSet',
+    'ChannelWriter',
+    'ChannelListener',
+    'ShardedQueue',
+    'ShardedListener',
+    'PriorityLanes',
+    'PriorityListener',
+]
+
+
+def _handle_record(record):
+    """Hand ``record`` to the logger it was logged to, exactly as the
+    ``logging_thread`` of the example
+    ``mproc_approach__queue_handler_logging_thread.py`` does.
+    """
+    logging.getLogger(record.name).handle(record)
+
+
+class _ListenerThread(object):
+    """Base class of the listeners in this module: a thread that runs
+    ``_run`` until ``stop()`` is called. Subclasses implement ``_run``,
+    which should return once ``self._stop_event`` is set and everything
+    still in transit has been handled.
+    """
+    def __init__(self, name=None):
+        self._name = name or self.__class__.__name__
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the listener thread.
+
+        :return: ``self``
+        """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+        lifecycle.register_drainable(self)
+        return self
+
+    def stop(self, timeout=None):
+        """Tell the listener thread to finish up, and wait (at most
+        ``timeout`` seconds, if not ``None``) for it to do so.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain(self, deadline):
+        """Stop the listener, giving it until time ``deadline`` to handle
+        what's in transit. Called by the :ref:`shutdown coordinator
+        <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        thread = self._thread
+        self.stop(lifecycle.remaining(deadline))
+        if thread is not None and thread.is_alive():
+            return self._backlog()
+        return 0
+
+    def _backlog(self):
+        """Return the number of records not yet handled."""
+        return 0
+
+    def after_fork_in_child(self):
+        """The listener thread doesn't survive a fork, and the child mustn't
+        stop the parent's listener at exit: forget both. Called in the child
+        by the :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._thread = None
+        self._stop_event = threading.Event()
+        lifecycle.unregister_drainable(self)
+
+    @property
+    def is_alive(self):
+        """(r/o property) ``True`` iff the listener thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):                                 # pragma: no cover
+        raise NotImplementedError
+
+
+# -----------------------------------------------------------------------
+# ChannelSet, ChannelWriter, ChannelListener
+# -----------------------------------------------------------------------
+
+class ChannelWriter(object):
+    """The worker end of one channel of a ``ChannelSet``.
+
+    It implements the one method of a queue that ``QueueHandler`` uses,
+    ``put_nowait``, so it can be passed as the ``queue`` of
+    ``LCDict.add_queue_handler``, or of a ``QueueHandler`` (but not of a
+    ``'class'`` queue handler in a ``dictConfig`` dict, in Python 3.12+,
+    which also wants a ``get`` method). Sending writes straight into the worker's
+    own pipe: there's no lock shared with other workers, and no feeder
+    thread that can lose records at exit. If the listener falls far enough
+    behind that the pipe fills, the worker blocks until it catches up.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+
+    def put_nowait(self, record):
+        self._conn.send(record)
+
+    def put(self, record, block=True, timeout=None):
+        self._conn.send(record)
+
+    def close(self):
+        self._conn.close()
+
+
+class ChannelSet(object):
+    """A transport for the queue paradigm with one pipe per worker, as an
+    alternative to a single ``multiprocessing.Queue`` shared by all workers.
+
+    Typical use::
+
+        channels = ChannelSet(nworkers)
+        listener = ChannelListener(channels).start()
+        for i in range(nworkers):
+            Process(target=worker, args=(channels.writer(i),)).start()
+        channels.close_writers()        # parent's copies; see below
+        ...
+        # join workers
+        listener.stop()
+
+    where each worker calls
+    ``LCDict(...).add_queue_handler('qhandler', queue=writer)``.
+
+    The parent should call ``close_writers()`` once all workers have been
+    started, so that a channel reports end-of-file as soon as its worker
+    exits.
+    """
+    def __init__(self, nchannels):
+        """
+        :param nchannels: the number of channels (pipes) -- one per worker.
+        """
+        # Pipe(duplex=False) returns (receive end, send end)
+        pipes = [Pipe(duplex=False) for _ in range(nchannels)]
+        self._readers = [r for r, _ in pipes]
+        self._writers = [ChannelWriter(w) for _, w in pipes]
+
+    def __len__(self):
+        return len(self._writers)
+
+    def writer(self, i):
+        """Return the ``ChannelWriter`` for worker ``i``."""
+        return self._writers[i]
+
+    @property
+    def readers(self):
+        """(r/o property) The listener ends of the channels
+        (``multiprocessing.connection.Connection`` objects)."""
+        return list(self._readers)
+
+    def close_writers(self):
+        """Close this process's copies of the worker ends of the channels."""
+        for w in self._writers:
+            w.close()
+
+
+class ChannelListener(_ListenerThread):
+    """A listener thread that multiplexes the channels of a ``ChannelSet``
+    with ``selectors``, and hands the records it receives to the loggers of
+    the main process.
+
+    Records are released through a bounded *reorder window*: up to
+    ``reorder_window`` records are held in a heap keyed by ``record.created``,
+    and the earliest is released whenever the window is full, so that output
+    is approximately ordered by creation time across workers. When no channel
+    has had anything to read for ``flush_interval`` seconds, the window is
+    emptied. A ``reorder_window`` of 0 releases records as they arrive.
+
+    ``selectors`` requires pipes that can be selected on, so this class is for
+    POSIX platforms.
+    """
+    def __init__(self, channels,
+                 reorder_window=256,
+                 flush_interval=0.05,
+                 name=None):
+        """
+        :param channels: a ``ChannelSet``
+        :param reorder_window: the maximum number of records held back for
+            reordering
+        :param flush_interval: seconds of quiet after which all held-back
+            records are released; also bounds how long ``stop()`` takes to
+            be noticed.
+        :param name: name of the listener thread
+        """
+        if selectors is None:                       # pragma: no cover
+            raise NotImplementedError("ChannelListener requires `selectors`"
+                                      " (Python 3.4+)")
+        super(ChannelListener, self).__init__(name=name)
+        self._readers = channels.readers
+        self.reorder_window = reorder_window
+        self.flush_interval = flush_interval
+        self._pending = []                  # heap of (created, seq, record)
+        self._released = []                 # records leaving the window
+        self._seq = itertools.count()
+
+    def _push(self, record):
+        heapq.heappush(self._pending, (record.created, next(self._seq), record))
+        while len(self._pending) > self.reorder_window:
+            self._released.append(heapq.heappop(self._pending)[2])
+
+    def _flush_pending(self):
+        while self._pending:
+            self._released.append(heapq.heappop(self._pending)[2])
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand the records released so far to their loggers, as one batch
+        (see :ref:`batching`)."""
+        if self._released:
+            released, self._released = self._released, []
+            dispatch_batch(released)
+
+    def _backlog(self):
+        # Records still in the pipes can't be counted
+        return len(self._pending)
+
+    def after_fork_in_child(self):
+        super(ChannelListener, self).after_fork_in_child()
+        self._pending = []
+        self._released = []
+
+    # Most records to take from one channel before looking at the others
+    _max_per_channel = 64
+
+    def _drain(self, conn, limit=None):
+        """Receive what's available on ``conn`` -- at most ``limit`` records,
+        if ``limit`` isn't ``None``.
+
+        :return: ``False`` if ``conn`` has reached end-of-file, else ``True``
+        """
+        try:
+            n = 0
+            while (limit is None or n < limit) and conn.poll():
+                self._push(conn.recv())
+                n += 1
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        for conn in self._readers:
+            sel.register(conn, selectors.EVENT_READ)
+        try:
+            while sel.get_map() and not self._stop_event.is_set():
+                events = sel.select(timeout=self.flush_interval)
+                if not events:
+                    self._flush_pending()
+                    continue
+                for key, _ in events:
+                    if not self._drain(key.fileobj, self._max_per_channel):
+                        sel.unregister(key.fileobj)
+                self._dispatch()
+            # Stopping: take whatever is still sitting in the pipes.
+            for key in list(sel.get_map().values()):
+                self._drain(key.fileobj)
+            self._flush_pending()
+        finally:
+            sel.close()
+
+
+# -----------------------------------------------------------------------
+# ShardedQueue, ShardedListener
+# -----------------------------------------------------------------------
+
+def _logger_name(record):
+    return record.name
+
+
+class ShardedQueue(object):
+    """A transport for the queue paradigm made of ``nshards``
+    ``multiprocessing.Queue`` objects. Each record goes to the shard selected by a
+    stable hash (CRC-32) of a key of the record -- by default, its logger
+    name -- so all records of a given logger travel through the same shard,
+    in order.
+
+    Like ``ChannelWriter``, it implements ``put_nowait``, so it can be passed
+    as the ``queue`` of ``LCDict.add_queue_handler``, or of a
+    ``QueueHandler`` (but not of a ``'class'`` queue handler in a
+    ``dictConfig`` dict, in Python 3.12+). Drain it with a
+    ``ShardedListener``.
+    """
+    def __init__(self, nshards, key=None):
+        """
+        :param nshards: number of shards (queues)
+        :param key: a callable of signature ``(logging.LogRecord) -> str``
+            whose value determines a record's shard; ``None`` means use
+            ``record.name``. To use a ``ShardedQueue`` in processes that
+            aren't forked, ``key`` must be picklable (e.g. a module-level
+            function).
+        """
+        self._queues = [Queue() for _ in range(nshards)]
+        self._key = key or _logger_name
+
+    def __len__(self):
+        return len(self._queues)
+
+    @property
+    def queues(self):
+        """(r/o property) The list of shards (``multiprocessing.Queue`` objects)."""
+        return list(self._queues)
+
+    def shard_of(self, record):
+        """Return the index of the shard that ``record`` belongs to."""
+        key = self._key(record).encode('utf-8')
+        return (zlib.crc32(key) & 0xffffffff) % len(self._queues)
+
+    def qsize(self):
+        """Return the approximate number of records in all shards."""
+        return sum(q.qsize() for q in self._queues)
+
+    def drain(self, deadline):
+        """Flush this process's records into the shards, giving up at time
+        ``deadline``. Called by the :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        return sum(lifecycle.drain_mp_queue(q, deadline) for q in self._queues)
+
+    def after_fork_in_child(self):
+        """Reset the child's view of the queues. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        for q in self._queues:
+            lifecycle.reset_mp_queue(q)
+
+    def put_nowait(self, record):
+        self._queues[self.shard_of(record)].put_nowait(record)
+
+    def put(self, record, block=True, timeout=None):
+        self._queues[self.shard_of(record)].put(record, block, timeout)
+
+
+class ShardedListener(object):
+    """A pool of drainer threads for a ``ShardedQueue``, one per shard.
+    Each thread does what the ``logging_thread`` of the example
+    ``mproc_approach__queue_handler_logging_thread.py`` does, for its own
+    shard. Records of any one logger are handled in order; records of
+    loggers in different shards are handled in parallel, which pays off
+    when their handlers write to different destinations.
+    """
+    def __init__(self, sharded_queue, name=None, batch_size=64):
+        """
+        :param sharded_queue: a ``ShardedQueue``
+        :param name: prefix for the names of the drainer threads
+        :param batch_size: the most records a drainer thread takes off its
+            shard, when they're waiting, and hands on as one batch
+            (see :ref:`batching`)
+        """
+        self._queues = sharded_queue.queues
+        self._name = name or self.__class__.__name__
+        self._threads = []
+        self.batch_size = batch_size
+
+    def _drain(self, q):
+        while True:
+            batch = [q.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except Empty:
+                    break
+            done = batch[-1] is None
+            if done:
+                batch.pop()
+            dispatch_batch(batch)
+            if done:
+                break
+
+    def start(self):
+        """Start the drainer threads.
+
+        :return: ``self``
+        """
+        self._threads = [
+            threading.Thread(target=self._drain, args=(q,),
+                             name='%s-%d' % (self._name, i))
+            for i, q in enumerate(self._queues)
+        ]
+        for t in self._threads:
+            t.daemon = True
+            t.start()
+        lifecycle.register_drainable(self)
+        return self
+
+    def stop(self, timeout=None):
+        """Tell the drainer threads to finish up once their shards are empty,
+        and wait (at most ``timeout`` seconds per thread, if not ``None``)
+        for them to do so.
+        """
+        for q in self._queues:
+            q.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def drain(self, deadline):
+        """Stop the drainer threads, giving them until time ``deadline`` to
+        empty their shards. Called by the :ref:`shutdown coordinator
+        <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        if not self._threads:
+            return 0
+        for q in self._queues:
+            q.put(None)
+        abandoned = 0
+        for t, q in zip(self._threads, self._queues):
+            t.join(lifecycle.remaining(deadline))
+            if t.is_alive():
+                abandoned += max(0, lifecycle._qsize(q) - 1)    # - sentinel
+        self._threads = []
+        return abandoned
+
+    def after_fork_in_child(self):
+        """Forget the parent's drainer threads. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._threads = []
+        lifecycle.unregister_drainable(self)
+
+    @property
+    def is_alive(self):
+        """(r/o property) ``True`` iff any drainer thread is running."""
+        return any(t.is_alive() for t in self._threads)
+
+
+# -----------------------------------------------------------------------
+# PriorityLanes, PriorityListener
+# -----------------------------------------------------------------------
+
+class PriorityLanes(object):
+    """A transport for the queue paradigm with a separate
+    ``multiprocessing.Queue`` -- a *lane* -- for each band of levels, so
+    that a ``PriorityListener`` can serve urgent records ahead of a backlog
+    of routine ones.
+
+    ``bands`` gives the lowest level of each lane but the last, from highest
+    to lowest. The default, ``('ERROR',)``, makes two lanes: ``ERROR`` and
+    above, and everything else; ``('ERROR', 'WARNING')`` makes three.
+
+    Like ``ChannelWriter``, it implements ``put_nowait``, so it can be passed
+    as the ``queue`` of ``LCDict.add_queue_handler``, or of a
+    ``QueueHandler`` (but not of a ``'class'`` queue handler in a
+    ``dictConfig`` dict, in Python 3.12+).
+    """
+    def __init__(self, bands=('ERROR',)):
+        """
+        :param bands: a sequence of level names or numbers
+        """
+        self._thresholds = sorted((logging._checkLevel(b) for b in bands),
+                                  reverse=True)
+        self._queues = [Queue() for _ in range(len(self._thresholds) + 1)]
+
+    def __len__(self):
+        return len(self._queues)
+
+    @property
+    def queues(self):
+        """(r/o property) The lanes, highest priority first."""
+        return list(self._queues)
+
+    def lane_of(self, record):
+        """Return the index of the lane for ``record`` (0 is the highest)."""
+        for i, threshold in enumerate(self._thresholds):
+            if record.levelno >= threshold:
+                return i
+        return len(self._thresholds)
+
+    def qsize(self):
+        """Return the approximate number of records in all lanes."""
+        return sum(q.qsize() for q in self._queues)
+
+    def drain(self, deadline):
+        """Flush this process's records into the lanes, giving up at time
+        ``deadline``. Called by the :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        return sum(lifecycle.drain_mp_queue(q, deadline) for q in self._queues)
+
+    def after_fork_in_child(self):
+        """Reset the child's view of the queues. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        for q in self._queues:
+            lifecycle.reset_mp_queue(q)
+
+    def put_nowait(self, record):
+        self._queues[self.lane_of(record)].put_nowait(record)
+
+    def put(self, record, block=True, timeout=None):
+        self._queues[self.lane_of(record)].put(record, block, timeout)
+
+
+_EMPTY = object()
+
+
+class PriorityListener(_ListenerThread):
+    """A listener thread that drains the lanes of a ``PriorityLanes``,
+    always taking the next record from the highest-priority lane that has
+    one, so an alert never waits behind a backlog of less urgent records.
+
+    The starvation guard: after ``starvation_limit`` consecutive records
+    from one lane, the next record is taken from a lower lane, if any has
+    one. So lower lanes keep moving, at a rate of at least one record per
+    ``starvation_limit``.
+    """
+    def __init__(self, lanes,
+                 starvation_limit=100,
+                 poll_interval=0.05,
+                 name=None):
+        """
+        :param lanes: a ``PriorityLanes``
+        :param starvation_limit: the most records taken in a row from one
+            lane while lower lanes are waiting
+        :param poll_interval: when all lanes are empty, the listener waits
+            on the highest lane for at most this many seconds before looking
+            at the others again
+        :param name: name of the listener thread
+        """
+        super(PriorityListener, self).__init__(name=name)
+        self._lanes = lanes.queues
+        self.starvation_limit = starvation_limit
+        self.poll_interval = poll_interval
+        self._last_lane = None
+        self._streak = 0
+        self._open_lanes = []
+
+    def _take(self, open_lanes):
+        """Return ``(lane index, record)`` from the lane that's due, or
+        ``(None, _EMPTY)`` if all open lanes are empty.
+        """
+        order = open_lanes
+        if self._streak >= self.starvation_limit:
+            # Give the lanes below the last one a turn
+            below = [i for i in open_lanes if i > self._last_lane]
+            order = below + [i for i in open_lanes if i <= self._last_lane]
+        for i in order:
+            try:
+                record = self._lanes[i].get_nowait()
+            except Empty:
+                continue
+            if i == self._last_lane:
+                self._streak += 1
+            else:
+                self._last_lane, self._streak = i, 1
+            return i, record
+        return None, _EMPTY
+
+    def _backlog(self):
+        # Less the sentinels still to be taken
+        return max(0, sum(lifecycle._qsize(q) for q in self._lanes)
+                      - len(self._open_lanes))
+
+    def _run(self):
+        self._open_lanes = open_lanes = list(range(len(self._lanes)))
+        while open_lanes:
+            i, record = self._take(open_lanes)
+            if record is _EMPTY:
+                i = open_lanes[0]
+                try:
+                    record = self._lanes[i].get(timeout=self.poll_interval)
+                except Empty:
+                    continue
+            if record is None:              # sentinel sent by stop()
+                open_lanes.remove(i)
+                continue
+            _handle_record(record)
+
+    def stop(self, timeout=None):
+        """Tell the listener thread to finish up once all lanes are empty,
+        and wait (at most ``timeout`` seconds, if not ``None``) for it to do so.
+        """
+        for q in self._lanes:
+            q.put(None)
+        super(PriorityListener, self).stop(timeout)
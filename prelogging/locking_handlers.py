@@ -8,6 +8,8 @@ __doc__ = """ \
 import logging
 from multiprocessing import Lock
 
+from .batching import BatchingMixin, write_batch, _syslog_emit_batch
+
 __all__ = [
     'MPLock_Mixin',
     'LockingStreamHandler',
@@ -25,6 +27,17 @@ __all__ = [
 # MPLock_Mixin -- a helper class mixed in to the Locking*Handler classes
 #############################################################################
 
+def _make_lock(create_lock, lock):
+    """Return the lock a ``Locking*Handler`` should use: ``lock``, a
+    ``multiprocessing.Lock`` created elsewhere (e.g. by the parent of a
+    spawned process) if one is given, else a new one if ``create_lock``,
+    else ``None``.
+    """
+    if lock is not None:
+        return lock
+    return Lock() if create_lock else None
+
+
 class MPLock_Mixin():
     """Mix in to a class with an instance attribute ``_mp_lock_``.
     That class should
@@ -46,7 +59,7 @@ class MPLock_Mixin():
             self._mp_lock_.release()
 
 
-class LockingStreamHandler(logging.StreamHandler, MPLock_Mixin):
+class LockingStreamHandler(logging.StreamHandler, MPLock_Mixin, BatchingMixin):
     """
     .. _LockingStreamHandler:
 
@@ -60,11 +73,12 @@ class LockingStreamHandler(logging.StreamHandler, MPLock_Mixin):
     def __init__(self,
                  stream=None,
                  create_lock=False,
+                 lock=None,
                  **kwargs):
         """Initialize the handler.
         If stream is not specified, sys.stderr is used.
         """
-        self._mp_lock_ = Lock() if create_lock else None
+        self._mp_lock_ = _make_lock(create_lock, lock)
         super(LockingStreamHandler, self).__init__(stream=stream, **kwargs)
 
     # def flush(self):
@@ -79,8 +93,18 @@ class LockingStreamHandler(logging.StreamHandler, MPLock_Mixin):
         super(LockingStreamHandler, self).emit(record)      # this calls flush()
         self._release_()
 
+    def emit_batch(self, records):
+        """Emit logging records with one write, one flush, and the lock
+        acquired once. Called by ``handle_batch``.
+        """
+        self._acquire_()
+        try:
+            write_batch(self, records)
+        finally:
+            self._release_()
 
-class LockingFileHandler(logging.FileHandler, MPLock_Mixin):
+
+class LockingFileHandler(logging.FileHandler, MPLock_Mixin, BatchingMixin):
     """
     .. _LockingFileHandler:
 
@@ -93,10 +117,11 @@ class LockingFileHandler(logging.FileHandler, MPLock_Mixin):
     def __init__(self, filename,
                  # mode='a', encoding=None, delay=False,
                  create_lock=False,
+                 lock=None,
                  **kwargs):
         """Open the specified file and use it as the stream for logging.
         """
-        self._mp_lock_ = Lock() if create_lock else None
+        self._mp_lock_ = _make_lock(create_lock, lock)
         super(LockingFileHandler, self).__init__(
             filename,
             # mode=mode, encoding=encoding, delay=delay,
@@ -109,10 +134,21 @@ class LockingFileHandler(logging.FileHandler, MPLock_Mixin):
         super(LockingFileHandler, self).emit(record)
         self._release_()
 
+    def emit_batch(self, records):
+        """Emit logging records with one write, one flush, and the lock
+        acquired once. Called by ``handle_batch``.
+        """
+        self._acquire_()
+        try:
+            write_batch(self, records)
+        finally:
+            self._release_()
+
 
 from logging import handlers
 
-class LockingRotatingFileHandler(logging.handlers.RotatingFileHandler, MPLock_Mixin):
+class LockingRotatingFileHandler(logging.handlers.RotatingFileHandler, MPLock_Mixin,
+                                 BatchingMixin):
     """
     .. _LockingRotatingFileHandler:
 
@@ -125,10 +161,11 @@ class LockingRotatingFileHandler(logging.handlers.RotatingFileHandler, MPLock_Mi
     def __init__(self, filename,
                  # mode='a', encoding=None, delay=False,
                  create_lock=False,
+                 lock=None,
                  **kwargs):
         """Open the specified file and use it as the stream for logging.
         """
-        self._mp_lock_ = Lock() if create_lock else None
+        self._mp_lock_ = _make_lock(create_lock, lock)
         super(LockingRotatingFileHandler, self).__init__(
             filename,
             # mode=mode, encoding=encoding, delay=delay,
@@ -142,12 +179,48 @@ class LockingRotatingFileHandler(logging.handlers.RotatingFileHandler, MPLock_Mi
         self._release_()
         self.close()        # . <-- Note well
 
+    def emit_batch(self, records):
+        """Emit logging records with the lock acquired once, and one write
+        and one flush for each run of records between rollovers, which
+        happen where ``emit`` would do them. Called by ``handle_batch``.
+        """
+        self._acquire_()
+        try:
+            run = []
+            size = None         # of the file, with ``run`` written
+            for record in records:
+                try:
+                    if self.maxBytes > 0:
+                        if size is None:
+                            if self.stream is None:
+                                self.stream = self._open()
+                            self.stream.seek(0, 2)
+                            size = self.stream.tell()
+                        # as shouldRollover measures it
+                        length = len(self.format(record) + '\n')
+                        if size + length >= self.maxBytes:
+                            if run:
+                                write_batch(self, run)
+                                run = []
+                            self.doRollover()
+                            size = 0
+                        size += length
+                except Exception:
+                    self.handleError(record)
+                    continue
+                run.append(record)
+            if run:
+                write_batch(self, run)
+        finally:
+            self._release_()
+        self.close()
+
 
 # import socket
 # from logging.handlers import SysLogHandler, SYSLOG_UDP_PORT
 from logging.handlers import SysLogHandler
 
-class LockingSysLogHandler(SysLogHandler, MPLock_Mixin):
+class LockingSysLogHandler(SysLogHandler, MPLock_Mixin, BatchingMixin):
     """
     .. _LockingSysLogHandler:
 
@@ -162,10 +235,11 @@ class LockingSysLogHandler(SysLogHandler, MPLock_Mixin):
                  # facility=SysLogHandler.LOG_USER,
                  # socktype=socket.SOCK_DGRAM,
                  create_lock=False,
+                 lock=None,
                  **kwargs):
         """Open the specified socket and use it as the destination for logging.
         """
-        self._mp_lock_ = Lock() if create_lock else None
+        self._mp_lock_ = _make_lock(create_lock, lock)
         super(LockingSysLogHandler, self).__init__(
                         # address=address, facility=facility, socktype=socktype,
                         **kwargs)
@@ -176,3 +250,13 @@ class LockingSysLogHandler(SysLogHandler, MPLock_Mixin):
         self._acquire_()
         super(LockingSysLogHandler, self).emit(record)
         self._release_()
+
+    def emit_batch(self, records):
+        """Emit logging records with the lock acquired once -- over TCP, as
+        one burst of framed messages. Called by ``handle_batch``.
+        """
+        self._acquire_()
+        try:
+            _syslog_emit_batch(self, records)
+        finally:
+            self._release_()
@@ -0,0 +1,164 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+``FlightRecorderHandler``, a handler that keeps the most recent records in
+memory, writing nothing, until something goes wrong -- then it writes them
+all, as context for the failure.
+
+The usual way to have DEBUG-level context around failures is to log at
+DEBUG all the time, and pay for the disk I/O of records nobody reads.
+A flight recorder keeps the last ``capacity`` records in a ring buffer,
+which costs an append per record. When a record at or above
+``trigger_level`` arrives, the handler passes the buffered records, followed
+by the trigger, to a *target* handler, and empties the buffer. Optionally,
+a signal dumps the buffer on demand.
+
+``LCDict.add_memory_handler`` configures one.
+"""
+
+import logging
+import signal
+import threading
+from collections import deque
+
+from ._handler_lookup import lookup_handler
+from .batching import handle_batch
+
+__all__ = [
+    'FlightRecorderHandler',
+]
+
+
+class FlightRecorderHandler(logging.Handler):
+    """
+    .. _FlightRecorderHandler:
+
+    A handler that buffers the last ``capacity`` records, and passes them to
+    the *target*, a named handler of the same configuration, when a record
+    at or above ``trigger_level`` arrives, or when ``dump()`` is called.
+
+    Unlike ``logging.handlers.MemoryHandler``, this handler never flushes
+    because its buffer is full -- it forgets the oldest record instead --
+    and ``flush()`` (which `logging` calls at exit) doesn't dump the buffer.
+
+    `logging` holds the target, which shouldn't be attached to a logger,
+    only weakly, so ``LCDict.config()`` hands it to this handler, which keeps
+    it (see ``resolve_targets``).
+
+    The target's level applies as well as this handler's; give the target
+    level ``NOTSET`` (its default) to write all the context. Records are
+    formatted by the target, when they're dumped, so objects passed as
+    arguments to logging calls shouldn't be mutated afterwards.
+
+    Metrics, available from ``metrics()``:
+
+        * ``depth``: records in the buffer
+        * ``dumps``: dumps so far
+        * ``dumped``: records passed to the target so far
+    """
+    def __init__(self, target, capacity=1000, trigger_level='ERROR',
+                 dump_signal=None, **kwargs):
+        """
+        :param target: the name of the handler that records are passed to
+        :param capacity: the most records kept; older ones are forgotten
+        :param trigger_level: a record at or above this level dumps the
+            buffer, and is passed on after it
+        :param dump_signal: a signal (number, or name such as ``'SIGUSR1'``)
+            that dumps the buffer. The handler for it is installed by this
+            constructor, which must then run in the main thread, and it
+            replaces any previous handler.
+        """
+        super(FlightRecorderHandler, self).__init__(**kwargs)
+        self.target_name = target
+        self.capacity = capacity
+        self.trigger_level = logging._checkLevel(trigger_level)
+        self._target = None
+        self._buffer = deque(maxlen=capacity)
+        self.dumps = 0
+        self.dumped = 0
+        if dump_signal is not None:
+            if not isinstance(dump_signal, int):
+                dump_signal = getattr(signal, dump_signal)
+            signal.signal(dump_signal, self._on_signal)
+
+    @property
+    def target(self):
+        """(r/o property) The target handler, as given by
+        ``resolve_targets``, or else looked up by name on first use."""
+        if self._target is None:
+            self._target = lookup_handler(self.target_name)
+        return self._target
+
+    def resolve_targets(self, handlers):
+        """Look up the target in ``handlers``, a dict name -> handler, or
+        else by name, and keep it. Called by ``LCDict.config()`` once
+        ``dictConfig`` has created the handlers.
+        """
+        self._target = lookup_handler(self.target_name, handlers)
+
+    def qsize(self):
+        """Return the number of records in the buffer."""
+        return len(self._buffer)
+
+    def metrics(self):
+        """Return a ``dict`` of this handler's metrics (see above)."""
+        return {'depth': len(self._buffer),
+                'dumps': self.dumps,
+                'dumped': self.dumped}
+
+    def emit(self, record):
+        """Buffer the record; or, if it's at or above ``trigger_level``, pass
+        the buffer's records and then it to the target. Called by `logging`,
+        with the handler's lock held.
+        """
+        if record.levelno >= self.trigger_level:
+            self._dump(record)
+        else:
+            self._buffer.append(record)
+
+    def _dump(self, trigger=None):
+        """Pass the buffer's records, and ``trigger`` if given, to the
+        target, and empty the buffer. The caller holds the handler's lock.
+        Errors, e.g. a target that can't be found, go to ``handleError``.
+        """
+        records = list(self._buffer)
+        self._buffer.clear()
+        if trigger is not None:
+            records.append(trigger)
+        if not records:
+            return
+        try:
+            target = self.target
+            records = [record for record in records
+                       if record.levelno >= target.level]
+            handle_batch(target, records)
+        except Exception:
+            self.handleError(records[-1])
+            return
+        self.dumps += 1
+        self.dumped += len(records)
+
+    def dump(self):
+        """Pass the buffered records to the target now, and empty the
+        buffer.
+        """
+        self.acquire()
+        try:
+            self._dump()
+        finally:
+            self.release()
+
+    def _on_signal(self, signum, frame):
+        # The interrupted code may hold this handler's lock (or the
+        # target's): dump from another thread, which waits for it
+        t = threading.Thread(target=self.dump,
+                             name='FlightRecorderHandler-dump')
+        t.daemon = True
+        t.start()
+
+    def flush(self):
+        """Flush the target, if it's been used. Doesn't dump the buffer."""
+        if self._target is not None:
+            self._target.flush()
@@ -0,0 +1,420 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Handlers that never make the logging thread wait on I/O.
+
+``NonBlockingHandler`` puts a dedicated writer thread, fed through a bounded
+double buffer, in front of any other handler. It's what the ``nonblocking``
+parameter of ``LCDict``'s handler-adding methods configures: the same
+arrangement as the ``QueueHandler``/``QueueListener`` pair of the example
+``queue_handler_listener.py``, but for any one handler, and with metrics.
+
+``NonBlockingStreamHandler`` writes to a stream -- typically ``stdout`` or
+``stderr`` -- whose file descriptor it puts in non-blocking mode, so that a
+reader that stops reading can't freeze the threads that log. It's what the
+``nonblocking_stream`` parameter of ``LCDict.add_stream_handler`` (and of
+``add_stdout_handler``, ``add_stderr_handler``) configures.
+"""
+
+import errno
+import logging
+import os
+import select
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:                     # pragma: no cover
+    fcntl = None                        # Windows
+
+from ._handler_lookup import lookup_handler
+from .batching import handle_batch
+from .six import RecursionError
+from . import lifecycle
+
+__all__ = [
+    'NonBlockingHandler',
+    'NonBlockingStreamHandler',
+]
+
+
+class NonBlockingHandler(logging.Handler):
+    """
+    .. _NonBlockingHandler:
+
+    A handler that hands records off to a writer thread in O(1), and
+    returns. The writer passes them on to the *target*, a named handler of
+    the same configuration, which does the actual, possibly blocking, I/O.
+
+    Records are appended to a *front* buffer. Whenever the writer is free, it
+    swaps the front buffer for an empty one and delivers everything in it to
+    the target as one batch (see :ref:`batching`); meanwhile, logging threads
+    keep appending to the new front buffer. The front buffer holds at most
+    ``capacity`` records: if the target falls that far behind, further
+    records are dropped, and counted, rather than making logging threads
+    wait.
+
+    The target's level applies as well as this handler's. If this handler
+    has a formatter and the target doesn't, the target gets this handler's.
+    `logging` holds the target, which isn't attached to a logger, only
+    weakly, so ``LCDict.config()`` hands it to this handler, which keeps it
+    (see ``resolve_targets``). If delivering a batch fails, the error goes
+    to ``handleError``, and the writer carries on with the next batch.
+
+    Records are formatted by the target, on the writer thread, so objects
+    passed as arguments to logging calls shouldn't be mutated afterwards.
+
+    Metrics, available from ``metrics()``:
+
+        * ``depth``: records waiting in the front buffer
+        * ``max_depth``: the greatest depth so far
+        * ``dropped``: records dropped because the buffer was full
+        * ``delivered``: records the target handled (that passed its level
+          and filters)
+        * ``latency``: seconds between the creation and delivery of the
+          oldest record of the latest batch
+
+    ``qsize()`` (the depth) and ``latency`` are what an
+    :ref:`AdaptiveVerbosityFilter <AdaptiveVerbosityFilter>` watches.
+    """
+    # Longest (seconds) that ``flush`` and ``close`` wait for the writer
+    flush_timeout = 5.0
+
+    def __init__(self, target, capacity=10000, **kwargs):
+        """
+        :param target: the name of the handler that records are passed to
+        :param capacity: the most records waiting for the writer thread;
+            more are dropped
+        """
+        super(NonBlockingHandler, self).__init__(**kwargs)
+        self.target_name = target
+        self.capacity = capacity
+        self._target = None
+        self._cond = threading.Condition(threading.Lock())
+        self._front = []
+        self._inflight = 0          # records the writer is delivering
+        self._thread = None
+        self._stopping = False
+        self.max_depth = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.latency = 0.0
+        lifecycle.register_drainable(self)
+
+    @property
+    def target(self):
+        """(r/o property) The target handler, as given by
+        ``resolve_targets``, or else looked up by name on first use."""
+        if self._target is None:
+            self._keep_target(lookup_handler(self.target_name))
+        return self._target
+
+    def resolve_targets(self, handlers):
+        """Look up the target in ``handlers``, a dict name -> handler, or
+        else by name, and keep it. Called by ``LCDict.config()`` once
+        ``dictConfig`` has created the handlers.
+        """
+        self._keep_target(lookup_handler(self.target_name, handlers))
+
+    def _keep_target(self, target):
+        if target.formatter is None and self.formatter is not None:
+            target.setFormatter(self.formatter)
+        self._target = target
+
+    def qsize(self):
+        """Return the number of records waiting for the writer thread."""
+        return len(self._front)
+
+    def metrics(self):
+        """Return a ``dict`` of this handler's metrics (see above)."""
+        return {'depth': len(self._front),
+                'max_depth': self.max_depth,
+                'dropped': self.dropped,
+                'delivered': self.delivered,
+                'latency': self.latency}
+
+    def emit(self, record):
+        """Append the record to the front buffer, or drop it if the buffer
+        is full. Called by `logging`.
+        """
+        with self._cond:
+            depth = len(self._front)
+            if depth >= self.capacity:
+                self.dropped += 1
+                return
+            self._front.append(record)
+            if depth >= self.max_depth:
+                self.max_depth = depth + 1
+            if self._thread is None:
+                self._start()
+            elif not depth:
+                self._cond.notify_all()
+
+    def _start(self):
+        """Start the writer thread. The caller holds ``self._cond``."""
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name='NonBlockingHandler-%s' % (self.name or self.target_name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._front and not self._stopping:
+                    self._cond.wait()
+                if not self._front:
+                    return
+                batch, self._front = self._front, []
+                self._inflight = len(batch)
+            try:
+                self._deliver(batch)
+            except Exception:
+                # e.g. no such target: report it, and keep the thread alive
+                self.handleError(batch[-1])
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    self._cond.notify_all()
+
+    def _deliver(self, records):
+        target = self.target
+        self.delivered += handle_batch(
+            target, [record for record in records
+                     if record.levelno >= target.level])
+        self.latency = time.time() - records[0].created
+
+    def _wait(self, deadline):
+        """Wait, until time ``deadline`` at the latest, for the writer to
+        deliver everything buffered.
+
+        :return: the number of records not yet delivered
+        """
+        with self._cond:
+            while self._front or self._inflight:
+                left = lifecycle.remaining(deadline)
+                if not left or self._thread is None:
+                    break
+                self._cond.wait(left)
+            return len(self._front) + self._inflight
+
+    def flush(self):
+        """Wait (at most ``flush_timeout`` seconds) for the writer to
+        deliver everything buffered, and flush the target.
+        """
+        self._wait(time.time() + self.flush_timeout)
+        if self._target is not None:
+            self._target.flush()
+
+    def drain(self, deadline):
+        """Deliver everything buffered and stop the writer, giving up at time
+        ``deadline``. Called by the :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        abandoned = self._wait(deadline)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None and not abandoned:
+            thread.join(lifecycle.remaining(deadline))
+        return abandoned
+
+    def after_fork_in_child(self):
+        """Forget the parent's buffered records (the parent delivers them)
+        and writer thread. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._front = []
+        self._inflight = 0
+        self._thread = None
+
+    def close(self):
+        """Deliver what's buffered (waiting at most ``flush_timeout``
+        seconds) and stop the writer thread. Called by `logging` at exit.
+        """
+        self.drain(time.time() + self.flush_timeout)
+        super(NonBlockingHandler, self).close()
+
+
+class NonBlockingStreamHandler(logging.StreamHandler):
+    """
+    .. _NonBlockingStreamHandler:
+
+    A stream handler that never waits for its stream's reader.
+
+    It puts the stream's file descriptor in non-blocking mode and writes
+    each formatted record to it directly. When the descriptor can't take
+    (all of) the data -- a pipe whose reader has stopped reading, say --
+    what's left is kept in a buffer of at most ``max_buffer`` bytes, written
+    out ahead of later records as soon as the descriptor accepts data again.
+    A record that doesn't fit in the buffer is dropped, and counted in
+    ``dropped``.
+
+    Caveats:
+
+        * Non-blocking mode belongs to the open file, not to this handler:
+          it affects everything else that writes to the same descriptor,
+          in this process and in any that share it (a shell, a terminal,
+          child processes), until ``close`` restores the file's blocking
+          mode. Python code that writes to the stream (``print``, say) can
+          get ``BlockingIOError`` while the reader isn't reading.
+        * Records are written with ``os.write``, bypassing the stream's own
+          buffer, which is flushed when the handler starts using the
+          descriptor. Text written to the stream later, but not flushed, may
+          appear after records logged later.
+
+    If the stream has no file descriptor, or the platform lacks ``fcntl``,
+    this handler behaves as a ``logging.StreamHandler``.
+    """
+    # Longest (seconds) that ``close`` waits for the buffer to be written
+    flush_timeout = 1.0
+
+    def __init__(self, stream=None, max_buffer=1024 * 1024, **kwargs):
+        """
+        :param stream: the stream to write to; default: ``sys.stderr``
+        :param max_buffer: the most bytes kept for writing later
+        """
+        super(NonBlockingStreamHandler, self).__init__(stream=stream, **kwargs)
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._pending = bytearray()
+        self._fd = None
+        # The descriptor's flags, to restore, if this handler made it
+        # non-blocking
+        self._saved_flags = None
+        self._encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        lifecycle.register_drainable(self)
+
+    def _get_fd(self):
+        """Return the stream's descriptor, in non-blocking mode; or -1, if it
+        can't have one. The caller holds the handler's lock.
+        """
+        if self._fd is None:
+            try:
+                fd = self.stream.fileno()
+                self.stream.flush()
+                flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                if not flags & os.O_NONBLOCK:
+                    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+                    self._saved_flags = flags
+            except Exception:           # no fileno, no fcntl, ...
+                fd = -1
+            self._fd = fd
+        return self._fd
+
+    @property
+    def pending_bytes(self):
+        """(r/o property) The number of bytes waiting to be written."""
+        return len(self._pending)
+
+    def _write_pending(self, fd):
+        """Write as much of the buffer as ``fd`` takes without blocking.
+
+        :return: ``True`` iff the buffer is now empty
+        """
+        pending = self._pending
+        while pending:
+            try:
+                n = os.write(fd, pending)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return False
+                raise
+            del pending[:n]
+        return True
+
+    def emit(self, record):
+        """Write the record without blocking, or buffer or drop it. Called by
+        `logging`, with the handler's lock held.
+        """
+        fd = self._get_fd()
+        if fd < 0:
+            super(NonBlockingStreamHandler, self).emit(record)
+            return
+        try:
+            data = (self.format(record) + self.terminator).encode(
+                self._encoding, 'backslashreplace')
+            self._write_pending(fd)
+            if len(self._pending) + len(data) > self.max_buffer:
+                self.dropped += 1
+                return
+            self._pending += data
+            self._write_pending(fd)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Write what the descriptor takes of the buffer, without blocking."""
+        self.acquire()
+        try:
+            if self._fd is None or self._fd < 0:
+                super(NonBlockingStreamHandler, self).flush()
+            elif self._pending:
+                self._write_pending(self._fd)
+        finally:
+            self.release()
+
+    def drain(self, deadline):
+        """Write the buffer, waiting for the descriptor to accept data until
+        time ``deadline`` at the latest. Called by the
+        :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned: 1 if part of the buffer is
+            left unwritten, else 0 (records aren't tracked once buffered)
+        """
+        self.acquire()
+        try:
+            fd = self._fd
+            if fd is None or fd < 0:
+                return 0
+            while not self._write_pending(fd):
+                left = lifecycle.remaining(deadline)
+                if not left:
+                    return 1
+                select.select([], [fd], [], left)
+            return 0
+        finally:
+            self.release()
+
+    def after_fork_in_child(self):
+        """Forget the parent's buffered bytes (the parent writes them).
+        Called in the child by the :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._pending = bytearray()
+
+    def _restore_flags(self):
+        """Put the descriptor back in the mode it was in before this
+        handler made it non-blocking; from now on, write to the stream as
+        ``logging.StreamHandler`` does."""
+        self.acquire()
+        try:
+            if self._saved_flags is not None:
+                try:
+                    fcntl.fcntl(self._fd, fcntl.F_SETFL, self._saved_flags)
+                except OSError:         # e.g. the descriptor was closed
+                    pass
+                self._saved_flags = None
+            self._fd = -1
+        finally:
+            self.release()
+
+    def close(self):
+        """Write the buffer, waiting at most ``flush_timeout`` seconds, and
+        restore the descriptor's blocking mode. Called by `logging` at exit.
+        """
+        try:
+            self.drain(time.time() + self.flush_timeout)
+        finally:
+            try:
+                self._restore_flags()
+            finally:
+                super(NonBlockingStreamHandler, self).close()
@@ -0,0 +1,497 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Making ``LogRecord``\\ s cheaper to create.
+
+For every record, `logging` walks the stack to find the caller
+(``findCaller``), and looks up the current thread's name and id, the
+process id and the ``multiprocessing`` process name -- whether or not
+anything ever uses them. Each of these can be switched off globally:
+``logging.logThreads``, ``logging.logProcesses``,
+``logging.logMultiprocessing`` (and, in Python 3.12+,
+``logging.logAsyncioTasks``), and, for the stack walk, ``logging._srcfile``.
+
+``lean_records(config)`` works out which of these a logging configuration
+dict consumes -- through the format strings of its formatters, through its
+filters, or by shipping whole records elsewhere -- and switches off the
+rest, and reports what it decided. ``LCDict.config(lean_records=True)``
+calls it.
+
+Records can also be made smaller. A ``LogRecord`` keeps its twenty-odd
+attributes in a per-instance ``__dict__``; ``CompactLogRecord`` keeps them
+in ``__slots__``, and saves that dict -- which adds up for handlers that
+hold hundreds of thousands of records (memory handlers, bounded queues,
+batching transports). ``use_compact_records()`` installs a record factory
+that makes them; ``LCDict.config(compact_records=True)`` calls it.
+
+Fields that every record should carry -- static ones, such as a service
+name, and ones that vary by request, such as a request id, kept in
+``contextvars`` -- are commonly added by a filter on each handler, which
+repeats the work once per handler. ``add_record_fields`` installs a record
+factory that adds them once, when a record is created;
+``LCDict.add_record_fields`` declares them for ``LCDict.config`` to install.
+"""
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:                     # pragma: no cover
+    from collections import MutableMapping      # PY2
+try:
+    import contextvars
+except ImportError:                     # pragma: no cover
+    contextvars = None                  # PY2, Python < 3.7
+import inspect
+import logging
+import logging.config
+import re
+
+from .formatters import format_fields
+
+__all__ = [
+    'lean_records',
+    'CompactLogRecord',
+    'use_compact_records',
+    'add_record_fields',
+    'remove_record_fields',
+]
+
+# `logging` switch -> the record attributes it provides
+_SWITCHES = [
+    ('logThreads', ('thread', 'threadName')),
+    ('logProcesses', ('process',)),
+    ('logMultiprocessing', ('processName',)),
+    ('logAsyncioTasks', ('taskName',)),                 # Python 3.12+
+    ('_srcfile', ('pathname', 'filename', 'module', 'lineno', 'funcName',
+                  'stack_info')),
+]
+_SWITCHES = [(switch, attrs) for switch, attrs in _SWITCHES
+             if hasattr(logging, switch)]
+
+_ALL = frozenset(attr for _, attrs in _SWITCHES for attr in attrs)
+
+_mentions = re.compile(r'\b(%s)\b' % '|'.join(sorted(_ALL)))
+
+# ``lean_records`` logs its decisions (at INFO) to this logger
+LOGGER_NAME = 'prelogging.records'
+
+# logging._srcfile as `logging` set it, for switching the stack walk back on
+_srcfile = logging._srcfile
+
+# Formatter classes whose output is their format string's fields
+# (structured formatters add only ``extra`` attributes and exception info)
+_PLAIN_FORMATTERS = ('logging.Formatter',
+                     'prelogging.formatters.FastFormatter',
+                     'prelogging.formatters.JsonFormatter',
+                     'prelogging.formatters.LogfmtFormatter')
+
+# Handlers that pass whole records on -- to other processes, to a server --
+# where anything may consume any attribute
+_SHIPPING_HANDLERS = ('logging.handlers.QueueHandler',
+                      'logging.handlers.SocketHandler',
+                      'logging.handlers.DatagramHandler',
+                      'logging.handlers.HTTPHandler',
+                      'prelogging.collector.CollectorHandler')
+
+
+def _name(spec):
+    """Return the dotted name of a class given in a config dict, as a
+    string or an object, without any ``ext://`` prefix."""
+    if isinstance(spec, str):
+        return spec[6:] if spec.startswith('ext://') else spec
+    return '%s.%s' % (getattr(spec, '__module__', ''),
+                      getattr(spec, '__qualname__', ''))
+
+
+def _resolve(spec):
+    """Return the object named by ``spec``, or ``spec``; ``None`` if it
+    can't be imported."""
+    if not isinstance(spec, str):
+        return spec
+    try:
+        return logging.config.BaseConfigurator({}).resolve(_name(spec))
+    except (ImportError, ValueError):
+        return None
+
+
+def _mentioned(obj):
+    """Return the attributes of ``_ALL`` that ``obj``'s source mentions; all
+    of them if its source isn't available. An object can say which it uses
+    with a ``record_attributes`` attribute.
+    """
+    declared = getattr(obj, 'record_attributes', None)
+    if declared is not None:
+        return _ALL.intersection(declared)
+    try:
+        source = inspect.getsource(obj)
+    except (TypeError, OSError):
+        return set(_ALL)
+    return set(_mentions.findall(source))
+
+
+def _formatter_uses(fdict):
+    cls = fdict.get('()', fdict.get('class', 'logging.Formatter'))
+    if _name(cls) not in _PLAIN_FORMATTERS:
+        return _mentioned(_resolve(cls))
+    fields = format_fields(fdict.get('format') or fdict.get('fmt')
+                           or '%(message)s',
+                           fdict.get('style', '%'))
+    return _ALL.intersection(fields) if fields is not None else set(_ALL)
+
+
+def _filter_uses(fdict):
+    # The factory, and any callables passed to it (e.g. the function of a
+    # callable filter)
+    objs = [fdict['()']] if '()' in fdict else []
+    objs.extend(value for key, value in fdict.items()
+                if key != '()' and callable(value))
+    used = set()
+    for obj in objs:
+        used |= _mentioned(_resolve(obj))
+    return used
+
+
+def attributes_used(config):
+    """Return the attributes, among those that `logging` can be told not to
+    collect, that the logging configuration dict ``config`` may consume,
+    as a dict: attribute -> what consumes it (a list of strings).
+    """
+    used = {}
+
+    def note(attrs, consumer):
+        for attr in attrs:
+            used.setdefault(attr, []).append(consumer)
+
+    for name, fdict in config.get('formatters', {}).items():
+        note(_formatter_uses(fdict), "formatter '%s'" % name)
+    for name, fdict in config.get('filters', {}).items():
+        note(_filter_uses(fdict), "filter '%s'" % name)
+    for name, hdict in config.get('handlers', {}).items():
+        cls = hdict.get('()', hdict.get('class'))
+        if _name(cls) in _SHIPPING_HANDLERS:
+            note(_ALL, "handler '%s' (passes records on)" % name)
+    return used
+
+
+def lean_records(config, keep=()):
+    """Switch off `logging`'s collection of the record attributes that
+    nothing in the logging configuration dict ``config`` consumes, and
+    switch on collection of those that something does.
+
+    Filters -- and formatters of classes other than ``logging.Formatter``
+    and ``FastFormatter`` -- are judged by their source code: if it
+    mentions an attribute (``threadName``, ``lineno``, ...), they're taken
+    to consume it. A filter or formatter class can instead declare the
+    attributes it uses in a ``record_attributes`` class attribute.
+    Handlers that pass records on (queue, socket and collector handlers)
+    are taken to consume everything.
+
+    With the stack walk off, ``stack_info=True`` in logging calls has no
+    effect; pass ``keep=['stack_info']`` if you use it.
+
+    :param config: a logging configuration dict, e.g. an ``LCDict``
+    :param keep: attributes to collect regardless -- consumed by code
+        that isn't in ``config``
+    :return: a list of the decisions made, one per switch:
+        ``(switch, enabled, reason)``, e.g.
+        ``('logThreads', False, 'nothing uses thread, threadName')``
+    """
+    decisions = _lean_decisions(config, keep)
+    _apply_lean_decisions(decisions)
+    return decisions
+
+
+def _lean_decisions(config, keep=()):
+    """Return the decisions that ``lean_records(config, keep)`` would make,
+    without making them."""
+    used = attributes_used(config)
+    for attr in keep:
+        used.setdefault(attr, []).append('keep')
+    decisions = []
+    for switch, attrs in _SWITCHES:
+        consumers = ['%s: %s' % (attr, ', '.join(used[attr]))
+                     for attr in attrs if attr in used]
+        enabled = bool(consumers)
+        reason = ('used by ' + '; '.join(consumers) if enabled else
+                  'nothing uses ' + ', '.join(attrs))
+        decisions.append((switch, enabled, reason))
+    return decisions
+
+
+def _apply_lean_decisions(decisions):
+    """Set `logging`'s switches as ``decisions`` (returned by
+    ``_lean_decisions``) say, and log the decisions."""
+    for switch, enabled, _ in decisions:
+        if switch == '_srcfile':
+            logging._srcfile = _srcfile if enabled else None
+        else:
+            setattr(logging, switch, enabled)
+    log = logging.getLogger(LOGGER_NAME)
+    for switch, enabled, reason in decisions:
+        log.info("%s %s: %s", 'collecting' if enabled else 'not collecting',
+                 switch, reason)
+
+
+# -----------------------------------------------------------------------
+# Compact records
+# -----------------------------------------------------------------------
+
+# The attributes that ``LogRecord.__init__`` sets, in order
+_INIT_ATTRIBUTES = tuple(
+    logging.LogRecord('', logging.INFO, '', 0, '', (), None).__dict__)
+
+# ... and those that formatters and handlers add
+_SLOTS = _INIT_ATTRIBUTES + ('message', 'asctime')
+
+_object_setattr = object.__setattr__
+
+
+class _RecordDict(MutableMapping):
+    """The ``__dict__`` of a ``CompactLogRecord``: a mapping, backed by the
+    record, of its attributes -- its slots that are set, and its other
+    attributes -- for code that reads or writes ``record.__dict__``.
+    """
+    __slots__ = ('_record',)
+
+    def __init__(self, record):
+        self._record = record
+
+    def _extra(self):
+        try:
+            return self._record._extra
+        except AttributeError:
+            return {}
+
+    def __getitem__(self, key):
+        if key in _SLOT_SET:
+            try:
+                return getattr(self._record, key)
+            except AttributeError:
+                raise KeyError(key)
+        return self._extra()[key]
+
+    def __setitem__(self, key, value):
+        setattr(self._record, key, value)
+
+    def __delitem__(self, key):
+        try:
+            delattr(self._record, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        record = self._record
+        for key in _SLOTS:
+            try:
+                getattr(record, key)
+            except AttributeError:
+                continue
+            yield key
+        for key in list(self._extra()):
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __ror__(self, other):
+        # `defaults | record.__dict__`, in logging.Formatter (Python 3.10+)
+        d = dict(other)
+        d.update(self)
+        return d
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+_SLOT_SET = frozenset(_SLOTS)
+
+
+class _CompactRecordBase(object):
+    # Records are made as instances of this class, with plain attribute
+    # assignments, then given their class, ``CompactLogRecord``, which
+    # routes other attributes to a dict
+    __slots__ = _SLOTS + ('_extra', '__weakref__')
+
+    __init__ = logging.LogRecord.__init__
+    getMessage = logging.LogRecord.getMessage
+    __repr__ = __str__ = logging.LogRecord.__repr__
+
+
+class CompactLogRecord(_CompactRecordBase):
+    """
+    .. _CompactLogRecord:
+
+    (*Python 3 only*) A log record that keeps the attributes of a
+    ``logging.LogRecord`` in ``__slots__``, rather than in a ``__dict__``,
+    and any others -- ``extra`` attributes, fields added by filters -- in a
+    dict that's created only if it's needed.
+
+    ``record.__dict__`` is a mapping of all its attributes, which reads and
+    writes them, so formatters that render ``record.__dict__``, and
+    ``Logger.makeRecord``, which adds ``extra`` to it, work as usual. It isn't
+    a ``logging.LogRecord`` subclass, though, as that would give it a
+    ``__dict__``.
+
+    Make them with ``compact_record_factory``, which is faster than
+    calling this class.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        try:
+            _object_setattr(self, name, value)
+        except AttributeError:
+            try:
+                extra = self._extra
+            except AttributeError:
+                extra = self._extra = {}
+            extra[name] = value
+
+    def __getattr__(self, name):
+        # Only called if there's no such slot, or it isn't set
+        if name != '_extra':
+            try:
+                return self._extra[name]
+            except (AttributeError, KeyError):
+                pass
+        raise AttributeError("'%s' object has no attribute '%s'"
+                             % (type(self).__name__, name))
+
+    def __delattr__(self, name):
+        try:
+            object.__delattr__(self, name)
+        except AttributeError:
+            try:
+                del self._extra[name]
+            except (AttributeError, KeyError):
+                raise AttributeError(name)
+
+    @property
+    def __dict__(self):
+        return _RecordDict(self)
+
+    def __getstate__(self):
+        return dict(self.__dict__)
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+
+def compact_record_factory(*args, **kwargs):
+    """A record factory, for ``logging.setLogRecordFactory``, that makes
+    ``CompactLogRecord``\\ s."""
+    record = _CompactRecordBase(*args, **kwargs)
+    record.__class__ = CompactLogRecord
+    return record
+
+
+def use_compact_records(enable=True):
+    """Install ``compact_record_factory`` as `logging`'s record factory --
+    unless some other factory than ``logging.LogRecord`` is installed --
+    or, if not ``enable``, uninstall it. (A factory installed by
+    ``add_record_fields`` is kept, making records with the factory
+    installed here.)
+
+    :param enable: install (true) or uninstall (false)
+    :return: whether ``compact_record_factory`` is now installed
+    """
+    current = logging.getLogRecordFactory()
+    fields = current if isinstance(current, _FieldsFactory) else None
+    base = fields.base if fields else current
+    if enable and base is logging.LogRecord:
+        base = compact_record_factory
+    elif not enable and base is compact_record_factory:
+        base = logging.LogRecord
+    else:
+        return base is compact_record_factory
+    logging.setLogRecordFactory(
+        _FieldsFactory(base, fields.static, fields.context) if fields
+        else base)
+    return base is compact_record_factory
+
+
+# -----------------------------------------------------------------------
+# Fields added to every record
+# -----------------------------------------------------------------------
+
+class _FieldsFactory(object):
+    """A record factory that adds fields to each record that another
+    factory, ``base``, makes: the items of the dict ``static``, and, for
+    each item ``name: var`` of the dict ``context``, ``var``'s value in the
+    current context (``None`` if it has none).
+    """
+    def __init__(self, base, static, context):
+        self.base = base
+        self.static = dict(static)
+        self.context = dict(context)
+        self._context_items = tuple(self.context.items())
+
+    def __call__(self, *args, **kwargs):
+        record = self.base(*args, **kwargs)
+        fields = self.static.copy()
+        for name, var in self._context_items:
+            try:
+                fields[name] = var.get()
+            except LookupError:
+                fields[name] = None
+        if type(record) is CompactLogRecord:
+            try:
+                record._extra.update(fields)
+            except AttributeError:
+                record._extra = fields
+        else:
+            record.__dict__.update(fields)
+        return record
+
+
+def _split_fields(fields):
+    """Return ``(static, context)``: the items of the dict ``fields`` whose
+    values aren't ``ContextVar``\\ s, and those whose values are, as two
+    dicts."""
+    static = {}
+    context = {}
+    for name, value in fields.items():
+        if contextvars and isinstance(value, contextvars.ContextVar):
+            context[name] = value
+        else:
+            static[name] = value
+    return static, context
+
+
+def add_record_fields(fields):
+    """Install a record factory that adds ``fields`` to every record when
+    it's created, wrapping the record factory installed now. If that's one
+    installed by this function, the new fields are added to its fields.
+
+    Values of ``fields`` that are ``contextvars.ContextVar``\\ s are read
+    for each record, in the context of the logging call; others are added
+    as they are.
+
+    Fields are added as ``extra`` attributes are, so a logging call can't
+    pass an ``extra`` with the same name as a field (`logging` raises
+    ``KeyError``).
+
+    :param fields: a dict, field name -> value or ``ContextVar``
+    """
+    static, context = _split_fields(fields)
+    current = logging.getLogRecordFactory()
+    if isinstance(current, _FieldsFactory):
+        base = current.base
+        # (a field can change from static to context, or back)
+        static.update((k, v) for k, v in current.static.items()
+                      if k not in fields)
+        context.update((k, v) for k, v in current.context.items()
+                       if k not in fields)
+    else:
+        base = current
+    logging.setLogRecordFactory(_FieldsFactory(base, static, context))
+
+
+def remove_record_fields():
+    """Uninstall the record factory installed by ``add_record_fields``,
+    reinstalling the one it wrapped."""
+    current = logging.getLogRecordFactory()
+    if isinstance(current, _FieldsFactory):
+        logging.setLogRecordFactory(current.base)
@@ -0,0 +1,252 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Scrubbing secrets -- tokens, passwords, card numbers, email addresses --
+from logged messages.
+
+Redacting with a chain of ``re.sub`` calls, one per pattern, scans every
+message once per pattern. ``RedactionFilter`` combines its patterns into
+one regular expression, and scans each message at most once; before that,
+it checks which of the patterns' *triggers* the message contains --
+literal substrings without which they can't match, such as ``@`` for an
+email address -- and scans only for the patterns triggered, or, if there
+are none, lets the message through untouched. Most messages contain no
+secrets, and cost only a few substring searches.
+"""
+
+import logging
+import re
+from collections import namedtuple
+
+__all__ = [
+    'RedactionFilter',
+    'RedactionPattern',
+    'PATTERNS',
+]
+
+
+class RedactionPattern(namedtuple('_RedactionPattern_',
+                                  ('regex', 'triggers', 'check'))):
+    """A pattern for ``RedactionFilter``:
+
+        * ``regex``: a regular expression (a string, or compiled). If it
+          has a group named ``secret``, only that part of a match is
+          replaced; e.g. the value, but not the key, of ``password=...``.
+        * ``triggers``: lowercase substrings, one of which a message must
+          contain (ignoring case) for ``regex`` to match in it; or ``None``
+          if there are none.
+        * ``check``: a function that decides whether a match (its text, or
+          the text of its ``secret`` group) is really a secret -- e.g. a
+          Luhn check for card numbers; or ``None``, to redact every match.
+    """
+    __slots__ = ()
+
+    def __new__(cls, regex, triggers=None, check=None):
+        if triggers is not None:
+            triggers = tuple(t.lower() for t in triggers)
+        return super(RedactionPattern, cls).__new__(cls, regex, triggers,
+                                                    check)
+
+
+def _luhn(text):
+    """Return whether the digits of ``text`` pass the Luhn check, as card
+    numbers' do."""
+    digits = [int(c) for c in text if c.isdigit()]
+    total = sum(digits[-1::-2])
+    total += sum(d * 2 - 9 if d > 4 else d * 2 for d in digits[-2::-2])
+    return total % 10 == 0
+
+
+# Preset patterns, by name
+PATTERNS = {
+    'email': RedactionPattern(
+        r'[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}',
+        triggers=('@',)),
+    'card': RedactionPattern(
+        r'\b\d(?:[ -]?\d){12,18}\b',
+        check=_luhn),
+    'bearer': RedactionPattern(
+        r'(?i:\bbearer)\s+(?P<secret>[\w.~+/-]+=*)',
+        triggers=('bearer',)),
+    'password': RedactionPattern(
+        r'(?i:\b(?:password|passwd|pwd|secret|api[_-]?key|access[_-]?token'
+        r'|auth[_-]?token|token))["\']?\s*[:=]\s*["\']?'
+        r'(?P<secret>[^\s"\',;&]+)',
+        triggers=('pass', 'pwd', 'secret', 'key', 'token')),
+    'aws_key': RedactionPattern(
+        r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b',
+        triggers=('akia', 'asia')),
+    'jwt': RedactionPattern(
+        r'\beyJ[\w-]+\.[\w-]+\.[\w-]+',
+        triggers=('eyj',)),
+}
+
+_FLAG_LETTERS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'),
+                 (re.DOTALL, 's'), (re.VERBOSE, 'x'),
+                 (getattr(re, 'ASCII', 0), 'a'))        # no re.ASCII in PY2
+
+# Inline flags for the whole pattern, e.g. ``(?i)``, at its start
+_global_flags = re.compile(r'^(?:\(\?[aiLmsux]+\))+')
+
+# A numbered backreference, or a conditional on a numbered group
+_numbered_reference = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d')
+
+# The start of a named group, or a reference to one
+_group_name = re.compile(r'\(\?P(?:<(\w+)>|=(\w+)\))|\(\?\((\w+)\)')
+
+
+def _scoped(regex, i):
+    """Return the source of ``regex``, for the ``i``-th alternative of a
+    combined regular expression: with its flags, including any inline
+    ones, scoped to it, its ``secret`` group renamed ``_s<i>``, and its
+    other named groups prefixed with ``_n<i>_``, so they can't clash with
+    those of other patterns.
+
+    :raise ValueError: if ``regex`` has numbered backreferences, which
+        would refer to other groups once combined
+    """
+    if not hasattr(regex, 'pattern'):
+        regex = re.compile(regex)
+    source = regex.pattern
+    if _numbered_reference.search(source):
+        raise ValueError("pattern %r has a numbered backreference: use a "
+                         "named group, (?P<name>...), and (?P=name)"
+                         % source)
+    source = _global_flags.sub('', source, count=1)
+
+    def rename(m):
+        name = m.group(1) or m.group(2) or m.group(3)
+        new = '_s%d' % i if name == 'secret' else '_n%d_%s' % (i, name)
+        if m.group(1):
+            return '(?P<%s>' % new
+        if m.group(2):
+            return '(?P=%s)' % new
+        return '(?(%s)' % new
+
+    source = _group_name.sub(rename, source)
+    letters = ''.join(letter for flag, letter in _FLAG_LETTERS
+                      if regex.flags & flag)
+    if letters:
+        # (A newline ends any comment at the end of a verbose pattern)
+        source = '(?%s:%s%s)' % (letters, source,
+                                 '\n' if regex.flags & re.VERBOSE else '')
+    return source
+
+
+class RedactionFilter(logging.Filter):
+    """
+    .. _RedactionFilter:
+
+    A filter that lets every record through, with any secrets in its
+    message replaced by ``replacement``.
+
+    The message is rendered once (``record.getMessage()``), and searched
+    for the patterns' triggers; then it's scanned once, for the patterns
+    that it contains triggers of (and those without triggers), combined
+    into one regular expression -- or not at all, if there are none. If
+    anything was redacted, the record's ``msg`` becomes the redacted
+    message, and its ``args`` ``()``; otherwise the record is unchanged.
+
+    A filter shared by several handlers redacts each record once: it
+    remembers the ``id``, ``msg`` and ``args`` of the last record it saw
+    (not the record itself, which it doesn't keep alive).
+    """
+    def __init__(self, patterns=None, replacement='[REDACTED]', name=''):
+        """
+        :param patterns: the names of presets in ``PATTERNS``, and/or
+            ``RedactionPattern``\\ s, or regular expressions (strings or
+            compiled); default: all the presets. A pattern can't use
+            numbered backreferences (``\\1``), only named ones.
+        :param replacement: the text that replaces each secret
+        :param name: as for ``logging.Filter``
+        """
+        super(RedactionFilter, self).__init__(name)
+        if patterns is None:
+            patterns = sorted(PATTERNS)
+        self.patterns = [PATTERNS[p] if p in PATTERNS else
+                         p if isinstance(p, RedactionPattern) else
+                         RedactionPattern(p)
+                         for p in patterns]
+        self.replacement = replacement
+        sources = ['(?P<_p%d>%s)' % (i, _scoped(p.regex, i))
+                   for i, p in enumerate(self.patterns)]
+        # Check that they compile, together
+        groups = re.compile('|'.join(sources)).groupindex
+        self._sources = sources
+        self._secret_groups = {
+            '_p%d' % i: ('_s%d' % i if '_s%d' % i in groups else None)
+            for i in range(len(self.patterns))}
+        self._checks = {'_p%d' % i: p.check
+                        for i, p in enumerate(self.patterns)}
+        # Patterns without triggers are always scanned for
+        self._always = tuple(i for i, p in enumerate(self.patterns)
+                             if p.triggers is None)
+        self._triggers = tuple(sorted(set(
+            t for p in self.patterns for t in p.triggers or ())))
+        # triggers found -> the regular expression combining the patterns
+        # they trigger, and those always scanned for; ``None`` if none
+        self._regexes = {}
+        self._last = None
+        # Records with something redacted
+        self.redacted = 0
+
+    # The most combinations of triggers cached
+    max_cached_regexes = 256
+
+    def _regex(self, found):
+        """Return the regular expression for ``found``, a tuple of the
+        triggers found in a message."""
+        indexes = set(self._always)
+        indexes.update(i for i, p in enumerate(self.patterns)
+                       if p.triggers and set(p.triggers).intersection(found))
+        regex = (re.compile('|'.join(self._sources[i]
+                                     for i in sorted(indexes)))
+                 if indexes else None)
+        if len(self._regexes) < self.max_cached_regexes:
+            self._regexes[found] = regex
+        return regex
+
+    def _replace(self, m):
+        group = m.lastgroup
+        secret = self._secret_groups[group]
+        text = m.group(0)
+        check = self._checks[group]
+        if secret is None:
+            return self.replacement if not check or check(text) else text
+        start, end = m.span(secret)
+        offset = m.start()
+        if check and not check(text[start - offset:end - offset]):
+            return text
+        return (text[:start - offset] + self.replacement
+                + text[end - offset:])
+
+    def redact(self, text):
+        """Return ``text`` with its secrets replaced."""
+        if self._triggers:
+            lowered = text.lower()
+            found = tuple([t for t in self._triggers if t in lowered])
+        else:
+            found = ()
+        try:
+            regex = self._regexes[found]
+        except KeyError:
+            regex = self._regex(found)
+        if regex is None:
+            return text
+        return regex.sub(self._replace, text)
+
+    def filter(self, record):
+        last = self._last
+        if (last is not None and last[0] == id(record)
+                and last[1] is record.msg and last[2] is record.args):
+            return True
+        message = record.getMessage()
+        redacted = self.redact(message)
+        if redacted is not message and redacted != message:
+            record.msg = redacted
+            record.args = ()
+            self.redacted += 1
+        self._last = (id(record), record.msg, record.args)
+        return True
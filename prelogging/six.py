@@ -37,6 +37,12 @@ PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 PY34 = sys.version_info[0:2] >= (3, 4)
 
+# RecursionError is Python 3.5+; earlier, recursion raises RuntimeError
+try:
+    RecursionError = RecursionError
+except NameError:
+    RecursionError = RuntimeError
+
 if PY3:
     string_types = str,
     integer_types = int,
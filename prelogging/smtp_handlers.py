@@ -0,0 +1,335 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+``DigestSMTPHandler``, an email handler for error reporting that can't flood
+a mailbox or hold up the application.
+
+``logging.handlers.SMTPHandler`` sends one email per record, over a new
+connection each time, in the thread that logs. During an error storm that's
+thousands of emails, each one a blocking SMTP conversation. A
+``DigestSMTPHandler`` instead collects records and sends them, from a
+background thread, as *digests*: one email for all the records of a time
+window, or for every ``max_records`` records. It keeps its SMTP connection
+open from one digest to the next, and sends at most ``max_emails`` digests
+per ``per`` seconds; records logged meanwhile wait for the next digest.
+
+``LCDict.add_digest_email_handler`` configures one.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.utils import formatdate
+
+from . import lifecycle
+
+__all__ = [
+    'DigestSMTPHandler',
+]
+
+
+class DigestSMTPHandler(logging.Handler):
+    """
+    .. _DigestSMTPHandler:
+
+    A handler that emails records in digests, from a background thread.
+
+    A digest is sent ``window`` seconds after its first record was logged,
+    or as soon as it holds ``max_records`` records, whichever comes first --
+    unless ``max_emails`` digests have already been sent in the last ``per``
+    seconds, in which case it's sent as soon as that's no longer true, with
+    everything logged meanwhile (so, possibly more than ``max_records``
+    records). At most ``capacity`` records wait for a digest; more are
+    dropped, and the next digest says how many.
+
+    Records are formatted when they're logged, in the logging thread.
+
+    Metrics, available from ``metrics()``:
+
+        * ``pending``: records waiting for a digest
+        * ``emails_sent``: digests sent
+        * ``send_failures``: digests that couldn't be sent (after
+          reconnecting once)
+        * ``dropped``: records dropped because ``capacity`` was reached
+        * ``connections``: SMTP connections opened
+    """
+    # Longest (seconds) that ``close`` waits for the last digest to be sent
+    flush_timeout = 10.0
+
+    def __init__(self, mailhost, fromaddr, toaddrs, subject,
+                 credentials=None,
+                 secure=None,
+                 timeout=10.0,
+                 window=60.0,
+                 max_records=100,
+                 max_emails=10,
+                 per=3600.0,
+                 capacity=10000,
+                 **kwargs):
+        """
+        :param mailhost: the SMTP server: a host name, or a
+            ``(host, port)`` pair
+        :param fromaddr: email address of sender (``str``)
+        :param toaddrs: email recipients (a ``str``, or a ``list`` of them)
+        :param subject: subject of the emails (``str``); each digest's
+            subject also gives its number of records
+        :param credentials: ``(username, password)``, or ``None``
+        :param secure: as for ``logging.handlers.SMTPHandler``: when
+            credentials are given, a tuple (possibly empty) of arguments for
+            ``smtplib.SMTP.starttls()``, to use TLS; ``None``, not to
+        :param timeout: timeout (seconds) for communication with the server
+        :param window: the longest (seconds) a record waits for its digest
+            (rate cap permitting)
+        :param max_records: the most records in a digest, rate cap
+            permitting; a digest this size is sent at once
+        :param max_emails: the most digests sent per ``per`` seconds
+        :param per: see ``max_emails``
+        :param capacity: the most records waiting for a digest; more are
+            dropped
+        """
+        super(DigestSMTPHandler, self).__init__(**kwargs)
+        if isinstance(mailhost, (list, tuple)):
+            self.mailhost, self.mailport = mailhost
+        else:
+            self.mailhost, self.mailport = mailhost, None
+        self.fromaddr = fromaddr
+        if isinstance(toaddrs, str):
+            toaddrs = [toaddrs]
+        self.toaddrs = list(toaddrs)
+        self.subject = subject
+        self.username, self.password = credentials or (None, None)
+        self.secure = secure
+        self.timeout = timeout
+        self.window = window
+        self.max_records = max_records
+        self.max_emails = max_emails
+        self.per = per
+        self.capacity = capacity
+
+        self._cond = threading.Condition(threading.Lock())
+        self._texts = []            # formatted records awaiting a digest
+        self._first = None          # when the first of them was logged
+        self._last_record = None    # of those, for error reporting
+        self._dropped = 0           # records dropped since the last digest
+        self._inflight = 0          # records of the digest being sent
+        self._sent_times = []       # when recent digests were sent
+        self._held = False          # whether the rate cap held a digest
+        self._thread = None
+        self._stopping = False
+        self._smtp = None
+        self.emails_sent = 0
+        self.send_failures = 0
+        self.dropped = 0
+        self.connections = 0
+        lifecycle.register_drainable(self)
+
+    def qsize(self):
+        """Return the number of records waiting for a digest."""
+        return len(self._texts)
+
+    def metrics(self):
+        """Return a ``dict`` of this handler's metrics (see above)."""
+        return {'pending': len(self._texts),
+                'emails_sent': self.emails_sent,
+                'send_failures': self.send_failures,
+                'dropped': self.dropped,
+                'connections': self.connections}
+
+    def emit(self, record):
+        """Format the record and add it to the next digest, or drop it if
+        ``capacity`` records are waiting. Called by `logging`.
+        """
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._cond:
+            n = len(self._texts)
+            if n >= self.capacity:
+                self.dropped += 1
+                self._dropped += 1
+                return
+            if not n:
+                self._first = time.time()
+            self._texts.append(text)
+            self._last_record = record
+            if self._thread is None:
+                self._start()
+            elif not n or n + 1 == self.max_records:
+                self._cond.notify_all()
+
+    def _start(self):
+        """Start the sender thread. The caller holds ``self._cond``."""
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name='DigestSMTPHandler-%s' % (self.name or self.mailhost))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _due(self, now):
+        """Return when the pending digest may be sent. The caller holds
+        ``self._cond``.
+        """
+        if self._stopping:
+            return now
+        if len(self._texts) >= self.max_records:
+            due = now
+        else:
+            due = self._first + self.window
+        sent = self._sent_times
+        while sent and sent[0] <= now - self.per:
+            del sent[0]
+        if len(sent) >= self.max_emails and sent[0] + self.per > due:
+            due = sent[0] + self.per
+            self._held = True
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._texts:
+                        if self._stopping:
+                            return
+                        self._cond.wait()
+                        continue
+                    now = time.time()
+                    wait = self._due(now) - now
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._held or self._stopping:
+                    texts, self._texts = self._texts, []
+                else:
+                    texts = self._texts[:self.max_records]
+                    del self._texts[:self.max_records]
+                    self._first = time.time()   # of what's left, if any
+                self._held = False
+                dropped, self._dropped = self._dropped, 0
+                record = self._last_record
+                self._inflight = len(texts)
+                self._sent_times.append(time.time())
+            try:
+                self._send(texts, dropped, record)
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    self._cond.notify_all()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.mailhost, self.mailport or 0,
+                            timeout=self.timeout)
+        self.connections += 1
+        if self.username:
+            if self.secure is not None:
+                smtp.ehlo()
+                smtp.starttls(*self.secure)
+                smtp.ehlo()
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+
+    def _message(self, texts, dropped):
+        """Return the digest of ``texts``, as a string."""
+        body = '\n'.join(texts)
+        if dropped:
+            body += '\n\n(%d more record(s) dropped)' % dropped
+        msg = MIMEText(body, 'plain', 'utf-8')
+        msg['From'] = self.fromaddr
+        msg['To'] = ','.join(self.toaddrs)
+        msg['Subject'] = '%s (%d record%s)' % (
+            self.subject, len(texts), '' if len(texts) == 1 else 's')
+        msg['Date'] = formatdate(localtime=True)
+        return msg.as_string()
+
+    def _send(self, texts, dropped, record):
+        """Send one digest over the open connection, reconnecting (once) if
+        the server has closed it.
+        """
+        msg = self._message(texts, dropped)
+        for attempt in (1, 2):
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                self._smtp.sendmail(self.fromaddr, self.toaddrs, msg)
+                self.emails_sent += 1
+                return
+            except (smtplib.SMTPException, OSError):
+                self._disconnect()
+                if attempt == 2:
+                    self.send_failures += 1
+                    self.handleError(record)
+
+    def _wait(self, deadline):
+        """Wait, until time ``deadline`` at the latest, for everything
+        pending to be sent.
+
+        :return: the number of records not yet sent
+        """
+        with self._cond:
+            while self._texts or self._inflight:
+                left = lifecycle.remaining(deadline)
+                if not left or self._thread is None:
+                    break
+                self._cond.wait(left)
+            return len(self._texts) + self._inflight
+
+    def flush(self):
+        """Send what's pending now, regardless of the window (but not of the
+        rate cap), without waiting.
+        """
+        with self._cond:
+            if self._texts:
+                self._first = time.time() - self.window
+                self._cond.notify_all()
+
+    def drain(self, deadline):
+        """Send everything pending in a last digest, regardless of window and
+        rate cap, and stop the sender thread and close the connection,
+        giving up at time ``deadline``. Called by the
+        :ref:`shutdown coordinator <lifecycle>`.
+
+        :return: the number of records abandoned
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        abandoned = self._wait(deadline)
+        with self._cond:
+            thread, self._thread = self._thread, None
+        if thread is not None and not abandoned:
+            thread.join(lifecycle.remaining(deadline))
+            self._disconnect()
+        return abandoned
+
+    def after_fork_in_child(self):
+        """Forget the parent's pending records, sender thread and
+        connection. Called in the child by the
+        :ref:`at-fork hooks <lifecycle>`.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._texts = []
+        self._dropped = 0
+        self._inflight = 0
+        self._thread = None
+        self._smtp = None
+
+    def close(self):
+        """Send what's pending (waiting at most ``flush_timeout`` seconds),
+        and close the connection. Called by `logging` at exit.
+        """
+        self.drain(time.time() + self.flush_timeout)
+        super(DigestSMTPHandler, self).close()
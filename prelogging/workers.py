@@ -0,0 +1,137 @@
+# coding=utf-8
+
+__author__ = "Brian O'Neill"
+
+__doc__ = """ \
+Logging configuration for the worker processes of a pool --
+``multiprocessing.Pool`` or ``concurrent.futures.ProcessPoolExecutor`` --
+under any start method, including ``spawn`` and ``forkserver``, where
+workers inherit nothing from the parent and must configure logging
+themselves.
+
+``LCDict.pool_initializer`` compiles a configuration, once, in the parent,
+into a plain ``dict`` that can be pickled and handed straight to
+``dictConfig``, and returns it with ``init_worker_logging`` as the pool's
+initializer::
+
+    initializer, initargs = lcd.pool_initializer(queue=q)
+    with Pool(4, initializer=initializer, initargs=initargs) as pool:
+        ...
+
+A worker's startup then consists of unpickling that dict and one call of
+``dictConfig``: no ``LCDict`` is built and nothing is checked or looked up.
+What ``dictConfig`` doesn't do, such as installing record fields, is carried
+under the key ``'prelogging'``, which ``dictConfig`` ignores, and done by
+``init_worker_logging``.
+"""
+
+import logging.config
+from multiprocessing import Lock
+
+from . import lifecycle
+from . import records
+from ._handler_lookup import configure, resolve_targets
+
+__all__ = [
+    'compile_worker_config',
+    'init_worker_logging',
+]
+
+
+def _plain(obj):
+    """Return a copy of ``obj`` with every dict and list (including
+    ``LCDict`` objects and subdictionaries) copied as a plain ``dict`` or
+    ``list``. Other values -- queues, locks -- are shared, not copied.
+    """
+    if isinstance(obj, dict):
+        return {k: _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    return obj
+
+
+def compile_worker_config(lcdict,     # *,
+                          lean_records=False,
+                          share_identical=True,
+                          compact_records=False):
+    """Return a plain, picklable ``dict`` that ``dictConfig`` accepts,
+    equivalent to ``lcdict``, for use in worker processes.
+
+    Each locking handler that would create its own lock (``create_lock``)
+    is given instead a ``multiprocessing.Lock`` created here, which all
+    workers share. (A lock each worker created for itself would exclude
+    nothing.) Like a queue, the result can only be passed to processes as
+    they're started -- e.g. as ``initargs`` of a pool.
+
+    Any callables the configuration names directly (e.g. filter classes, or
+    functions passed to ``add_callable_filter``) must be picklable, i.e.
+    defined at module level.
+
+    The static record fields of an ``LCDict`` (see
+    ``LCDict.add_record_fields``) are carried too. Fields whose values are
+    ``ContextVar``\\ s can't be pickled, so they're left out, with a
+    warning logged to the ``'prelogging.records'`` logger; workers can
+    declare them with ``prelogging.records.add_record_fields``.
+
+    The other parameters are the options of ``LCDict.config()`` of the same
+    names, and ``init_worker_logging`` applies them in each worker. The
+    work is done here, once: identical formatters and pure filters are
+    merged in the result, and the ``lean_records`` decisions are made here,
+    for the workers to apply.
+
+    :param lcdict: an ``LCDict``, or a logging configuration dict
+    :param lean_records: as for ``LCDict.config()``
+    :param share_identical: as for ``LCDict.config()``
+    :param compact_records: as for ``LCDict.config()``
+    """
+    if share_identical:
+        from .lcdict import _share_identical    # (lcdict imports this)
+        config = _plain(_share_identical(
+            lcdict, getattr(lcdict, '_pure_filters', ())))
+    else:
+        config = _plain(lcdict)
+    for hdict in config.get('handlers', {}).values():
+        if hdict.pop('create_lock', False):
+            hdict['lock'] = Lock()
+    static, context = records._split_fields(
+        getattr(lcdict, 'record_fields', {}))
+    if context:
+        logging.getLogger(records.LOGGER_NAME).warning(
+            "record fields not passed to workers, as ContextVars can't be "
+            "pickled: %s", ', '.join(sorted(context)))
+    options = {}
+    if lean_records:
+        keep = () if lean_records is True else lean_records
+        options['lean_records'] = records._lean_decisions(config, keep)
+    if compact_records:
+        options['compact_records'] = True
+    if static:
+        options['record_fields'] = static
+    if options:
+        config['prelogging'] = options
+    return config
+
+
+def init_worker_logging(config, shutdown_timeout=None):
+    """Configure logging in a worker process with ``config``, a dict made
+    by ``compile_worker_config``, apply the ``config()`` options it carries
+    (lean records, compact records, record fields), and install the
+    :ref:`shutdown coordinator <lifecycle>`, as ``LCDict.config()`` does.
+    Use this as the ``initializer`` of a process pool.
+
+    :param config: a dict made by ``compile_worker_config``
+    :param shutdown_timeout: as for ``LCDict.config()``
+    """
+    handlers = configure(config)
+    resolve_targets(handlers)
+    lifecycle.manage_configured_handlers(handlers, shutdown_timeout)
+    options = config.get('prelogging', {})
+    if options.get('lean_records'):
+        records._apply_lean_decisions(options['lean_records'])
+    if (options.get('compact_records')
+            and not records.use_compact_records()):
+        logging.getLogger(records.LOGGER_NAME).warning(
+            "compact records not installed: another record factory, "
+            "%r, is installed", logging.getLogRecordFactory())
+    if options.get('record_fields'):
+        records.add_record_fields(options['record_fields'])
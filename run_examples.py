@@ -12,6 +12,7 @@ from examples import mproc
 from examples import mproc2
 from examples import mproc_approach__locking_handlers
 from examples import mproc_approach__queue_handler_logging_thread
+from examples import mproc_approach__channels
 from examples import queue_handler_listener
 from examples import SMTP_handler_just_one
 from examples import SMTP_handler_two
@@ -98,6 +99,7 @@ dateformat.main()
 queue_handler_listener.main()
 mproc_approach__locking_handlers.main()
 mproc_approach__queue_handler_logging_thread.main()
+mproc_approach__channels.main()
 SMTP_handler_just_one.main()
 SMTP_handler_two.main()
 
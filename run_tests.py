@@ -26,6 +26,12 @@ if len(sys.argv) > 1:
     elif arg.startswith("-V"):
         verbosity = 2
 
+# Processes started with the 'spawn' method run this script again, by the
+# path it was started with, which must survive the chdir below. (Python < 3.9
+# leaves it relative.)
+__file__ = os.path.abspath(__file__)
+sys.argv[0] = os.path.abspath(sys.argv[0])
+
 home, _ = os.path.split(__file__)
 tests_dir = os.path.join(home, 'tests')
 
@@ -33,6 +39,8 @@ tests_dir = os.path.join(home, 'tests')
 tests_dir = os.path.abspath(tests_dir)
 os.chdir(tests_dir)
 
-unittest.TextTestRunner(verbosity=verbosity).run(
-    unittest.defaultTestLoader.discover(tests_dir)
-)
+# Guarded: processes started with the 'spawn' method import this module too
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=verbosity).run(
+        unittest.defaultTestLoader.discover(tests_dir)
+    )
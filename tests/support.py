@@ -0,0 +1,32 @@
+__author__ = 'brianoneill'
+
+__doc__ = """ \
+Helpers shared by the test modules.
+"""
+
+import logging
+
+
+class CollectingHandler(logging.Handler):
+    """Keep every record handled, in order."""
+    def __init__(self, level=logging.NOTSET):
+        super(CollectingHandler, self).__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    @property
+    def messages(self):
+        """(r/o property) The records handled, formatted by this handler."""
+        return [self.format(record) for record in self.records]
+
+
+def make_record(name, msg, level=logging.INFO, created=None):
+    """Return a record of ``msg``, logged to logger ``name`` at ``level``;
+    ``created`` overrides its creation time."""
+    record = logging.getLogger(name).makeRecord(name, level, __file__, 0,
+                                                msg, (), None)
+    if created is not None:
+        record.created = created
+    return record
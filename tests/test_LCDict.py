@@ -216,6 +216,54 @@ class TestLCDEx_Misc(TestCase):
         )
 
 
+
+def not_noisy(record):
+    return record.name != 'noisy'
+
+
+class TestShareIdentical(TestCase):
+
+    def setUp(self):
+        # dictConfig adds filters to existing loggers, never removes them
+        logging.getLogger('noisy').filters = []
+
+    def make_lcd(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        lcd.add_formatter('mine', format='%(name)-20s: %(message)s')
+        lcd.add_callable_filter('pure1', not_noisy, pure=True)
+        lcd.add_callable_filter('pure2', not_noisy, pure=True)
+        lcd.add_callable_filter('impure', not_noisy)
+        lcd.add_stream_handler('h1', formatter='logger_msg', stream=io.StringIO(),
+                               filters=['pure1', 'impure'])
+        lcd.add_stream_handler('h2', formatter='mine', stream=io.StringIO(),
+                               filters=['pure2'])
+        lcd.add_logger('noisy', filters=['pure2', 'impure'])
+        return lcd
+
+    def test_shared(self):
+        lcd = self.make_lcd()
+        lcd.add_stream_handler('h3', formatter='mine', stream=io.StringIO(),
+                               filters=['impure'])
+        lcd.config()
+        h1, h2, h3 = (logging._handlers[h] for h in ('h1', 'h2', 'h3'))
+        self.assertIs(h1.formatter, h2.formatter)
+        self.assertIs(h1.filters[0], h2.filters[0])
+        self.assertIsNot(h1.filters[1], h2.filters[0])
+        self.assertIs(h1.filters[1], h3.filters[0])
+        noisy = logging.getLogger('noisy')
+        self.assertIs(noisy.filters[0], h1.filters[0])
+        # The LCDict itself is unchanged
+        self.assertEqual(lcd.handlers['h2']['formatter'], 'mine')
+        self.assertIn('pure2', lcd.filters)
+
+    def test_not_shared(self):
+        lcd = self.make_lcd()
+        lcd.config(share_identical=False)
+        h1, h2 = (logging._handlers[h] for h in ('h1', 'h2'))
+        self.assertIsNot(h1.formatter, h2.formatter)
+        self.assertIsNot(h1.filters[0], h2.filters[0])
+
+
 #############################################################################
 
 if __name__ == '__main__':
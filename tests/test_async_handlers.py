@@ -0,0 +1,170 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from unittest import TestCase, skipIf
+import gc
+import io
+import logging
+import sys
+import threading
+import time
+
+HAS_RUNNING_LOOP = sys.version_info >= (3, 7)
+
+if HAS_RUNNING_LOOP:
+    import asyncio
+    from prelogging.async_handlers import AsyncioHandler
+
+
+# (Without coroutine syntax, which Python 2 can't even parse)
+
+def run_soon(loop, fn):
+    """Call ``fn`` on ``loop``, as a coroutine running there would, and
+    return its value."""
+    result = []
+    loop.call_soon(lambda: result.append(fn()))
+    loop.run_until_complete(asyncio.sleep(0))
+    return result[0]
+
+
+def cancel_tasks_and_close(loop):
+    """Cancel the tasks left on ``loop``, and close it, as ``asyncio.run``
+    does."""
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks,
+                                               return_exceptions=True))
+    loop.close()
+
+
+class SlowHandler(logging.Handler):
+    """A target that takes a while to write each record."""
+    def __init__(self, delay=0.02):
+        super(SlowHandler, self).__init__()
+        self.delay = delay
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+
+@skipIf(not HAS_RUNNING_LOOP, "asyncio.get_running_loop is Python 3.7+")
+class TestAsyncioHandler(TestCase):
+
+    def setUp(self):
+        self.slow = SlowHandler()
+        self.slow.set_name('test_async_slow')
+        self.handler = AsyncioHandler(targets='test_async_slow', batch_size=4)
+        self.logger = logging.getLogger('test_async_handlers')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def test_emit_doesnt_block_loop(self):
+        def main():
+            t0 = time.time()
+            for i in range(10):
+                self.logger.info('msg %d', i)
+            return time.time() - t0
+
+        loop = asyncio.new_event_loop()
+        elapsed = run_soon(loop, main)
+        # 10 writes at 0.02s each would take 0.2s
+        self.assertLess(elapsed, 0.1)
+        # Cancelling the drainer, as asyncio.run does, delivers the rest
+        cancel_tasks_and_close(loop)
+        self.assertEqual([r.getMessage() for r in self.slow.records],
+                         ['msg %d' % i for i in range(10)])
+        self.assertNotIn(threading.current_thread().name, self.slow.threads)
+
+    def test_aclose(self):
+        loop = asyncio.new_event_loop()
+        run_soon(loop, lambda: [self.logger.warning('w %d', i)
+                                for i in range(6)])
+        loop.run_until_complete(self.handler.aclose())
+        self.assertEqual(len(self.slow.records), 6)
+        self.assertEqual(self.handler.qsize(), 0)
+        cancel_tasks_and_close(loop)
+
+    def test_no_loop_delivers_directly(self):
+        self.logger.error('no loop here')
+        self.assertEqual([r.getMessage() for r in self.slow.records],
+                         ['no loop here'])
+
+    def test_loop_closed_without_cancelling(self):
+        loop = asyncio.new_event_loop()
+        run_soon(loop, lambda: self.logger.info('on the loop'))
+        loop.close()            # the drainer task is left pending
+        self.logger.info('after the loop closed')
+        # As at exit, once concurrent.futures has shut down
+        self.handler._executor.shutdown(wait=True)
+        self.logger.info('after the executor shut down')
+        self.handler.close()
+        self.assertEqual([r.getMessage() for r in self.slow.records],
+                         ['on the loop', 'after the loop closed',
+                          'after the executor shut down'])
+        # Collect the task left pending here, not during some later test
+        with self.assertLogs('asyncio', 'ERROR'):
+            del loop
+            gc.collect()
+
+    def test_full_buffer_drops(self):
+        self.handler.capacity = 5
+
+        def main():
+            for i in range(8):
+                self.logger.info('msg %d', i)
+            self.handler.emit_batch([logging.makeLogRecord({'msg': 'batch'})])
+            return self.handler.qsize()
+
+        loop = asyncio.new_event_loop()
+        self.assertEqual(run_soon(loop, main), 5)
+        self.assertEqual(self.handler.dropped, 4)
+        cancel_tasks_and_close(loop)
+        self.assertEqual([r.getMessage() for r in self.slow.records],
+                         ['msg %d' % i for i in range(5)])
+
+    def test_target_level_respected(self):
+        self.slow.setLevel(logging.WARNING)
+        self.logger.info('dropped')
+        self.logger.warning('kept')
+        self.assertEqual([r.getMessage() for r in self.slow.records], ['kept'])
+
+
+@skipIf(not HAS_RUNNING_LOOP, "asyncio.get_running_loop is Python 3.7+")
+class TestLCDictAsyncioHandler(TestCase):
+
+    def test_add_asyncio_handler(self):
+        lcd = LCDict()
+        lcd.add_file_handler('file', filename='async.log', delay=True)
+        lcd.add_asyncio_handler('async', targets='file', level='INFO')
+        self.assertEqual(
+            lcd.handlers['async'],
+            {'()': 'ext://prelogging.async_handlers.AsyncioHandler',
+             'targets': ['file'],
+             'batch_size': 100,
+             'capacity': 10000,
+             'level': 'INFO'}
+        )
+
+    def test_unattached_target_kept(self):
+        stream = io.StringIO()
+        lcd = LCDict()
+        lcd.add_stream_handler('test_async_target', stream=stream)
+        lcd.add_asyncio_handler('test_async', targets='test_async_target')
+        lcd.add_logger('test_async_handlers.unattached',
+                       handlers='test_async', propagate=False)
+        lcd.config()
+        # Nothing but the asyncio handler refers to its target now
+        gc.collect()
+        logging.getLogger('test_async_handlers.unattached').warning('kept')
+        self.assertEqual(stream.getvalue(), 'kept\n')
@@ -0,0 +1,134 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict, AdaptiveVerbosityFilter
+from prelogging.six import PY2
+from tests.support import CollectingHandler
+from unittest import TestCase, skipIf
+import logging
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class TestAdaptiveVerbosityFilter(TestCase):
+
+    def setUp(self):
+        self.q = Queue()
+        self.filter = AdaptiveVerbosityFilter(queue=self.q,
+                                              high_water=10, low_water=2,
+                                              noisiest=1, interval=0)
+        self.noisy = logging.getLogger('test_bp.noisy')
+        self.quiet = logging.getLogger('test_bp.quiet')
+        self.noisy.setLevel(logging.DEBUG)
+        self.quiet.setLevel(logging.DEBUG)
+        self.bp_handler = CollectingHandler()
+        self.bp_logger = logging.getLogger(AdaptiveVerbosityFilter.logger_name)
+        self.bp_logger.addHandler(self.bp_handler)
+        self.bp_logger.propagate = False
+
+    def tearDown(self):
+        self.bp_logger.removeHandler(self.bp_handler)
+        self.bp_logger.propagate = True
+        self.noisy.setLevel(logging.NOTSET)
+        self.quiet.setLevel(logging.NOTSET)
+
+    def _record(self, logger):
+        return logger.makeRecord(logger.name, logging.DEBUG, __file__, 0,
+                                 'msg', (), None)
+
+    def _fill(self, n):
+        for _ in range(n):
+            self.q.put(None)
+
+    def _drain(self):
+        while not self.q.empty():
+            self.q.get()
+
+    def test_raise_and_restore(self):
+        for _ in range(5):
+            self.filter._counts[self.noisy.name] += 1
+        self.filter._counts[self.quiet.name] += 1
+        self._fill(10)
+        self.assertTrue(self.filter.filter(self._record(self.noisy)))
+        self.assertEqual(self.filter.raised, ['test_bp.noisy'])
+        self.assertEqual(self.noisy.level, logging.WARNING)
+        self.assertEqual(self.quiet.level, logging.DEBUG)
+
+        # Still above low_water: nothing restored
+        self._drain()
+        self._fill(5)
+        self.filter.filter(self._record(self.quiet))
+        self.assertEqual(self.noisy.level, logging.WARNING)
+
+        self._drain()
+        self.filter.filter(self._record(self.quiet))
+        self.assertEqual(self.filter.raised, [])
+        self.assertEqual(self.noisy.level, logging.DEBUG)
+
+        msgs = [r.getMessage() for r in self.bp_handler.records]
+        self.assertEqual(len(msgs), 2)
+        self.assertIn("raised level of logger 'test_bp.noisy' to WARNING",
+                      msgs[0])
+        self.assertIn("restored level of logger 'test_bp.noisy' to DEBUG",
+                      msgs[1])
+
+    def test_quiet_enough_loggers_dont_use_up_slots(self):
+        self.noisy.setLevel(logging.ERROR)
+        for _ in range(5):
+            self.filter._counts[self.noisy.name] += 1
+        self.filter._counts[self.quiet.name] += 1
+        self._fill(10)
+        self.filter.filter(self._record(self.quiet))
+        self.assertEqual(self.filter.raised, ['test_bp.quiet'])
+        self.assertEqual(self.noisy.level, logging.ERROR)
+
+    def test_check_not_reentered(self):
+        checks = []
+        check = self.filter.check
+
+        def check_and_log():
+            checks.append(None)
+            # As if a record logged while checking reached the filter again
+            self.filter.filter(self._record(self.quiet))
+            check()
+
+        self.filter.check = check_and_log
+        self.filter.filter(self._record(self.noisy))
+        self.assertEqual(len(checks), 1)
+        # Released afterwards
+        self.filter.filter(self._record(self.noisy))
+        self.assertEqual(len(checks), 2)
+
+    def test_latency(self):
+        class Slow(logging.Handler):
+            latency = 5.0
+            def emit(self, record):
+                pass
+        slow = Slow()
+        slow.set_name('test_bp_slow')
+        f = AdaptiveVerbosityFilter(handler='test_bp_slow', max_latency=1.0,
+                                    interval=0)
+        f.filter(self._record(self.noisy))
+        self.assertEqual(f.raised, ['test_bp.noisy'])
+        slow.latency = 0.1
+        f.filter(self._record(self.noisy))
+        self.assertEqual(f.raised, [])
+
+
+class TestLCDictVerbosityController(TestCase):
+
+    @skipIf(PY2, "asyncio is Python 3 only")
+    def test_add_verbosity_controller(self):
+        lcd = LCDict()
+        lcd.add_asyncio_handler('async', targets=[])
+        lcd.add_verbosity_controller('async', high_water=500, max_latency=2)
+        self.assertEqual(
+            lcd.filters['async_verbosity'],
+            {'()': 'ext://prelogging.backpressure.AdaptiveVerbosityFilter',
+             'handler': 'async',
+             'high_water': 500,
+             'max_latency': 2}
+        )
+        self.assertEqual(lcd.handlers['async']['filters'],
+                         ['async_verbosity'])
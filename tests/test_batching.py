@@ -0,0 +1,172 @@
+__author__ = 'brianoneill'
+
+from prelogging import (LockingFileHandler, LockingRotatingFileHandler,
+                        LockingSysLogHandler)
+from prelogging.batching import handle_batch, dispatch_batch
+from prelogging.six import PY2
+from tests.support import CollectingHandler, make_record
+from unittest import TestCase, skipIf
+import logging
+import logging.handlers
+import os
+import socket
+
+
+class CountingStream(object):
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+    def write(self, s):
+        self.writes.append(s)
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestHandleBatch(TestCase):
+
+    @skipIf(PY2, "StreamHandler.terminator is Python 3 only")
+    def test_stream_handler_one_write(self):
+        stream = CountingStream()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s:%(message)s'))
+        handler.addFilter(lambda r: r.getMessage() != 'skip')
+        records = [make_record('test_batching', m, logging.INFO)
+                   for m in ('a', 'skip', 'b', 'c')]
+        handle_batch(handler, records)
+        self.assertEqual(stream.writes, ['INFO:a\nINFO:b\nINFO:c\n'])
+        self.assertEqual(stream.flushes, 1)
+
+    @skipIf(PY2, "StreamHandler.terminator is Python 3 only")
+    def test_locking_file_handler(self):
+        filename = '_testlogs/test_batching.log'
+        handler = LockingFileHandler(filename, mode='w', delay=True,
+                                     create_lock=True)
+        records = [make_record('test_batching', 'line %d' % i, logging.INFO)
+                   for i in range(5)]
+        handle_batch(handler, records)
+        handler.close()
+        with open(filename) as f:
+            self.assertEqual(f.read().splitlines(),
+                             ['line %d' % i for i in range(5)])
+        os.remove(filename)
+
+    @skipIf(PY2, "StreamHandler.terminator is Python 3 only")
+    def test_locking_rotating_file_handler(self):
+        records = [make_record('test_batching', 'line %d' % i, logging.INFO)
+                   for i in range(10)]
+
+        def contents_written(filename, batch):
+            files = [filename] + ['%s.%d' % (filename, i) for i in (1, 2, 3)]
+            for fn in files:
+                if os.path.exists(fn):
+                    os.remove(fn)
+            handler = LockingRotatingFileHandler(filename, maxBytes=30,
+                                                 backupCount=3,
+                                                 create_lock=True)
+            if batch:
+                handle_batch(handler, records)
+            else:
+                for record in records:
+                    handler.handle(record)
+            handler.close()
+            contents = []
+            for fn in files:
+                if os.path.exists(fn):
+                    with open(fn) as f:
+                        contents.append(f.read())
+                    os.remove(fn)
+            return contents
+
+        batched = contents_written('_testlogs/test_batching_rot.log', True)
+        self.assertEqual(len(batched), 3)
+        self.assertEqual(
+            batched,
+            contents_written('_testlogs/test_batching_rot.log', False))
+
+    def test_locking_syslog_handler_one_burst(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        handler = LockingSysLogHandler(address=server.getsockname(),
+                                       socktype=socket.SOCK_STREAM,
+                                       create_lock=True)
+        conn, _ = server.accept()
+        sent = []
+        real_socket = handler.socket
+
+        class CountingSocket(object):
+            def sendall(self, data):
+                sent.append(data)
+                real_socket.sendall(data)
+
+        try:
+            handler.socket = CountingSocket()
+            handle_batch(handler, [make_record('test_batching', 'line %d' % i,
+                                               logging.INFO)
+                                   for i in range(3)])
+            self.assertEqual(len(sent), 1)
+            self.assertEqual(sent[0].split(b'\000')[:-1],
+                             [('<14>line %d' % i).encode() for i in range(3)])
+        finally:
+            handler.socket = real_socket
+            handler.close()
+            conn.close()
+            server.close()
+
+    def test_memory_handler_bulk(self):
+        target = CollectingHandler()
+        handler = logging.handlers.MemoryHandler(capacity=100,
+                                                 flushLevel=logging.ERROR,
+                                                 target=target)
+        handle_batch(handler, [make_record('test_batching', m, logging.INFO)
+                               for m in 'abc'])
+        self.assertEqual(len(handler.buffer), 3)
+        self.assertEqual(target.records, [])
+        handle_batch(handler, [make_record('test_batching', 'boom',
+                                           logging.ERROR)])
+        self.assertEqual([r.getMessage() for r in target.records],
+                         ['a', 'b', 'c', 'boom'])
+
+    def test_fallback_one_at_a_time(self):
+        handler = CollectingHandler()
+        handle_batch(handler, [make_record('test_batching', m, logging.INFO)
+                               for m in 'ab'])
+        self.assertEqual([r.getMessage() for r in handler.records],
+                         ['a', 'b'])
+
+
+class TestDispatchBatch(TestCase):
+
+    def setUp(self):
+        self.parent = logging.getLogger('test_dispatch')
+        self.child = logging.getLogger('test_dispatch.child')
+        self.quiet = logging.getLogger('test_dispatch.quiet')
+        self.h_parent = CollectingHandler(level=logging.WARNING)
+        self.h_child = CollectingHandler()
+        self.parent.addHandler(self.h_parent)
+        self.parent.propagate = False
+        self.child.addHandler(self.h_child)
+        self.quiet.addFilter(lambda r: False)
+
+    def tearDown(self):
+        self.parent.removeHandler(self.h_parent)
+        self.parent.propagate = True
+        self.child.removeHandler(self.h_child)
+        self.quiet.filters = []
+
+    @skipIf(PY2, "callable filters are Python 3 only")
+    def test_as_logger_handle_would(self):
+        records = [
+            make_record('test_dispatch.child', 'c-info', logging.INFO),
+            make_record('test_dispatch', 'p-error', logging.ERROR),
+            make_record('test_dispatch.child', 'c-warning', logging.WARNING),
+            make_record('test_dispatch.quiet', 'filtered', logging.ERROR),
+            make_record('test_dispatch', 'p-debug', logging.DEBUG),
+        ]
+        dispatch_batch(records)
+        self.assertEqual([r.getMessage() for r in self.h_child.records],
+                         ['c-info', 'c-warning'])
+        self.assertEqual([r.getMessage() for r in self.h_parent.records],
+                         ['p-error', 'c-warning'])
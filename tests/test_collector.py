@@ -0,0 +1,132 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.collector import CollectorHandler, CollectorServer
+from tests.support import CollectingHandler
+from unittest import TestCase, skipUnless
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+
+class TestCollector(TestCase):
+
+    def setUp(self):
+        # Records received by the collector are handled by this logger
+        self.collected = CollectingHandler()
+        self.logger = logging.getLogger('test_collector')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.collected)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.collected)
+
+    def start_server(self, address):
+        server = CollectorServer(address)
+        t = threading.Thread(target=server.serve_forever, args=(0.05,))
+        t.daemon = True
+        t.start()
+        return server
+
+    def wait_for(self, n, timeout=5.0):
+        deadline = time.time() + timeout
+        while len(self.collected.records) < n and time.time() < deadline:
+            time.sleep(0.01)
+
+    def send_via(self, handler):
+        """Log through ``handler`` as a client would: the client-side record
+        has the same logger name as the collector's collecting logger."""
+        for i in range(5):
+            handler.handle(logging.makeLogRecord(
+                {'name': 'test_collector', 'msg': 'batched %d', 'args': (i,),
+                 'levelno': logging.INFO, 'levelname': 'INFO',
+                 'custom': 'extra field'}))
+
+    def test_tcp_batching(self):
+        server = self.start_server(('localhost', 0))
+        handler = CollectorHandler(server.address, batch_size=10,
+                                   flush_interval=0)
+        try:
+            self.send_via(handler)
+            # Batch isn't full: nothing sent yet
+            time.sleep(0.1)
+            self.assertEqual(self.collected.records, [])
+            handler.flush()
+            self.wait_for(5)
+        finally:
+            handler.close()
+            server.shutdown()
+
+        self.assertEqual([r.getMessage() for r in self.collected.records],
+                         ['batched %d' % i for i in range(5)])
+        self.assertEqual(self.collected.records[0].custom, 'extra field')
+        self.assertEqual(handler.dropped, 0)
+
+    def test_flush_level_sends_immediately(self):
+        server = self.start_server(('localhost', 0))
+        handler = CollectorHandler(server.address, batch_size=100,
+                                   flush_interval=0)
+        try:
+            self.send_via(handler)
+            handler.handle(logging.makeLogRecord(
+                {'name': 'test_collector', 'msg': 'boom',
+                 'levelno': logging.ERROR, 'levelname': 'ERROR'}))
+            self.wait_for(6)
+        finally:
+            handler.close()
+            server.shutdown()
+        self.assertEqual(len(self.collected.records), 6)
+        self.assertEqual(self.collected.records[-1].msg, 'boom')
+
+    @skipUnless(hasattr(socket, 'AF_UNIX'), "needs Unix domain sockets")
+    def test_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), 'collector.sock')
+        server = self.start_server(path)
+        handler = CollectorHandler(path, flush_interval=0.05)
+        try:
+            self.send_via(handler)
+            self.wait_for(5)            # sent by the periodic flush
+        finally:
+            handler.close()
+            server.shutdown()
+        self.assertEqual(len(self.collected.records), 5)
+        self.assertFalse(os.path.exists(path))
+
+    @skipUnless(hasattr(socket, 'AF_UNIX'), "needs Unix domain sockets")
+    def test_close_removes_socket_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'collector.sock')
+        server = CollectorServer(path)
+        self.assertTrue(os.path.exists(path))
+        server.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_unreachable_collector_drops(self):
+        s = socket.socket()
+        s.bind(('localhost', 0))
+        address = s.getsockname()
+        s.close()                       # nothing listens there now
+        handler = CollectorHandler(address, batch_size=2, flush_interval=0)
+        self.send_via(handler)
+        handler.close()
+        self.assertEqual(handler.dropped, 5)
+
+
+class TestLCDictCollectorHandler(TestCase):
+
+    def test_add_collector_handler(self):
+        lcd = LCDict()
+        lcd.add_collector_handler('coll', address=('loghost', 9020),
+                                  batch_size=50, level='INFO')
+        self.assertEqual(
+            lcd.handlers['coll'],
+            {'()': 'ext://prelogging.collector.CollectorHandler',
+             'address': ('loghost', 9020),
+             'batch_size': 50,
+             'flush_interval': 1.0,
+             'flush_level': 'ERROR',
+             'level': 'INFO'}
+        )
@@ -200,7 +200,10 @@ class Test_read_formatter_presets(TestCase):
             _make_formatter_specs(dedent(s).splitlines(True))
         self.assertEqual(str(exc.exception),
                          "line 3: bad key 'badbadkey' -- must be one of "
-                         "'format', 'dateformat', 'style'")
+                         "'format', 'dateformat', 'style', "
+                         "'fast', 'cache_time', 'utc', 'cache_output', "
+                         "'repeat_tracebacks', 'traceback_cache', "
+                         "'structured'")
 
 
 class TestStyle(TestCase):
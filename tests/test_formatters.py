@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.formatter_presets import (_formatter_presets,
+                                          _make_formatter_specs)
+from prelogging.formatters import (FastFormatter, JsonFormatter,
+                                   LogfmtFormatter, compile_format, orjson)
+from prelogging.six import PY2, raise_from
+from unittest import TestCase, skipIf
+from textwrap import dedent
+import io
+import json
+import logging
+import sys
+
+
+def make_record(msg='Hello %s', args=('world',), level=logging.INFO, **kwargs):
+    record = logging.LogRecord('some.logger', level, '/src/mod.py', 42,
+                               msg, args, None, func='f')
+    record.__dict__.update(kwargs)
+    return record
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestFastFormatter(TestCase):
+
+    def assertSameAsLogging(self, fmt, style='%', datefmt=None, record=None):
+        record = record or make_record()
+        expected = logging.Formatter(fmt, datefmt, style).format(record)
+        actual = FastFormatter(fmt, datefmt, style).format(record)
+        self.assertEqual(actual, expected)
+
+    def test_presets(self):
+        # LCDict loads the presets file
+        self.assertIn('process_time_logger_level_msg', _formatter_presets)
+        for name, spec in _formatter_presets.items():
+            if dict(spec.options).get('structured'):
+                continue
+            self.assertSameAsLogging(spec.format, spec.style, spec.dateformat)
+
+    def test_percent_style(self):
+        self.assertSameAsLogging('%(levelname)-8s|%(name)20s|%(lineno)05d|'
+                                 '%(message)r|100%%')
+        self.assertSameAsLogging('%(created)f %(relativeCreated).3f')
+        self.assertEqual(FastFormatter('no fields, 100%%', validate=False)
+                         .format(make_record()), 'no fields, 100%')
+        self.assertSameAsLogging('[%(user-id)s] %(message)s',
+                                 record=make_record(**{'user-id': 7}))
+
+    def test_brace_style(self):
+        self.assertSameAsLogging('{levelname:<8}|{name:>20}|{lineno:05d}|'
+                                 '{message!r}|100%', style='{')
+        self.assertSameAsLogging('{{literal}} {message}', style='{')
+
+    def test_dollar_style(self):
+        self.assertSameAsLogging('$levelname|${name}x|$$|100%|$message',
+                                 style='$')
+
+    def test_asctime_and_exc_info(self):
+        try:
+            1/0
+        except ZeroDivisionError:
+            record = make_record(exc_info=sys.exc_info())
+        self.assertSameAsLogging('%(asctime)s %(message)s', record=record)
+        self.assertSameAsLogging('%(asctime)s %(message)s',
+                                 datefmt='%H:%M:%S', record=record)
+        self.assertTrue(FastFormatter('%(asctime)s').usesTime())
+        self.assertFalse(FastFormatter('%(message)s').usesTime())
+
+    def test_missing_field(self):
+        f = FastFormatter('%(nosuchfield)s', validate=False)
+        self.assertRaises(ValueError, f.format, make_record())
+
+    def test_uncompilable_falls_back(self):
+        self.assertIsNone(compile_format('{name[0]}', '{'))
+        self.assertSameAsLogging('{name[0]} {message}', style='{')
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestCachedTime(TestCase):
+
+    def test_same_as_logging(self):
+        fast = FastFormatter('%(asctime)s %(message)s', cache_time=True)
+        std = logging.Formatter('%(asctime)s %(message)s')
+        for created in (1500000000.001, 1500000000.999, 1500000001.5,
+                        1500000001.25, 1500000000.5):
+            record = make_record()
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+            self.assertEqual(fast.format(record), std.format(record))
+
+        fast = FastFormatter('%(asctime)s', datefmt='%H:%M', cache_time=True)
+        std = logging.Formatter('%(asctime)s', datefmt='%H:%M')
+        record = make_record()
+        self.assertEqual(fast.format(record), std.format(record))
+
+    def test_cached_per_second(self):
+        fast = FastFormatter('%(asctime)s', cache_time=True)
+        record = make_record()
+        fast.format(record)
+        cached = fast._time_cache
+        record = make_record()
+        record.created = int(cached[0]) + 0.999
+        record.msecs = 999.0
+        self.assertTrue(fast.format(record).endswith(',999'))
+        self.assertIs(fast._time_cache, cached)
+
+    def test_iso8601_utc(self):
+        fast = FastFormatter('%(asctime)s', datefmt='ISO8601', utc=True)
+        record = make_record()
+        record.created = 1489327509.123
+        record.msecs = 123.0
+        self.assertEqual(fast.format(record), '2017-03-12T14:05:09.123Z')
+
+    def test_preset_options(self):
+        specs = _make_formatter_specs(dedent("""\
+            cached_time_msg
+                format: '%(asctime)s %(message)s'
+                cache_time: true
+            """).splitlines(True))
+        spec = specs['cached_time_msg']
+        self.assertEqual(spec.to_dict(),
+                         {'format': '%(asctime)s %(message)s',
+                          'style': '%',
+                          'cache_time': True})
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestLCDictFastFormatters(TestCase):
+
+    def test_cache_time_option(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        lcd.add_formatter('t', format='%(asctime)s %(message)s',
+                          dateformat='ISO8601', cache_time=True, utc=True)
+        self.assertEqual(
+            lcd.formatters['t'],
+            {'()': 'ext://prelogging.formatters.FastFormatter',
+             'fmt': '%(asctime)s %(message)s',
+             'datefmt': 'ISO8601',
+             'cache_time': True,
+             'utc': True})
+        lcd.add_stderr_handler('h', formatter='t')
+        lcd.config()
+        formatter = logging.getLogger().handlers[0].formatter
+        self.assertIsInstance(formatter, FastFormatter)
+        self.assertTrue(formatter.cache_time)
+
+    def test_fast_flag(self):
+        lcd = LCDict()
+        lcd.add_formatter('f1', format='%(message)s', fast=True)
+        lcd.add_formatter('f2', format='%(message)s')
+        self.assertEqual(lcd.formatters['f1']['class'],
+                         'prelogging.formatters.FastFormatter')
+        self.assertEqual(lcd.formatters['f2']['class'], 'logging.Formatter')
+
+    def test_fast_formatters_default_covers_presets(self):
+        lcd = LCDict(fast_formatters=True, attach_handlers_to_root=True)
+        lcd.add_stderr_handler('h', formatter='logger_level_msg')
+        lcd.add_formatter('custom', class_='logging.Formatter', fast=False,
+                          format='%(message)s')
+        self.assertEqual(lcd.formatters['logger_level_msg']['class'],
+                         'prelogging.formatters.FastFormatter')
+        self.assertEqual(lcd.formatters['custom']['class'],
+                         'logging.Formatter')
+        lcd.config()
+        self.assertIsInstance(logging.getLogger().handlers[0].formatter,
+                              FastFormatter)
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestOutputCache(TestCase):
+
+    def test_formatted_once_for_several_handlers(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        streams = [io.StringIO() for _ in range(3)]
+        lcd.add_formatter('f', format='%(name)-20s: %(levelname)s : '
+                                      '%(message)s',
+                          cache_output=True)
+        lcd.add_stream_handler('h1', formatter='f', stream=streams[0])
+        lcd.add_stream_handler('h2', formatter='f', stream=streams[1])
+        lcd.clone_handler(clone='h3', handler='h1')
+        lcd.handlers['h3']['stream'] = streams[2]
+        lcd.config()
+
+        formatter = logging.getLogger().handlers[0].formatter
+        renders = []
+        render = formatter._render
+        formatter._render = lambda r: renders.append(r) or render(r)
+
+        logging.getLogger('fanout').warning('Hi %s', 'all')
+        self.assertEqual(len(renders), 1)
+        self.assertEqual([s.getvalue() for s in streams],
+                         ['fanout              : WARNING : Hi all\n'] * 3)
+
+    def test_preset_option(self):
+        specs = _make_formatter_specs(dedent("""\
+            cached_output_msg
+                format: '%(levelname)s: %(message)s'
+                cache_output: yes
+            """).splitlines(True))
+        self.assertEqual(specs['cached_output_msg'].to_dict(),
+                         {'format': '%(levelname)s: %(message)s',
+                          'style': '%',
+                          'cache_output': True})
+
+        saved = dict(_formatter_presets)
+        _formatter_presets.update(specs)
+        try:
+            lcd = LCDict()
+            lcd.add_stream_handler('h1', formatter='cached_output_msg',
+                                   stream=io.StringIO())
+            lcd.add_stream_handler('h2', formatter='cached_output_msg',
+                                   stream=io.StringIO())
+        finally:
+            _formatter_presets.clear()
+            _formatter_presets.update(saved)
+        self.assertEqual(lcd.formatters['cached_output_msg'],
+                         {'()': 'ext://prelogging.formatters.FastFormatter',
+                          'fmt': '%(levelname)s: %(message)s',
+                          'cache_output': True})
+
+    def test_handler_filters_changing_records(self):
+        def tagger(tag):
+            def set_tag(record):
+                record.tag = tag
+                return True
+            return set_tag
+
+        lcd = LCDict()
+        streams = [io.StringIO() for _ in range(2)]
+        lcd.add_formatter('f', format='%(tag)s %(message)s',
+                          cache_output=True)
+        lcd.add_formatter('j', format='%(message)s', structured='json',
+                          backend='json', cache_output=True)
+        for i, tag in enumerate(('console', 'file')):
+            lcd.add_callable_filter(tag, tagger(tag))
+            lcd.add_stream_handler(tag, formatter='f', stream=streams[i],
+                                   filters=[tag])
+            lcd.add_stream_handler(tag + '_json', formatter='j',
+                                   stream=streams[i], filters=[tag])
+        lcd.add_logger('tagged', handlers=['console', 'file',
+                                           'console_json', 'file_json'],
+                       propagate=False)
+        lcd.config()
+        logging.getLogger('tagged').warning('x')
+        self.assertEqual(streams[0].getvalue(),
+                         'console x\n{"message":"x","tag":"console"}\n')
+        self.assertEqual(streams[1].getvalue(),
+                         'file x\n{"message":"x","tag":"file"}\n')
+
+    def test_replaced_message_rendered_again(self):
+        for f in (FastFormatter('%(message)s', cache_output=True),
+                  JsonFormatter('%(message)s', cache_output=True)):
+            record = make_record()
+            first = f.format(record)
+            self.assertIs(f.format(record), first)
+            record.msg = 'Bye %s'
+            self.assertIn('Bye world', f.format(record))
+            # The record isn't kept alive
+            self.assertNotIn(record, f._last_output[0])
+        f = FastFormatter('%(message)s')
+        record = make_record()
+        self.assertIsNot(f.format(record), f.format(record))
+
+        lcd = LCDict()
+        lcd.add_formatter('f', format='%(message)s', cache_output=True)
+        self.assertEqual(lcd.formatters['f'],
+                         {'()': 'ext://prelogging.formatters.FastFormatter',
+                          'fmt': '%(message)s',
+                          'cache_output': True})
+
+
+def fail(n, chained=None):
+    try:
+        if chained == 'cause':
+            try:
+                {}['key']
+            except KeyError as e:
+                raise_from(ValueError('bad value %d' % n), e)
+        elif chained == 'context':
+            try:
+                {}['key']
+            except KeyError:
+                raise ValueError('bad value %d' % n)
+        raise ValueError('bad value %d' % n)
+    except ValueError:
+        return sys.exc_info()
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestTracebackCache(TestCase):
+
+    def test_same_as_logging(self):
+        std = logging.Formatter()
+        fast = FastFormatter(traceback_cache=10)
+        for n in range(3):
+            for chained in (None, 'cause', 'context'):
+                ei = fail(n, chained)
+                self.assertEqual(fast.formatException(ei),
+                                 std.formatException(ei))
+        # one per raise: the chained exceptions have two each
+        self.assertEqual(len(fast._tracebacks), 5)
+
+    def test_lru(self):
+        fast = FastFormatter(traceback_cache=1)
+        fast.formatException(fail(1))
+        fast.formatException(fail(2, 'cause'))
+        self.assertEqual(len(fast._tracebacks), 1)
+
+    def test_repeats(self):
+        fast = FastFormatter(traceback_cache=10, repeat_tracebacks=True)
+        first = fast.formatException(fail(1))
+        self.assertTrue(first.startswith(
+            'Traceback #1 (most recent call last):\n'))
+        self.assertTrue(first.endswith('ValueError: bad value 1'))
+        self.assertEqual(fast.formatException(fail(2)),
+                         'Same traceback as #1\nValueError: bad value 2')
+        self.assertTrue(fast.formatException(fail(3, 'cause')).startswith(
+            'Traceback #2 (most recent call last):\n'))
+
+        record = make_record()
+        record.exc_info = fail(4)
+        self.assertTrue(fast.format(record).endswith(
+            'Same traceback as #1\nValueError: bad value 4'))
+        self.assertIsNone(record.exc_text)
+        self.assertIn('File', logging.Formatter().format(record))
+
+    def test_lcdict_options(self):
+        lcd = LCDict()
+        lcd.add_formatter('f', format='%(message)s', traceback_cache=100,
+                          repeat_tracebacks=True)
+        self.assertEqual(lcd.formatters['f'],
+                         {'()': 'ext://prelogging.formatters.FastFormatter',
+                          'fmt': '%(message)s',
+                          'traceback_cache': 100,
+                          'repeat_tracebacks': True})
+
+    def test_preset_options(self):
+        specs = _make_formatter_specs(dedent("""\
+            cached_tracebacks_msg
+                format: '%(message)s'
+                traceback_cache: 100
+                repeat_tracebacks: true
+            """).splitlines(True))
+        self.assertEqual(specs['cached_tracebacks_msg'].to_dict(),
+                         {'format': '%(message)s',
+                          'style': '%',
+                          'traceback_cache': 100,
+                          'repeat_tracebacks': True})
+        with self.assertRaises(ValueError) as exc:
+            _make_formatter_specs(dedent("""\
+                bad
+                    format: '%(message)s'
+                    traceback_cache: lots
+                """).splitlines(True))
+        self.assertEqual(str(exc.exception),
+                         "line 3: bad value 'lots' -- "
+                         "must be a nonnegative integer")
+
+
+@skipIf(PY2, "logging.Formatter has no style in Python 2")
+class TestStructuredFormatters(TestCase):
+
+    def backends(self):
+        return ['json', 'orjson'] if orjson else ['json']
+
+    def test_json_fields_extra_and_exc_info(self):
+        record = make_record(user='bob', attempt=3, obj=object())
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            record.exc_info = sys.exc_info()
+        for backend in self.backends():
+            line = JsonFormatter('%(levelname)s %(name)s %(message)s',
+                                 backend=backend).format(record)
+            self.assertNotIn('\n', line)
+            d = json.loads(line)
+            self.assertEqual(list(d), ['levelname', 'name', 'message',
+                                       'attempt', 'obj', 'user', 'exc_info'])
+            self.assertEqual(d['message'], 'Hello world')
+            self.assertEqual(d['attempt'], 3)
+            self.assertTrue(d['obj'].startswith('<object object'))
+            self.assertIn('ZeroDivisionError', d['exc_info'])
+
+    def test_json_escaping_and_rename(self):
+        record = make_record('quote " backslash \\ tab \t é \u2028', (),
+                             big=2 ** 70, ratio=0.5, flag=True, none=None)
+        for backend in self.backends():
+            f = JsonFormatter('{levelname}{message}', style='{',
+                              rename={'levelname': 'level'}, backend=backend)
+            d = json.loads(f.format(record))
+            self.assertEqual(d, {'level': 'INFO',
+                                 'message': record.msg,
+                                 'big': 2 ** 70, 'ratio': 0.5,
+                                 'flag': True, 'none': None})
+        self.assertEqual(
+            json.loads(JsonFormatter(include_extra=False).format(record))
+            .keys(), {'asctime', 'levelname', 'name', 'message'})
+
+    def test_bad_backend(self):
+        with self.assertRaises(ValueError):
+            JsonFormatter(backend='ujson')
+
+    def test_logfmt(self):
+        record = make_record('say "hi"\nthere', (), user='bob',
+                             empty='', none=None, ok=False)
+        record.__dict__['odd key='] = 1
+        line = LogfmtFormatter('%(levelname)s %(name)s %(message)s') \
+            .format(record)
+        self.assertEqual(line,
+                         'levelname=INFO name=some.logger '
+                         'message="say \\"hi\\"\\nthere" '
+                         'empty="" none= odd_key_=1 ok=false user=bob')
+
+    def test_lcdict_structured(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        lcd.add_formatter('j', structured='json', format='%(message)s',
+                          rename={'message': 'msg'})
+        lcd.add_formatter('l', structured='logfmt', format='%(message)s')
+        self.assertEqual(lcd.formatters['j'],
+                         {'()': 'ext://prelogging.formatters.JsonFormatter',
+                          'fmt': '%(message)s',
+                          'rename': {'message': 'msg'}})
+        self.assertEqual(lcd.formatters['l']['class'],
+                         'prelogging.formatters.LogfmtFormatter')
+        with self.assertRaises(ValueError):
+            lcd.add_formatter('x', structured='xml')
+
+        stream = io.StringIO()
+        lcd.add_stream_handler('h', formatter='j', stream=stream)
+        lcd.config()
+        logging.getLogger('test_structured').warning(
+            'Hi %s', 'there', extra={'request_id': 'r1'})
+        self.assertEqual(json.loads(stream.getvalue()),
+                         {'msg': 'Hi there', 'request_id': 'r1'})
+
+    def test_presets(self):
+        self.assertEqual(_formatter_presets['json'].to_dict()['structured'],
+                         'json')
+        lcd = LCDict()
+        lcd.add_stderr_handler('h', formatter='logfmt')
+        self.assertEqual(lcd.formatters['logfmt']['class'],
+                         'prelogging.formatters.LogfmtFormatter')
+        with self.assertRaises(ValueError) as exc:
+            _make_formatter_specs(dedent("""\
+                yaml
+                    format: '%(message)s'
+                    structured: yaml
+                """).splitlines(True))
+        self.assertEqual(str(exc.exception),
+                         "line 3: bad value 'yaml' -- must be one of "
+                         "'json', 'logfmt'")
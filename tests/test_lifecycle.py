@@ -0,0 +1,186 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict, ShardedQueue, ShardedListener
+from prelogging import lifecycle
+from prelogging._handler_lookup import lookup_handler
+from prelogging.six import PY2
+from tests.support import CollectingHandler
+from unittest import TestCase, skipIf, skipUnless
+import io
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import sys
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class Buffering(object):
+    """Holds records; delivers one per ``delay`` seconds when drained."""
+    def __init__(self, n, delay=0.0):
+        self.pending = n
+        self.delay = delay
+
+    def drain(self, deadline):
+        while self.pending and time.time() < deadline:
+            time.sleep(self.delay)
+            self.pending -= 1
+        return self.pending
+
+
+class Unpicklable(object):
+    """Blocks the thread that pickles it until ``release`` is set."""
+    def __init__(self, release):
+        self.release = release
+
+    def __reduce__(self):
+        self.release.wait()
+        return (str, ('released',))
+
+
+class PrivateRegistry(TestCase):
+    """Give each test a registry of its own, so that ``shutdown()`` drains
+    only what the test registered, not what other test modules left."""
+
+    _state = ('_drainables', '_done_pid', '_shutdown_timeout',
+              'last_abandoned')
+
+    def setUp(self):
+        self._saved = {name: getattr(lifecycle, name)
+                       for name in self._state}
+        lifecycle._drainables = []
+        lifecycle._done_pid = None
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(lifecycle, name, value)
+
+
+class TestShutdown(PrivateRegistry):
+
+    @skipIf(PY2, "io.StringIO needs unicode in Python 2")
+    def test_drains_within_deadline(self):
+        fast = Buffering(5)
+        slow = Buffering(1000, delay=0.01)
+        lifecycle.register_drainable(fast)
+        lifecycle.register_drainable(slow)
+        t0 = time.time()
+        stderr, sys.stderr = sys.stderr, io.StringIO()
+        try:
+            abandoned = lifecycle.shutdown(timeout=0.2)
+            report = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertIn('%d log record(s) abandoned' % abandoned, report)
+        self.assertEqual(fast.pending, 0)
+        self.assertGreater(abandoned, 0)
+        self.assertEqual(lifecycle.last_abandoned, {'Buffering': abandoned})
+        # Only once per process
+        self.assertEqual(lifecycle.shutdown(timeout=0.2), 0)
+
+    def test_stuck_mp_queue(self):
+        # The feeder thread is stuck pickling the first object, whatever
+        # becomes of the pipe when q is closed
+        release = threading.Event()
+        q = multiprocessing.Queue()
+        # Keep the pipe open (Python < 3.9 closes q's reader on close())
+        reader = os.dup(q._reader.fileno())
+        self.addCleanup(os.close, reader)
+        self.addCleanup(release.set)
+        q.put(Unpicklable(release))
+        for _ in range(4):
+            q.put('x')
+        t0 = time.time()
+        abandoned = lifecycle.drain_mp_queue(q, time.time() + 0.2)
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertEqual(abandoned, 4)
+
+    def test_sharded_listener(self):
+        handler = CollectingHandler()
+        logger = logging.getLogger('test_lifecycle.sharded')
+        logger.addHandler(handler)
+        logger.propagate = False
+        sq = ShardedQueue(2)
+        listener = ShardedListener(sq).start()
+        for i in range(20):
+            sq.put_nowait(logger.makeRecord(logger.name, logging.INFO,
+                                            __file__, 0, 'm%d', (i,), None))
+        self.assertEqual(listener.drain(time.time() + 5), 0)
+        self.assertFalse(listener.is_alive)
+        self.assertEqual(len(handler.records), 20)
+        logger.removeHandler(handler)
+
+
+class TestLCDictConfigRegisters(PrivateRegistry):
+
+    @skipIf(PY2, "logging.handlers.QueueHandler is Python 3 only")
+    def test_queue_handler_registered(self):
+        lcd = LCDict()
+        lcd.add_queue_handler('test_lifecycle_qh', queue=queue.Queue())
+        lcd.add_logger('test_lifecycle.q', handlers='test_lifecycle_qh',
+                       propagate=False)
+        lcd.config(shutdown_timeout=2.5)
+        qh = lookup_handler('test_lifecycle_qh')
+        self.assertIn(qh, lifecycle._live_drainables())
+        self.assertEqual(lifecycle._shutdown_timeout, 2.5)
+
+
+@skipUnless(hasattr(os, 'register_at_fork'), "requires os.register_at_fork")
+class TestAtFork(PrivateRegistry):
+
+    def _in_child(self, fn):
+        """Fork; run ``fn`` in the child; return its exit status (0 if it
+        returned true)."""
+        pid = os.fork()
+        if pid == 0:                                # pragma: no cover
+            try:
+                code = 0 if fn() else 1
+            except BaseException:
+                code = 2
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        return os.WEXITSTATUS(status)
+
+    def test_queue_handler_usable_in_child(self):
+        q = multiprocessing.Queue()
+        qh = logging.handlers.QueueHandler(q)
+        lifecycle.register_drainable(qh)
+        logger = logging.getLogger('test_lifecycle.fork')
+        logger.addHandler(qh)
+        logger.propagate = False
+        logger.warning('parent')        # starts the parent's feeder thread
+
+        def child():
+            logger.warning('child')
+            return lifecycle.shutdown(timeout=5) == 0
+
+        self.assertEqual(self._in_child(child), 0)
+        msgs = sorted(q.get(timeout=5).getMessage() for _ in range(2))
+        self.assertEqual(msgs, ['child', 'parent'])
+        logger.removeHandler(qh)
+
+    def test_child_state_reset(self):
+        from prelogging.collector import CollectorHandler
+        ch = CollectorHandler(('127.0.0.1', 1), flush_interval=0, timeout=0.5)
+        ch.handle(logging.makeLogRecord({'msg': 'batched',
+                                         'levelno': logging.INFO}))
+        self.assertEqual(len(ch._batch), 1)
+        listener = ShardedListener(ShardedQueue(1)).start()
+
+        def child():
+            return (not ch._batch
+                    and not listener.is_alive
+                    and listener not in lifecycle._live_drainables())
+
+        self.assertEqual(self._in_child(child), 0)
+        # The parent sent (here: dropped) the batch before forking
+        self.assertEqual(ch._batch, [])
+        self.assertTrue(listener.is_alive)
+        listener.stop()
+        ch.close()
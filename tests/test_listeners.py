@@ -0,0 +1,214 @@
+__author__ = 'brianoneill'
+
+from prelogging import (ChannelSet, ChannelListener,
+                        ShardedQueue, ShardedListener,
+                        PriorityLanes, PriorityListener)
+from prelogging import LCDict
+from prelogging.six import PY2
+from tests.support import CollectingHandler, make_record
+from unittest import TestCase, skipIf
+import logging
+import logging.handlers
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+@skipIf(PY2, "selectors is Python 3 only")
+class TestChannelListener(TestCase):
+
+    def setUp(self):
+        self.collector = CollectingHandler()
+        self.logger = logging.getLogger('test_listeners')
+        self.logger.addHandler(self.collector)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.removeHandler(self.collector)
+
+    def test_all_records_delivered(self):
+        channels = ChannelSet(3)
+        listener = ChannelListener(channels).start()
+
+        def worker(i):
+            w = channels.writer(i)
+            for k in range(50):
+                w.put_nowait(make_record('test_listeners', '%d-%d' % (i, k),
+                                         created=1000.0 + k))
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        listener.stop()
+
+        msgs = [r.msg for r in self.collector.records]
+        self.assertEqual(len(msgs), 150)
+        # Order within each channel is preserved
+        for i in range(3):
+            mine = [m for m in msgs if m.startswith('%d-' % i)]
+            self.assertEqual(mine, ['%d-%d' % (i, k) for k in range(50)])
+
+    def test_reorder_window(self):
+        channels = ChannelSet(2)
+        # Records arrive out of creation order; the window restores it.
+        for i, msg, created in ((0, 'b', 2.0), (0, 'd', 4.0),
+                                (1, 'a', 1.0), (1, 'c', 3.0)):
+            channels.writer(i).put_nowait(
+                make_record('test_listeners', msg, created=created))
+        channels.close_writers()
+
+        listener = ChannelListener(channels, reorder_window=10).start()
+        listener._thread.join(5)            # all channels at EOF: it exits
+        self.assertFalse(listener.is_alive)
+        listener.stop()
+        self.assertEqual([r.msg for r in self.collector.records],
+                         ['a', 'b', 'c', 'd'])
+
+    def test_queue_handler_writes_to_channel(self):
+        channels = ChannelSet(1)
+        listener = ChannelListener(channels).start()
+
+        qhandler = logging.handlers.QueueHandler(channels.writer(0))
+        record = logging.makeLogRecord({'name': 'test_listeners',
+                                        'msg': 'via channel %d',
+                                        'args': (7,),
+                                        'levelno': logging.WARNING,
+                                        'levelname': 'WARNING'})
+        qhandler.handle(record)
+        listener.stop()
+
+        self.assertEqual([r.getMessage() for r in self.collector.records],
+                         ['via channel 7'])
+
+
+class TestShardedListener(TestCase):
+
+    def test_shard_of_is_stable(self):
+        sq = ShardedQueue(4)
+        r1 = make_record('spam.ham', 'x', created=1.0)
+        r2 = make_record('spam.ham', 'y', created=2.0)
+        self.assertEqual(sq.shard_of(r1), sq.shard_of(r2))
+        self.assertTrue(0 <= sq.shard_of(r1) < 4)
+
+    def test_per_logger_order_preserved(self):
+        names = ['test_sharded.%d' % i for i in range(6)]
+        collectors = {}
+        for name in names:
+            logger = logging.getLogger(name)
+            logger.propagate = False
+            collectors[name] = CollectingHandler()
+            logger.addHandler(collectors[name])
+
+        sq = ShardedQueue(3)
+        listener = ShardedListener(sq).start()
+        for k in range(40):
+            for name in names:
+                sq.put_nowait(make_record(name, k, created=float(k)))
+        listener.stop()
+        self.assertFalse(listener.is_alive)
+
+        for name in names:
+            logger = logging.getLogger(name)
+            logger.removeHandler(collectors[name])
+            self.assertEqual([r.msg for r in collectors[name].records],
+                             list(range(40)))
+
+
+class TestPriorityListener(TestCase):
+
+    def setUp(self):
+        self.collector = CollectingHandler()
+        self.logger = logging.getLogger('test_priority')
+        self.logger.addHandler(self.collector)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.removeHandler(self.collector)
+
+    @staticmethod
+    def record(levelno, msg):
+        return logging.makeLogRecord({'name': 'test_priority', 'msg': msg,
+                                      'levelno': levelno,
+                                      'levelname': logging.getLevelName(levelno)})
+
+    @staticmethod
+    def settle(lanes):
+        # let the queues' feeder threads deliver
+        for q in lanes.queues:
+            while q.empty():
+                time.sleep(0.01)
+        time.sleep(0.2)
+
+    def test_lane_of(self):
+        lanes = PriorityLanes(bands=('WARNING', 'ERROR'))
+        self.assertEqual(len(lanes), 3)
+        self.assertEqual(lanes.lane_of(self.record(logging.CRITICAL, '')), 0)
+        self.assertEqual(lanes.lane_of(self.record(logging.ERROR, '')), 0)
+        self.assertEqual(lanes.lane_of(self.record(logging.WARNING, '')), 1)
+        self.assertEqual(lanes.lane_of(self.record(logging.DEBUG, '')), 2)
+
+    def test_errors_jump_the_backlog(self):
+        lanes = PriorityLanes()
+        for k in range(20):
+            lanes.put_nowait(self.record(logging.DEBUG, 'debug %d' % k))
+        lanes.put_nowait(self.record(logging.ERROR, 'error'))
+        self.settle(lanes)
+
+        PriorityListener(lanes).start().stop()
+        msgs = [r.msg for r in self.collector.records]
+        self.assertEqual(msgs[0], 'error')
+        self.assertEqual(msgs[1:], ['debug %d' % k for k in range(20)])
+
+    def test_starvation_guard(self):
+        lanes = PriorityLanes()
+        for k in range(5):
+            lanes.put_nowait(self.record(logging.ERROR, 'E'))
+        for k in range(3):
+            lanes.put_nowait(self.record(logging.DEBUG, 'd'))
+        self.settle(lanes)
+
+        PriorityListener(lanes, starvation_limit=2).start().stop()
+        self.assertEqual(''.join(r.msg for r in self.collector.records),
+                         'EEdEEdEd')
+
+
+@skipIf(PY2, "logging.handlers.QueueHandler is Python 3 only")
+class TestAddQueueHandler(TestCase):
+
+    def log_through(self, q):
+        lcd = LCDict(attach_handlers_to_root=True, root_level='DEBUG')
+        lcd.add_queue_handler('qhandler', queue=q)
+        lcd.config()
+        logger = logging.getLogger('test_add_queue_handler')
+        try:
+            logger.warning('via %s', type(q).__name__)
+        finally:
+            LCDict().config()     # reset root
+
+    def test_transports(self):
+        q = queue.Queue()
+        self.log_through(q)
+        self.assertEqual(q.get_nowait().getMessage(), 'via Queue')
+
+        channels = ChannelSet(1)
+        self.log_through(channels.writer(0))
+        self.assertEqual(channels.readers[0].recv().getMessage(),
+                         'via ChannelWriter')
+        channels.close_writers()
+
+        sharded = ShardedQueue(2)
+        self.log_through(sharded)
+        shard = sharded.queues[sharded.shard_of(
+            logging.makeLogRecord({'name': 'test_add_queue_handler'}))]
+        self.assertEqual(shard.get(timeout=5).getMessage(),
+                         'via ShardedQueue')
+
+        lanes = PriorityLanes()
+        self.log_through(lanes)
+        self.assertEqual(lanes.queues[1].get(timeout=5).getMessage(),
+                         'via PriorityLanes')
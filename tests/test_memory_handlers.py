@@ -0,0 +1,124 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.memory_handlers import FlightRecorderHandler
+from prelogging.six import PY2
+from tests.support import CollectingHandler
+from unittest import TestCase, skipIf, skipUnless
+import gc
+import io
+import logging
+import os
+import signal
+import time
+
+
+class TestFlightRecorderHandler(TestCase):
+
+    def setUp(self):
+        self.target = CollectingHandler()
+        self.target.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.target.set_name('test_flight_target')
+        self.logger = logging.getLogger('test_flight_recorder')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = None
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def make_handler(self, **kwargs):
+        self.handler = FlightRecorderHandler('test_flight_target', **kwargs)
+        self.logger.addHandler(self.handler)
+        return self.handler
+
+    def test_dumps_recent_context_on_trigger(self):
+        h = self.make_handler(capacity=3)
+        for i in range(10):
+            self.logger.debug('step %d', i)
+        self.assertEqual(self.target.messages, [])
+        self.assertEqual(h.qsize(), 3)
+
+        self.logger.error('failed')
+        self.assertEqual(self.target.messages,
+                         ['DEBUG step 7', 'DEBUG step 8', 'DEBUG step 9',
+                          'ERROR failed'])
+        self.assertEqual(h.metrics(), {'depth': 0, 'dumps': 1, 'dumped': 4})
+
+        # The buffer starts over
+        self.logger.info('again')
+        self.logger.critical('failed again')
+        self.assertEqual(self.target.messages[4:],
+                         ['INFO again', 'CRITICAL failed again'])
+
+    def test_target_level_applies(self):
+        self.target.setLevel(logging.INFO)
+        self.make_handler(trigger_level='WARNING')
+        self.logger.debug('d')
+        self.logger.info('i')
+        self.logger.warning('w')
+        self.assertEqual(self.target.messages, ['INFO i', 'WARNING w'])
+
+    def test_missing_target_goes_to_handle_error(self):
+        h = FlightRecorderHandler('test_flight_no_such_target')
+        self.handler = h
+        self.logger.addHandler(h)
+        errors = []
+        h.handleError = errors.append
+        self.logger.debug('context')
+        self.logger.error('failed')         # doesn't raise
+        self.assertEqual([r.getMessage() for r in errors], ['failed'])
+        self.assertEqual(h.metrics(), {'depth': 0, 'dumps': 0, 'dumped': 0})
+
+    @skipUnless(hasattr(signal, 'SIGUSR1'), "needs SIGUSR1")
+    def test_dump_signal(self):
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            h = self.make_handler(dump_signal='SIGUSR1')
+            self.logger.debug('context')
+            os.kill(os.getpid(), signal.SIGUSR1)
+            deadline = time.time() + 5
+            while not self.target.messages and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.target.messages, ['DEBUG context'])
+            self.assertEqual(h.qsize(), 0)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+
+
+class TestLCDictMemoryHandler(TestCase):
+
+    def test_add_memory_handler(self):
+        lcd = LCDict(root_level='DEBUG')
+        lcd.add_stdout_handler('console', formatter='msg', level='WARNING',
+                               attach_to_root=True)
+        lcd.add_file_handler('context_file', filename='flight.log',
+                             formatter='msg', delay=True)
+        lcd.add_memory_handler('flight', target='context_file',
+                               capacity=50, attach_to_root=True)
+        self.assertEqual(
+            lcd.handlers['flight'],
+            {'()': 'ext://prelogging.memory_handlers.FlightRecorderHandler',
+             'target': 'context_file',
+             'capacity': 50,
+             'trigger_level': 'ERROR'}
+        )
+        self.assertEqual(lcd.root['handlers'], ['console', 'flight'])
+
+    @skipIf(PY2, "io.StringIO needs unicode in Python 2")
+    def test_unattached_target_kept(self):
+        stream = io.StringIO()
+        lcd = LCDict()
+        lcd.add_stream_handler('test_flight_stream', stream=stream,
+                               formatter='msg')
+        lcd.add_memory_handler('test_flight', target='test_flight_stream')
+        lcd.add_logger('test_flight_recorder.unattached',
+                       handlers='test_flight', level='DEBUG',
+                       propagate=False)
+        lcd.config()
+        # Nothing but the flight recorder refers to its target now
+        gc.collect()
+        logger = logging.getLogger('test_flight_recorder.unattached')
+        logger.info('context')
+        logger.error('failed')
+        self.assertEqual(stream.getvalue(), 'context\nfailed\n')
@@ -0,0 +1,237 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.nonblocking_handlers import (NonBlockingHandler,
+                                              NonBlockingStreamHandler)
+from prelogging.six import PY2
+from unittest import TestCase, skipIf, skipUnless
+import gc
+import io
+import logging
+import os
+import sys
+import threading
+import time
+
+
+class BlockedHandler(logging.Handler):
+    """A target whose writes wait until ``unblock()``."""
+    def __init__(self):
+        super(BlockedHandler, self).__init__()
+        self.records = []
+        self.go = threading.Event()
+
+    def unblock(self):
+        self.go.set()
+
+    def emit(self, record):
+        self.go.wait()
+        self.records.append(self.format(record))
+
+
+class TestNonBlockingHandler(TestCase):
+
+    def setUp(self):
+        self.target = BlockedHandler()
+        self.target.set_name('test_nb_target')
+        self.handler = NonBlockingHandler('test_nb_target', capacity=5)
+        self.handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.logger = logging.getLogger('test_nonblocking')
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.target.unblock()
+        self.handler.close()
+
+    def test_doesnt_block_and_drops_beyond_capacity(self):
+        t0 = time.time()
+        self.logger.info('first')           # the writer takes this, and blocks
+        time.sleep(0.1)
+        for i in range(10):
+            self.logger.info('msg %d', i)
+        self.assertLess(time.time() - t0, 0.5)
+        m = self.handler.metrics()
+        self.assertEqual(m['depth'], 5)
+        self.assertEqual(m['max_depth'], 5)
+        self.assertEqual(m['dropped'], 5)
+
+        self.target.unblock()
+        self.handler.flush()
+        self.assertEqual(self.target.records,
+                         ['INFO first'] + ['INFO msg %d' % i for i in range(5)])
+        self.assertEqual(self.handler.metrics()['delivered'], 6)
+        self.assertEqual(self.handler.qsize(), 0)
+
+    def test_drain_gives_up_at_deadline(self):
+        self.logger.info('a')
+        self.logger.info('b')
+        t0 = time.time()
+        abandoned = self.handler.drain(time.time() + 0.2)
+        self.assertLess(time.time() - t0, 0.5)
+        self.assertEqual(abandoned, 2)
+
+    def test_delivered_counts_what_the_target_handled(self):
+        self.target.unblock()
+        self.target.setLevel(logging.WARNING)
+        self.logger.info('dropped by level')
+        self.logger.warning('kept')
+        self.handler.flush()
+        self.assertEqual(self.target.records, ['WARNING kept'])
+        self.assertEqual(self.handler.metrics()['delivered'], 1)
+
+    def test_writer_survives_delivery_errors(self):
+        h = NonBlockingHandler('test_nb_late_target')
+        errors = []
+        h.handleError = errors.append
+        try:
+            h.handle(logging.makeLogRecord({'msg': 'lost',
+                                            'levelno': logging.INFO}))
+            h.flush()                       # no such target yet
+            self.assertEqual([r.getMessage() for r in errors], ['lost'])
+
+            target = BlockedHandler()
+            target.set_name('test_nb_late_target')
+            target.unblock()
+            h.handle(logging.makeLogRecord({'msg': 'delivered',
+                                            'levelno': logging.INFO}))
+            h.flush()
+            self.assertEqual(target.records, ['delivered'])
+            self.assertEqual(h.metrics()['delivered'], 1)
+        finally:
+            h.close()
+
+
+@skipIf(PY2, "io.StringIO needs unicode in Python 2")
+class TestUnattachedTarget(TestCase):
+
+    def test_target_kept(self):
+        stream = io.StringIO()
+        lcd = LCDict()
+        lcd.add_stream_handler('test_nb_out', stream=stream, formatter='msg',
+                               nonblocking=True)
+        lcd.add_logger('test_nonblocking.unattached', handlers='test_nb_out',
+                       propagate=False)
+        lcd.config()
+        # Nothing but the non-blocking handler refers to its target now
+        gc.collect()
+        logging.getLogger('test_nonblocking.unattached').warning('kept')
+        handler = logging.getLogger('test_nonblocking.unattached').handlers[0]
+        handler.flush()
+        self.assertEqual(stream.getvalue(), 'kept\n')
+        handler.close()
+
+
+
+def _read_all(fd):
+    """Read what's available from non-blocking ``fd``."""
+    chunks = []
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+@skipUnless(os.name == 'posix', "needs non-blocking pipes")
+@skipIf(PY2, "os.set_blocking is Python 3 only")
+class TestNonBlockingStreamHandler(TestCase):
+
+    def setUp(self):
+        r, w = os.pipe()
+        os.set_blocking(r, False)
+        self.r = r
+        self.stream = os.fdopen(w, 'w')
+        self.handler = NonBlockingStreamHandler(self.stream, max_buffer=4096)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger = logging.getLogger('test_nonblocking_stream')
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        os.close(self.r)
+        self.handler.flush_timeout = 0
+        self.handler.close()
+        self.stream.close()
+
+    def test_full_pipe_doesnt_block(self):
+        line = 'x' * 999                    # + newline: 1000 bytes
+        t0 = time.time()
+        for i in range(200):                # 200K > pipe capacity + 4K
+            self.logger.info('%03d%s', i, line[3:])
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertGreater(self.handler.dropped, 0)
+        self.assertLessEqual(self.handler.pending_bytes, 4096)
+        self.assertEqual(self.handler.drain(time.time() + 0.1), 1)
+
+        # The reader catches up: what was buffered comes out, in order
+        data = _read_all(self.r)
+        self.handler.flush()
+        data += _read_all(self.r)
+        self.assertEqual(self.handler.pending_bytes, 0)
+        lines = data.decode().splitlines()
+        self.assertEqual(len(lines), 200 - self.handler.dropped)
+        self.assertEqual([int(l[:3]) for l in lines],
+                         list(range(len(lines))))
+
+        # Room again: records are written at once
+        self.logger.info('after')
+        self.assertEqual(_read_all(self.r), b'after\n')
+
+    def test_close_restores_blocking_mode(self):
+        fd = self.stream.fileno()
+        self.assertTrue(os.get_blocking(fd))
+        self.logger.info('hi')
+        self.assertFalse(os.get_blocking(fd))
+        self.handler.close()
+        self.assertTrue(os.get_blocking(fd))
+        self.assertEqual(_read_all(self.r), b'hi\n')
+
+    def test_stream_without_descriptor(self):
+        import io
+        sio = io.StringIO()
+        h = NonBlockingStreamHandler(sio)
+        h.setFormatter(logging.Formatter('%(message)s'))
+        h.handle(logging.makeLogRecord({'msg': 'hi', 'levelno': logging.INFO}))
+        self.assertEqual(sio.getvalue(), 'hi\n')
+        self.assertEqual(h.drain(time.time()), 0)
+
+
+class TestLCDictNonblocking(TestCase):
+
+    def test_nonblocking_stream_flag(self):
+        lcd = LCDict(locking=True)
+        lcd.add_stdout_handler('out', nonblocking_stream=True,
+                               max_buffer=100)
+        self.assertEqual(
+            lcd.handlers['out'],
+            {'()': 'ext://prelogging.NonBlockingStreamHandler',
+             'stream': 'ext://sys.stdout',
+             'max_buffer': 100}
+        )
+
+    def test_nonblocking_flag(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        lcd.add_file_handler('fh', filename='nb.log', delay=True,
+                             formatter='msg', level='INFO',
+                             nonblocking=True, nonblocking_capacity=100)
+        self.assertEqual(
+            lcd.handlers['fh'],
+            {'()': 'ext://prelogging.nonblocking_handlers.NonBlockingHandler',
+             'target': 'fh:target',
+             'capacity': 100,
+             'level': 'INFO',
+             'formatter': 'msg'}
+        )
+        self.assertEqual(lcd.handlers['fh:target']['class'],
+                         'logging.FileHandler')
+        self.assertNotIn('level', lcd.handlers['fh:target'])
+        self.assertEqual(lcd.root['handlers'], ['fh'])
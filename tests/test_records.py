@@ -0,0 +1,250 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.formatters import FastFormatter, JsonFormatter
+from prelogging.records import (lean_records, CompactLogRecord,
+                                compact_record_factory, use_compact_records,
+                                add_record_fields, remove_record_fields)
+from prelogging.six import PY2
+from unittest import TestCase, skipIf
+import copy
+import io
+import logging
+import logging.handlers
+import pickle
+try:
+    import contextvars
+except ImportError:
+    contextvars = None                  # Python < 3.7
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+def uses_thread_name(record):
+    return record.threadName != 'Noisy'
+
+
+class DeclaredFilter(logging.Filter):
+    record_attributes = ('lineno',)
+
+    def filter(self, record):
+        return record.lineno > 0
+
+
+class TestLeanRecords(TestCase):
+
+    _switches = ('logThreads', 'logProcesses', 'logMultiprocessing',
+                 'logAsyncioTasks', '_srcfile')
+
+    def setUp(self):
+        self.saved = {s: getattr(logging, s) for s in self._switches
+                      if hasattr(logging, s)}
+
+    def tearDown(self):
+        for s, value in self.saved.items():
+            setattr(logging, s, value)
+
+    def decisions(self, lcd, keep=()):
+        return {switch: enabled
+                for switch, enabled, _ in lean_records(lcd, keep)}
+
+    def test_presets_need_nothing_but_process_name(self):
+        lcd = LCDict()
+        lcd.add_stderr_handler('h', formatter='process_time_logger_level_msg')
+        d = self.decisions(lcd)
+        self.assertEqual(d['logThreads'], False)
+        self.assertEqual(d['logProcesses'], False)
+        self.assertEqual(d['logMultiprocessing'], True)
+        self.assertEqual(d['_srcfile'], False)
+        self.assertIsNone(logging._srcfile)
+        self.assertFalse(logging.logThreads)
+
+        record = logging.getLogger('test_records').makeRecord(
+            'x', logging.INFO, '(unknown file)', 0, 'msg', (), None)
+        self.assertIsNone(record.threadName)
+
+    def test_format_fields_and_keep(self):
+        lcd = LCDict()
+        lcd.add_formatter('f', format='{threadName} {funcName}: {message}',
+                          style='{')
+        d = self.decisions(lcd, keep=['process'])
+        self.assertEqual(d['logThreads'], True)
+        self.assertEqual(d['_srcfile'], True)
+        self.assertEqual(d['logProcesses'], True)
+        self.assertEqual(d['logMultiprocessing'], False)
+        self.assertIsNotNone(logging._srcfile)
+
+    def test_filters(self):
+        lcd = LCDict()
+        lcd.add_callable_filter('f1', uses_thread_name)
+        lcd.add_class_filter('f2', DeclaredFilter)
+        d = self.decisions(lcd)
+        self.assertEqual(d['logThreads'], True)
+        self.assertEqual(d['_srcfile'], True)
+        self.assertEqual(d['logProcesses'], False)
+
+    def test_shipping_handlers_need_everything(self):
+        lcd = LCDict()
+        lcd.add_formatter('f', format='%(message)s')
+        lcd.add_collector_handler('c', address=('localhost', 9020))
+        self.assertTrue(all(self.decisions(lcd).values()))
+
+    def test_config_reports(self):
+        lcd = LCDict(attach_handlers_to_root=True)
+        lcd.add_stderr_handler('h', formatter='msg')
+        self.assertIsNone(lcd.lean_records_report)
+        lcd.config(lean_records=['threadName'])
+        report = dict((switch, (enabled, reason))
+                      for switch, enabled, reason in lcd.lean_records_report)
+        self.assertEqual(report['logThreads'], (True, 'used by threadName: keep'))
+        self.assertEqual(report['_srcfile'][0], False)
+        self.assertTrue(report['_srcfile'][1].startswith('nothing uses'))
+
+
+@skipIf(PY2, "logging.setLogRecordFactory is Python 3 only")
+class TestCompactRecords(TestCase):
+
+    args = ('svc.db', logging.WARNING, '/src/db.py', 7, 'Query %s took %dms',
+            ('q1', 12), None)
+
+    def tearDown(self):
+        logging.setLogRecordFactory(logging.LogRecord)
+
+    def test_formatters_see_the_same(self):
+        std = logging.LogRecord(*self.args)
+        compact = compact_record_factory(*self.args)
+        compact.created, compact.msecs = std.created, std.msecs
+        compact.relativeCreated = std.relativeCreated
+        self.assertIsInstance(compact, CompactLogRecord)
+        self.assertFalse(hasattr(compact, 'message'))
+        for fmt, style in (('%(asctime)s %(name)-10s %(levelname)s %(lineno)d '
+                            '%(message)s', '%'),
+                           ('{name} {process} {message}', '{'),
+                           ('$name $threadName $message', '$')):
+            for cls in (logging.Formatter, FastFormatter):
+                self.assertEqual(cls(fmt, style=style).format(compact),
+                                 cls(fmt, style=style).format(std))
+        self.assertEqual(JsonFormatter(backend='json').format(compact),
+                         JsonFormatter(backend='json').format(std))
+        self.assertEqual(dict(compact.__dict__), std.__dict__)
+
+    def test_extra_and_other_attributes(self):
+        record = compact_record_factory(*self.args)
+        self.assertRaises(AttributeError, getattr, record, '_extra')
+        record.user = 'bob'
+        record.__dict__['tenant'] = 't1'
+        self.assertEqual((record.user, record.tenant), ('bob', 't1'))
+        self.assertIn('user', record.__dict__)
+        self.assertIn('msg', record.__dict__)
+        self.assertNotIn('getMessage', record.__dict__)
+        del record.user
+        self.assertRaises(AttributeError, getattr, record, 'user')
+        self.assertEqual(record._extra, {'tenant': 't1'})
+
+        c = copy.copy(record)
+        c.tenant = 't2'
+        self.assertEqual((record.tenant, c.tenant), ('t1', 't2'))
+        p = pickle.loads(pickle.dumps(record))
+        self.assertEqual(p.getMessage(), 'Query q1 took 12ms')
+        self.assertEqual(p.tenant, 't1')
+
+    def test_through_logging(self):
+        self.assertTrue(use_compact_records())
+        q = queue.Queue()
+        logger = logging.getLogger('test_compact')
+        logger.propagate = False
+        handler = logging.handlers.QueueHandler(q)
+        logger.addHandler(handler)
+        try:
+            logger.warning('Hi %s', 'there', extra={'user': 'bob'})
+            with self.assertRaises(KeyError):
+                logger.warning('Hi', extra={'lineno': 1})
+        finally:
+            logger.removeHandler(handler)
+        record = q.get_nowait()
+        self.assertIsInstance(record, CompactLogRecord)
+        self.assertEqual((record.message, record.user), ('Hi there', 'bob'))
+        self.assertTrue(use_compact_records(False) is False)
+        self.assertIs(logging.getLogRecordFactory(), logging.LogRecord)
+
+    def test_lcdict_config(self):
+        lcd = LCDict()
+        lcd.config(compact_records=True)
+        self.assertIs(logging.getLogRecordFactory(), compact_record_factory)
+
+        logging.setLogRecordFactory(lambda *a, **kw: logging.LogRecord(*a, **kw))
+        with self.assertLogs('prelogging.records', 'WARNING'):
+            LCDict().config(compact_records=True)
+
+
+request_id = contextvars.ContextVar('request_id') if contextvars else None
+
+
+@skipIf(contextvars is None, "requires contextvars (Python 3.7+)")
+class TestRecordFields(TestCase):
+
+    def tearDown(self):
+        logging.setLogRecordFactory(logging.LogRecord)
+
+    def log_to(self, lcd, formatter):
+        stream = io.StringIO()
+        lcd.add_formatter('f', format=formatter)
+        lcd.add_stream_handler('h1', formatter='f', stream=stream)
+        lcd.add_stream_handler('h2', formatter='f', stream=stream)
+        lcd.add_logger('test_fields', handlers=['h1', 'h2'], propagate=False)
+        return stream
+
+    def test_lcdict(self):
+        lcd = LCDict()
+        lcd.add_record_fields(service='billing', request_id=request_id)
+        self.assertEqual(lcd.record_fields,
+                         {'service': 'billing', 'request_id': request_id})
+        stream = self.log_to(lcd, '%(service)s %(request_id)s %(message)s')
+        lcd.config()
+        logger = logging.getLogger('test_fields')
+        logger.warning('one')
+
+        def in_request():
+            request_id.set('r42')
+            logger.warning('two')
+
+        contextvars.copy_context().run(in_request)
+        self.assertEqual(stream.getvalue(),
+                         'billing None one\n' * 2 + 'billing r42 two\n' * 2)
+
+    def test_merged_and_removed(self):
+        add_record_fields({'a': 1, 'b': request_id})
+        add_record_fields({'b': 2})
+        use_compact_records()
+        record = logging.getLogger('test_fields').makeRecord(
+            'x', logging.INFO, 'f.py', 1, 'msg', (), None, extra={'c': 3})
+        self.assertIsInstance(record, CompactLogRecord)
+        self.assertEqual((record.a, record.b, record.c), (1, 2, 3))
+        with self.assertRaises(KeyError):
+            logging.getLogger('test_fields').makeRecord(
+                'x', logging.INFO, 'f.py', 1, 'msg', (), None, extra={'a': 0})
+        remove_record_fields()
+        self.assertIs(logging.getLogRecordFactory(), compact_record_factory)
+
+    def test_worker_lcdict(self):
+        lcd = LCDict()
+        lcd.add_record_fields(service='billing')
+        worker = lcd.worker_lcdict(queue.Queue())
+        self.assertEqual(worker.record_fields, {'service': 'billing'})
+
+    def test_pool_initializer(self):
+        lcd = LCDict()
+        lcd.add_record_fields(service='billing', request_id=request_id)
+        with self.assertLogs('prelogging.records', 'WARNING') as cm:
+            initializer, initargs = lcd.pool_initializer()
+        self.assertIn('request_id', cm.output[0])
+        config = pickle.loads(pickle.dumps(initargs[0]))
+        self.assertEqual(config['prelogging'],
+                         {'record_fields': {'service': 'billing'}})
+        initializer(config, *initargs[1:])
+        record = logging.getLogger('test_fields').makeRecord(
+            'x', logging.INFO, 'f.py', 1, 'msg', (), None)
+        self.assertEqual(record.service, 'billing')
+        self.assertFalse(hasattr(record, 'request_id'))
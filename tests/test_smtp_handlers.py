@@ -0,0 +1,189 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.smtp_handlers import DigestSMTPHandler
+from prelogging.six import PY2
+from unittest import TestCase, skipIf
+import email
+import logging
+import socket
+import threading
+import time
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """A local stand-in SMTP server, which keeps the messages it receives.
+    Just enough SMTP for ``smtplib.SMTP.sendmail``.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(
+            self, ('127.0.0.1', 0), SMTPSession)
+        self.messages = []
+        self.connections = 0
+        self.sockets = []
+        self.received = threading.Event()
+
+    def drop_connections(self):
+        """Close all connections, as a server does with idle ones."""
+        for sock in self.sockets:
+            sock.shutdown(socket.SHUT_RDWR)
+
+    def start(self):
+        t = threading.Thread(target=self.serve_forever)
+        t.daemon = True
+        t.start()
+        return self.server_address
+
+
+class SMTPSession(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.server.sockets.append(self.connection)
+        self.reply('220 stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line[:4].upper()
+            if cmd in (b'EHLO', b'HELO'):
+                self.reply('250 stand-in')
+            elif cmd == b'DATA':
+                self.reply('354 go ahead')
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if line in (b'.\r\n', b''):
+                        break
+                    lines.append(line)
+                self.server.messages.append(
+                    email.message_from_bytes(b''.join(lines)))
+                self.server.received.set()
+                self.reply('250 ok')
+            elif cmd == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:                       # MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+
+@skipIf(PY2, "email.message_from_bytes is Python 3 only")
+class TestDigestSMTPHandler(TestCase):
+
+    def setUp(self):
+        self.server = SMTPStandIn()
+        self.address = self.server.start()
+        self.logger = logging.getLogger('test_digest_smtp')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = None
+
+    def tearDown(self):
+        if self.handler:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_handler(self, **kwargs):
+        self.handler = DigestSMTPHandler(self.address, 'app@example.com',
+                                         ['ops@example.com'], 'Errors',
+                                         **kwargs)
+        self.handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.logger.addHandler(self.handler)
+        return self.handler
+
+    @staticmethod
+    def body(message):
+        return message.get_payload(decode=True).decode('utf-8')
+
+    def wait_for(self, n, timeout=5.0):
+        deadline = time.time() + timeout
+        while len(self.server.messages) < n and time.time() < deadline:
+            time.sleep(0.01)
+        return self.server.messages
+
+    def test_window_makes_one_digest(self):
+        self.make_handler(window=0.2)
+        t0 = time.time()
+        for i in range(50):
+            self.logger.error('boom %d', i)
+        self.assertLess(time.time() - t0, 0.2)     # sending isn't inline
+        messages = self.wait_for(1)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]['Subject'], 'Errors (50 records)')
+        self.assertEqual(self.body(messages[0]).splitlines(),
+                         ['ERROR boom %d' % i for i in range(50)])
+
+    def test_max_records_and_connection_reuse(self):
+        h = self.make_handler(window=60, max_records=10)
+        for i in range(30):
+            self.logger.error('boom %d', i)
+        messages = self.wait_for(3)
+        self.assertEqual(len(messages), 3)
+        self.assertEqual([m['Subject'] for m in messages],
+                         ['Errors (10 records)'] * 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(h.connections, 1)
+
+    def test_rate_cap_and_capacity(self):
+        h = self.make_handler(window=60, max_records=5,
+                              max_emails=2, per=60, capacity=20)
+        for n in (1, 2):
+            for i in range(5):
+                self.logger.error('boom %d', i)
+            self.wait_for(n)
+        for i in range(30):
+            self.logger.error('boom %d', i)
+        time.sleep(0.2)
+        self.assertEqual(len(self.server.messages), 2)   # capped
+        m = h.metrics()
+        self.assertEqual(m['emails_sent'], 2)
+        self.assertEqual(m['pending'], 20)
+        self.assertEqual(m['dropped'], 10)
+
+        # At shutdown, the rest goes out in one last digest
+        self.assertEqual(h.drain(time.time() + 5), 0)
+        messages = self.server.messages
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(messages[2]['Subject'], 'Errors (20 records)')
+        self.assertIn('10 more record(s) dropped', self.body(messages[2]))
+
+    def test_reconnects_when_server_drops_connection(self):
+        h = self.make_handler(window=0.05)
+        self.logger.error('one')
+        self.wait_for(1)
+        h._wait(time.time() + 5)        # until the server's reply is read
+        self.server.drop_connections()
+        self.logger.error('two')
+        self.assertEqual(len(self.wait_for(2)), 2)
+        self.assertEqual(h.connections, 2)
+        self.assertEqual(h.send_failures, 0)
+
+
+class TestLCDictDigestEmail(TestCase):
+
+    def test_add_digest_email_handler(self):
+        lcd = LCDict()
+        lcd.add_digest_email_handler('mail',
+                                     mailhost=('localhost', 25),
+                                     fromaddr='app@example.com',
+                                     toaddrs=['ops@example.com'],
+                                     subject='Errors',
+                                     username='u', password='p',
+                                     level='ERROR', window=30)
+        hdict = lcd.handlers['mail']
+        self.assertEqual(hdict['()'],
+                         'ext://prelogging.smtp_handlers.DigestSMTPHandler')
+        self.assertEqual(hdict['credentials'], ('u', 'p'))
+        self.assertEqual(hdict['window'], 30)
+        self.assertEqual(hdict['level'], 'ERROR')
@@ -0,0 +1,102 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.six import PY2
+from unittest import TestCase, skipIf
+import logging
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+def no_heartbeats(record):
+    return 'heartbeat' not in record.getMessage()
+
+
+def counting_filter(record):
+    return True
+
+
+@skipIf(PY2, "logging.handlers.QueueHandler is Python 3 only")
+class TestWorkerLCDict(TestCase):
+
+    def listener_lcdict(self):
+        lcd = LCDict(root_level='DEBUG')
+        lcd.add_callable_filter('no_heartbeats', no_heartbeats, pure=True)
+        lcd.add_callable_filter('counter', counting_filter)     # not pure
+        lcd.add_stderr_handler('console', level='WARNING',
+                               filters=['no_heartbeats', 'counter'])
+        lcd.add_file_handler('errors', filename='errors.log', level='ERROR',
+                             delay=True, filters='no_heartbeats')
+        lcd.attach_root_handlers('console', 'errors')
+        lcd.add_file_handler('foofile', filename='foo.log', level='INFO',
+                             delay=True, filters='no_heartbeats')
+        lcd.add_logger('foo', handlers='foofile')
+        lcd.add_logger('quiet', propagate=False)
+        lcd.add_logger('bar', filters=['no_heartbeats', 'counter'])
+        return lcd
+
+    def test_levels_and_filters_pushed_down(self):
+        q = queue.Queue()
+        worker = self.listener_lcdict().worker_lcdict(q)
+
+        self.assertEqual(worker.root['level'], 'WARNING')
+        self.assertEqual(worker.root['handlers'], ['qhandler'])
+        self.assertEqual(worker.handlers['qhandler'],
+                         {'()': 'ext://logging.handlers.QueueHandler',
+                          'queue': q,
+                          'filters': ['no_heartbeats']})
+        # 'foo' reaches foofile (INFO) as well as the root's handlers
+        self.assertEqual(worker.loggers['foo'], {'level': 'INFO'})
+        # 'quiet' reaches no handlers: only logging.lastResort
+        self.assertEqual(worker.loggers['quiet'], {'level': 'WARNING'})
+        # only the pure filter travels
+        self.assertEqual(worker.loggers['bar'],
+                         {'level': 'WARNING', 'filters': ['no_heartbeats']})
+        self.assertEqual(list(worker.filters), ['no_heartbeats'])
+
+    def test_levelless_handlers_and_logger_levels(self):
+        lcd = LCDict()                          # root level WARNING
+        lcd.add_file_handler('foofile', filename='foo.log', delay=True)
+        lcd.add_logger('foo', handlers='foofile')
+        lcd.add_logger('foo.quiet', level='ERROR')
+        q = queue.Queue()
+        worker = lcd.worker_lcdict(q)
+        # Not NOTSET, which would inherit the root's WARNING
+        self.assertEqual(worker.loggers['foo'], {'level': 1})
+        self.assertEqual(worker.loggers['foo.quiet'], {'level': 'ERROR'})
+
+        worker.config()
+        try:
+            logging.getLogger('foo').info('sent')
+            logging.getLogger('foo.quiet').warning('not sent')
+        finally:
+            LCDict().config()     # reset root
+        self.assertEqual(q.get_nowait().getMessage(), 'sent')
+        self.assertTrue(q.empty())
+
+    def test_worker_config_drops_records(self):
+        q = queue.Queue()
+        self.listener_lcdict().worker_lcdict(q).config()
+        try:
+            logging.getLogger('bar').info('not sent')
+            logging.getLogger('foo').info('sent')
+            logging.getLogger('foo.child').info('sent too')
+            logging.getLogger('foo').error('heartbeat: not sent')
+            logging.getLogger('spam').warning('sent as well')
+        finally:
+            LCDict().config()     # reset root
+
+        sent = []
+        while not q.empty():
+            sent.append(q.get_nowait().getMessage())
+        self.assertEqual(sent, ['sent', 'sent too', 'sent as well'])
+
+    def test_add_filter_pure(self):
+        lcd = LCDict(warnings=LCDict.Warnings.NONE)
+        lcd.add_filter('f', pure=True, ** {'()': logging.Filter})
+        self.assertEqual(lcd.filters['f'], {'()': logging.Filter})
+        self.assertIn('f', lcd._pure_filters)
+        lcd.add_class_filter('f', logging.Filter)     # redefined, not pure
+        self.assertNotIn('f', lcd._pure_filters)
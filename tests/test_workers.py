@@ -0,0 +1,119 @@
+__author__ = 'brianoneill'
+
+from prelogging import LCDict
+from prelogging.records import compact_record_factory
+from prelogging.six import PY2
+from prelogging.workers import compile_worker_config, init_worker_logging
+from unittest import TestCase, skipIf
+import logging
+import multiprocessing
+import pickle
+import sys
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None          # PY2
+
+
+def work(i):
+    logging.getLogger('test_workers').info('task %d', i)
+    logging.getLogger('test_workers').debug('dropped in the worker')
+    return i
+
+
+class TestCompileWorkerConfig(TestCase):
+
+    def test_shared_locks(self):
+        lcd = LCDict(locking=True)
+        lcd.add_stderr_handler('console')
+        lcd.add_file_handler('fh', filename='test_workers.log', delay=True,
+                             locking=False)
+        config = compile_worker_config(lcd)
+        self.assertIs(type(config), dict)
+        self.assertIs(type(config['handlers']['console']), dict)
+        self.assertNotIn('create_lock', config['handlers']['console'])
+        self.assertIn('lock', config['handlers']['console'])
+        self.assertNotIn('lock', config['handlers']['fh'])
+        # The LCDict itself is untouched
+        self.assertTrue(lcd.handlers['console']['create_lock'])
+
+    def test_picklable(self):
+        lcd = LCDict()
+        lcd.add_formatter('msg', format='%(message)s')
+        lcd.add_stdout_handler('out', formatter='msg')
+        config = compile_worker_config(lcd)
+        self.assertEqual(pickle.loads(pickle.dumps(config)), config)
+
+    def options_lcdict(self):
+        lcd = LCDict()
+        lcd.add_formatter('msg', format='%(message)s')
+        lcd.add_formatter('same', format='%(message)s')
+        lcd.add_stdout_handler('out', formatter='msg')
+        lcd.add_stdout_handler('out2', formatter='same')
+        return lcd
+
+    def test_config_options(self):
+        lcd = self.options_lcdict()
+        config = compile_worker_config(lcd, lean_records=['threadName'],
+                                       compact_records=True)
+        self.assertEqual(list(config['formatters']), ['msg'])
+        self.assertEqual(config['handlers']['out2']['formatter'], 'msg')
+        decisions = {switch: enabled for switch, enabled, _ in
+                     config['prelogging']['lean_records']}
+        self.assertTrue(decisions['logThreads'])
+        self.assertFalse(decisions['logProcesses'])
+        self.assertTrue(config['prelogging']['compact_records'])
+
+        config = compile_worker_config(lcd, share_identical=False)
+        self.assertEqual(sorted(config['formatters']), ['msg', 'same'])
+        self.assertNotIn('prelogging', config)
+
+    @skipIf(PY2, "logging.setLogRecordFactory is Python 3 only")
+    def test_options_applied(self):
+        switches = ('logThreads', 'logProcesses', 'logMultiprocessing',
+                    'logAsyncioTasks', '_srcfile')
+        saved = {s: getattr(logging, s) for s in switches
+                 if hasattr(logging, s)}
+        initializer, initargs = self.options_lcdict().pool_initializer(
+            lean_records=True, compact_records=True)
+        try:
+            initializer(*initargs)
+            self.assertFalse(logging.logProcesses)
+            self.assertIsNone(logging._srcfile)
+            self.assertIs(logging.getLogRecordFactory(),
+                          compact_record_factory)
+        finally:
+            logging.setLogRecordFactory(logging.LogRecord)
+            for s, value in saved.items():
+                setattr(logging, s, value)
+
+    def test_pool_initializer(self):
+        initializer, initargs = LCDict().pool_initializer()
+        self.assertIs(initializer, init_worker_logging)
+
+
+@skipIf(sys.version_info < (3, 7),
+        "ProcessPoolExecutor takes an initializer in Python 3.7+")
+class TestSpawnPool(TestCase):
+
+    def test_spawn_pool_with_queue(self):
+        ctx = multiprocessing.get_context('spawn')
+        q = ctx.Queue()
+        lcd = LCDict()
+        lcd.add_stderr_handler('console', level='INFO')
+        lcd.add_logger('test_workers', handlers='console', propagate=False)
+        lcd.add_record_fields(service='billing')
+        initializer, initargs = lcd.pool_initializer(queue=q)
+        # Unlike multiprocessing.Pool, which respawns workers that fail to
+        # start forever, the executor breaks at once (BrokenProcessPool)
+        with ProcessPoolExecutor(2, mp_context=ctx, initializer=initializer,
+                                 initargs=initargs) as executor:
+            results = list(executor.map(work, range(4), timeout=60))
+        # (Leaving the block waits for the workers, which flush the queue
+        # as they exit)
+        self.assertEqual(results, list(range(4)))
+        recs = [q.get(timeout=5) for _ in range(4)]
+        self.assertEqual(sorted(r.getMessage() for r in recs),
+                         ['task %d' % i for i in range(4)])
+        self.assertEqual([r.service for r in recs], ['billing'] * 4)
+        self.assertTrue(q.empty())